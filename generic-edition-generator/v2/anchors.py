@@ -0,0 +1,120 @@
+from bisect import bisect_left
+from typing import List, Dict, Tuple
+from tokenizer import TokenList
+
+# a window is a list of (start, end) token indexes, one per witness
+Window = List[Tuple[int, int]]
+
+def get_token_offsets(tokens: TokenList) -> List[int]:
+    """
+    Returns the position of each token in the token string (the sum of the increments
+    of the previous tokens), with a final element corresponding to the length of
+    the token string.
+    """
+    offsets = [0] * (len(tokens)+1)
+    pos = 0
+    for i, t in enumerate(tokens):
+        offsets[i] = pos
+        pos += t[2]
+    offsets[-1] = pos
+    return offsets
+
+def get_unique_token_positions(token_string: str, tokens: TokenList, offsets: List[int], ngram_size: int = 1) -> Dict[str, int]:
+    """
+    Returns a dict associating the encoded string of each sequence of ngram_size tokens
+    appearing only once in the token string with the index of its first token in the token list.
+    Tokens with a 0 increment are ignored.
+
+    Single tokens are rarely unique in long texts, using sequences of a few tokens
+    gives many more anchors.
+    """
+    positions = {}
+    seen_twice = set()
+    indexes = [i for i, t in enumerate(tokens) if t[2] > 0]
+    for k in range(len(indexes) - ngram_size + 1):
+        i = indexes[k]
+        key = token_string[offsets[i]:offsets[indexes[k+ngram_size-1]+1]]
+        if not isinstance(key, str):
+            # token strings can also be arrays of codes, see differ_array.py
+            key = key.tobytes()
+        if key in positions:
+            seen_twice.add(key)
+        else:
+            positions[key] = i
+    for key in seen_twice:
+        del positions[key]
+    return positions
+
+def longest_increasing_subsequence(values: List[int]) -> List[int]:
+    """
+    Returns the indexes of a longest strictly increasing subsequence of values
+    (patience sorting, O(n log n)).
+    """
+    tails = []
+    tails_i = []
+    predecessors = [-1] * len(values)
+    for i, v in enumerate(values):
+        pos = bisect_left(tails, v)
+        if pos > 0:
+            predecessors[i] = tails_i[pos-1]
+        if pos == len(tails):
+            tails.append(v)
+            tails_i.append(i)
+        else:
+            tails[pos] = v
+            tails_i[pos] = i
+    res = []
+    i = tails_i[-1] if tails_i else -1
+    while i >= 0:
+        res.append(i)
+        i = predecessors[i]
+    res.reverse()
+    return res
+
+def find_anchors(token_strings: List[str], token_lists: List[TokenList], offsets_list: List[List[int]], ngram_size: int = 1) -> List[List[int]]:
+    """
+    Returns a list of anchors. An anchor is a sequence of ngram_size tokens that appears exactly
+    once in each witness, it is represented by the list of the indexes of its first token
+    (one per witness).
+
+    Anchors are sorted and only the anchors that are in the same order in all the witnesses are kept,
+    so that the texts between two consecutive anchors can be aligned independently.
+    """
+    unique_positions = []
+    for i, token_string in enumerate(token_strings):
+        unique_positions.append(get_unique_token_positions(token_string, token_lists[i], offsets_list[i], ngram_size))
+    anchors = []
+    for key, base_i in unique_positions[0].items():
+        anchor = [base_i]
+        for positions in unique_positions[1:]:
+            i = positions.get(key)
+            if i is None:
+                break
+            anchor.append(i)
+        if len(anchor) == len(unique_positions):
+            anchors.append(anchor)
+    anchors.sort()
+    # the anchors are sorted in the base order, we keep the longest chain
+    # that is also sorted in the order of each other witness
+    for witness_i in range(1, len(token_lists)):
+        kept = longest_increasing_subsequence([anchor[witness_i] for anchor in anchors])
+        anchors = [anchors[i] for i in kept]
+    return anchors
+
+def get_windows(token_lists: List[TokenList], anchors: List[List[int]], window_size: int) -> List[Window]:
+    """
+    Cuts the token lists into windows that can be aligned independently. A window starts at an anchor
+    (except the first one) and contains at least window_size base tokens (except the last one).
+
+    The size of the windows depends on the density of the anchors, a text with no anchor
+    will be in one window.
+    """
+    windows = []
+    last_cut = [0] * len(token_lists)
+    for anchor in anchors:
+        if anchor[0] - last_cut[0] < window_size:
+            continue
+        windows.append([(last_cut[i], anchor[i]) for i in range(len(token_lists))])
+        last_cut = anchor
+    windows.append([(last_cut[i], len(tokens)) for i, tokens in enumerate(token_lists)])
+    return windows
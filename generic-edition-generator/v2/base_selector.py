@@ -0,0 +1,59 @@
+import numpy as np
+from typing import List
+from tokenizer import TokenList
+from differ_array import get_code_array
+
+class BaseSelector():
+    """
+    Chooses the witness used as the base of the alignment (see FDMPVulgaligner). The base is
+    diffed against every other witness and its tokens determine the rows of the matrix, so a
+    noisy base makes the matrix higher and the diffs longer.
+
+    The default implementation returns the first witness.
+    """
+
+    def get_base_index(self, token_strings: List[str], token_lists: List[TokenList]) -> int:
+        return 0
+
+class MedoidBaseSelector(BaseSelector):
+    """
+    Chooses the medoid witness: the one with the smallest total distance to the others.
+
+    The distance between two witnesses is estimated without diffing them, as the L1 distance of
+    sketches of their token strings: the counts of the ngrams of token codes, hashed in sketch_size
+    buckets. Each edit of a token changes at most ngram_size ngrams, so the distance grows with
+    the number of differences while costing only one pass over each token string.
+    """
+
+    def __init__(self, ngram_size: int = 3, sketch_size: int = 4096):
+        self.ngram_size = ngram_size
+        self.sketch_size = sketch_size
+
+    def get_sketch(self, token_string: str) -> np.ndarray:
+        """
+        Returns the counts of the hashed ngrams of a token string
+        """
+        codes = get_code_array(token_string).astype(np.int64)
+        nb_ngrams = len(codes) - self.ngram_size + 1
+        if nb_ngrams <= 0:
+            return np.zeros(self.sketch_size, dtype=np.int64)
+        # polynomial hash of the codes of each ngram, overflows only mix the bits
+        ngrams = np.zeros(nb_ngrams, dtype=np.int64)
+        for i in range(self.ngram_size):
+            ngrams = ngrams * 1000003 + codes[i:i+nb_ngrams]
+        return np.bincount(ngrams % self.sketch_size, minlength=self.sketch_size)
+
+    def get_distance_matrix(self, token_strings: List[str]) -> np.ndarray:
+        """
+        Returns the estimated distances between all the pairs of witnesses
+        """
+        sketches = np.array([self.get_sketch(token_string) for token_string in token_strings])
+        return np.abs(sketches[:, None, :] - sketches[None, :, :]).sum(axis=2)
+
+    def get_base_index(self, token_strings: List[str], token_lists: List[TokenList]) -> int:
+        """
+        Returns the index of the medoid witness, the first one in case of a tie
+        """
+        if len(token_strings) < 3:
+            return 0
+        return int(np.argmin(self.get_distance_matrix(token_strings).sum(axis=1)))
@@ -0,0 +1,164 @@
+"""
+Benchmarks of the alignment stack on synthetic OCR witnesses (see synthetic_witnesses.py),
+scaling the number of witnesses and the length of the pages.
+
+With pytest-benchmark installed, save a baseline and compare later runs to it with:
+
+    python -m pytest benchmark_alignment.py --benchmark-autosave
+    python -m pytest benchmark_alignment.py --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Without it, the same cases can be timed with:
+
+    python benchmark_alignment.py [--save baseline.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import time
+import pytest
+from typing import Callable, Dict, List
+from vulgaligner_fdmp import FDMPVulgaligner
+from realigner import BandedRealigner
+from matrix_weigher import TokenMatrixWeigher
+from token_weigher_count import TokenCountWeigher
+from token_weigher_valid_bo import ValidBoTokenWeigher
+from synthetic_witnesses import get_seed_text, get_synthetic_witnesses, get_tokenizer, tokenize_witnesses
+from vulgatizer_op_ocr import VulgatizerOPTibOCR
+from opf_utils import OPSegment
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+pytestmark = pytest.mark.skipif(pytest_benchmark is None, reason="pytest-benchmark is not installed")
+
+NB_WITNESSES = [2, 4, 8]
+# number of syllables of a page
+PAGE_LENGTHS = [500, 2000]
+
+def get_witnesses(nb_witnesses: int, page_length: int) -> List[str]:
+    return get_synthetic_witnesses(get_seed_text(page_length), nb_witnesses)
+
+def get_matrix_weigher() -> TokenMatrixWeigher:
+    matrix_weigher = TokenMatrixWeigher()
+    matrix_weigher.add_weigher(TokenCountWeigher(), 1)
+    matrix_weigher.add_weigher(ValidBoTokenWeigher(weight_gap=100, relative=True), 1)
+    return matrix_weigher
+
+class InMemoryWitness():
+    """
+    A witness with one base and no layers, with the methods of OpenPecha used by
+    VulgatizerOPTibOCR.elect_page()
+    """
+
+    def __init__(self, pecha_id: str, text: str):
+        self.pecha_id = pecha_id
+        self.text = text
+
+    def get_base(self, base_id: str) -> str:
+        return self.text
+
+    def get_layer(self, base_id: str, layer_type):
+        return None
+
+    def reset_base_and_layers(self):
+        pass
+
+def vulgate_page(witnesses: List[str], vulgatizer: VulgatizerOPTibOCR) -> str:
+    """
+    Returns the vulgate of a page, elected by the page path of the vulgatizer (tokenization, alignment,
+    weighing and election), the witnesses have no OCR confidence
+    """
+    segments = [OPSegment(InMemoryWitness("W%d" % i, witness), "B", 0, len(witness)) for i, witness in enumerate(witnesses)]
+    strings, complete = vulgatizer.elect_page(segments, "synthetic")
+    if not complete:
+        raise RuntimeError("the alignment of the page failed")
+    return "".join(s for s, _ in strings)
+
+def get_tokenize_function(nb_witnesses: int, page_length: int) -> Callable:
+    witnesses = get_witnesses(nb_witnesses, page_length)
+    tokenizer = get_tokenizer()
+    def f():
+        tokenize_witnesses(tokenizer, witnesses)
+        tokenizer.reset()
+    return f
+
+def get_align_function(nb_witnesses: int, page_length: int) -> Callable:
+    token_strings, token_lists = tokenize_witnesses(get_tokenizer(), get_witnesses(nb_witnesses, page_length))
+    aligner = FDMPVulgaligner(array_matrix=True)
+    return lambda: aligner.get_alignment_matrix(token_strings, token_lists)
+
+def get_weigh_function(nb_witnesses: int, page_length: int) -> Callable:
+    token_strings, token_lists = tokenize_witnesses(get_tokenizer(), get_witnesses(nb_witnesses, page_length))
+    token_matrix = FDMPVulgaligner(array_matrix=True).get_alignment_matrix(token_strings, token_lists)
+    matrix_weigher = get_matrix_weigher()
+    return lambda: matrix_weigher.get_weight_matrix(token_matrix)
+
+def get_vulgate_function(nb_witnesses: int, page_length: int) -> Callable:
+    witnesses = get_witnesses(nb_witnesses, page_length)
+    vulgatizer = VulgatizerOPTibOCR(None, consensus_runs=False)
+    return lambda: vulgate_page(witnesses, vulgatizer)
+
+def get_vulgate_consensus_function(nb_witnesses: int, page_length: int) -> Callable:
+    witnesses = get_witnesses(nb_witnesses, page_length)
+    vulgatizer = VulgatizerOPTibOCR(None, consensus_runs=True)
+    return lambda: vulgate_page(witnesses, vulgatizer)
+
+def get_vulgate_realign_function(nb_witnesses: int, page_length: int) -> Callable:
+    witnesses = get_witnesses(nb_witnesses, page_length)
+    vulgatizer = VulgatizerOPTibOCR(None, consensus_runs=False, realigner=BandedRealigner())
+    return lambda: vulgate_page(witnesses, vulgatizer)
+
+BENCHMARKS = {"tokenize": get_tokenize_function, "align": get_align_function,
+    "weigh": get_weigh_function, "vulgate": get_vulgate_function,
+    "vulgate_consensus": get_vulgate_consensus_function, "vulgate_realign": get_vulgate_realign_function}
+
+@pytest.mark.parametrize("page_length", PAGE_LENGTHS)
+@pytest.mark.parametrize("nb_witnesses", NB_WITNESSES)
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_benchmark(benchmark, name, nb_witnesses, page_length):
+    benchmark(BENCHMARKS[name](nb_witnesses, page_length))
+
+def run_benchmarks(nb_runs: int = 5) -> Dict[str, float]:
+    """
+    Returns the best time of nb_runs runs of each case, in seconds
+    """
+    res = {}
+    for name, get_function in BENCHMARKS.items():
+        for nb_witnesses in NB_WITNESSES:
+            for page_length in PAGE_LENGTHS:
+                f = get_function(nb_witnesses, page_length)
+                times = []
+                for _ in range(nb_runs):
+                    start = time.perf_counter()
+                    f()
+                    times.append(time.perf_counter() - start)
+                res["%s[%d-%d]" % (name, nb_witnesses, page_length)] = min(times)
+    return res
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="save the timings as a baseline in this JSON file")
+    parser.add_argument("--compare", help="compare the timings with a baseline saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args()
+    timings = run_benchmarks()
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = 0
+    for case, t in timings.items():
+        line = "%-30s %8.2f ms" % (case, t * 1000)
+        if case in baseline:
+            ratio = t / baseline[case]
+            line += "  x%.2f" % ratio
+            if ratio > 1 + args.tolerance:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(timings, f, indent=1)
+    if regressions:
+        raise SystemExit("%d regressions" % regressions)
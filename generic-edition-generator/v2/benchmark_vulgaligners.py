@@ -0,0 +1,87 @@
+"""
+Compares the runtime and the quality of the columns of FDMPVulgaligner (star alignment on the
+first witness) and ProgressiveVulgaligner on synthetic OCR witnesses (see synthetic_witnesses.py).
+
+The quality of an alignment is measured on the vulgate elected from it: the number of characters
+differing from the seed text of the witnesses, lower is better. Misaligned columns make the
+weighers vote between tokens of different positions and show up as errors in the vulgate.
+
+With pytest-benchmark installed, the runtimes can be saved and compared like in benchmark_alignment.py:
+
+    python -m pytest benchmark_vulgaligners.py --benchmark-autosave
+
+Without it, the runtimes and the quality are printed with:
+
+    python benchmark_vulgaligners.py
+"""
+import time
+import pytest
+from typing import Callable, Dict, Tuple
+from vulgaligner import Vulgaligner
+from vulgaligner_fdmp import FDMPVulgaligner
+from vulgaligner_progressive import ProgressiveVulgaligner
+from differ_fdmp import FDMPDiffer
+from synthetic_witnesses import get_seed_text, get_synthetic_witnesses, get_tokenizer, tokenize_witnesses
+from vulgatizer_op_ocr import VulgatizerOPTibOCR
+from benchmark_alignment import vulgate_page
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+pytestmark = pytest.mark.skipif(pytest_benchmark is None, reason="pytest-benchmark is not installed")
+
+NB_WITNESSES = [3, 6, 12]
+# number of syllables of a page
+PAGE_LENGTH = 500
+# number of pages (seed texts) of the quality measure
+NB_PAGES = 10
+
+ALIGNERS: Dict[str, Callable[[], Vulgaligner]] = {
+    "fdmp": lambda: FDMPVulgaligner(array_matrix=True),
+    "progressive": lambda: ProgressiveVulgaligner(array_matrix=True)}
+
+def get_align_function(name: str, nb_witnesses: int, seed: int = 0) -> Callable:
+    token_strings, token_lists = tokenize_witnesses(get_tokenizer(), get_synthetic_witnesses(get_seed_text(PAGE_LENGTH, seed), nb_witnesses, seed=seed))
+    aligner = ALIGNERS[name]()
+    return lambda: aligner.get_alignment_matrix(token_strings, token_lists)
+
+def get_vulgate_errors(name: str, nb_witnesses: int, seed: int) -> int:
+    """
+    Returns the number of characters of the vulgate of a synthetic page that differ from its seed text
+    """
+    seed_text = get_seed_text(PAGE_LENGTH, seed)
+    # ProgressiveVulgaligner has no compressed alignments, the consensus runs are disabled for both aligners
+    vulgatizer = VulgatizerOPTibOCR(None, consensus_runs=False)
+    vulgatizer.aligner = ALIGNERS[name]()
+    vulgate = vulgate_page(get_synthetic_witnesses(seed_text, nb_witnesses, seed=seed), vulgatizer)
+    return sum(length for op, length in FDMPDiffer().diff(seed_text, vulgate) if op != '=')
+
+@pytest.mark.parametrize("nb_witnesses", NB_WITNESSES)
+@pytest.mark.parametrize("name", list(ALIGNERS))
+def test_benchmark(benchmark, name, nb_witnesses):
+    benchmark(get_align_function(name, nb_witnesses))
+
+def run_comparison(nb_runs: int = 5) -> Dict[Tuple[str, int], Tuple[float, int]]:
+    """
+    Returns the best time of nb_runs alignments of a page and the total vulgate errors on NB_PAGES pages,
+    for each aligner and number of witnesses
+    """
+    res = {}
+    for nb_witnesses in NB_WITNESSES:
+        for name in ALIGNERS:
+            f = get_align_function(name, nb_witnesses)
+            times = []
+            for _ in range(nb_runs):
+                start = time.perf_counter()
+                f()
+                times.append(time.perf_counter() - start)
+            errors = sum(get_vulgate_errors(name, nb_witnesses, seed) for seed in range(NB_PAGES))
+            res[(name, nb_witnesses)] = (min(times), errors)
+    return res
+
+if __name__ == "__main__":
+    print("%-12s %9s %10s %14s" % ("aligner", "witnesses", "time", "vulgate errors"))
+    for (name, nb_witnesses), (t, errors) in run_comparison().items():
+        print("%-12s %9d %7.2f ms %14d" % (name, nb_witnesses, t * 1000, errors))
@@ -0,0 +1,98 @@
+import numpy as np
+from typing import List
+
+# value of the characters not covered by a confidence annotation, above all the confidences
+NO_CONFIDENCE = 127
+
+class RangeMinTable():
+    """
+    Sparse table answering range minimum queries in O(1) after an O(n log n) construction.
+
+    Row k of the table contains the minimum of each range of 2**k values, the minimum of
+    any range is the minimum of the two (overlapping) ranges of the largest power of 2
+    fitting in it.
+    """
+
+    def __init__(self, values: np.ndarray):
+        n = len(values)
+        self.table = [np.asarray(values)]
+        k = 1
+        while 2 * k <= n:
+            previous = self.table[-1]
+            self.table.append(np.minimum(previous[:len(previous)-k], previous[k:]))
+            k *= 2
+        # row of the table for each range length
+        self.levels = np.zeros(n+1, dtype=np.int64)
+        for level in range(1, len(self.table)):
+            self.levels[1 << level:] = level
+
+    def get_min(self, start: int, end: int):
+        """
+        Returns the minimum of values[start:end], end must be greater than start
+        """
+        level = self.levels[end - start]
+        row = self.table[level]
+        return min(row[start], row[end - (1 << level)])
+
+    def get_mins(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Vectorized get_min() for arrays of ranges
+        """
+        res = np.empty(len(starts), dtype=self.table[0].dtype)
+        levels = self.levels[ends - starts]
+        for level in np.unique(levels).tolist():
+            selected = levels == level
+            row = self.table[level]
+            res[selected] = np.minimum(row[starts[selected]], row[ends[selected] - (1 << level)])
+        return res
+
+
+class SegmentConfidence():
+    """
+    The OCR confidence of each character of a segment, as an int8 between 0 and 100
+    (the lowest confidence of the annotations covering the character), with a range
+    minimum table to get the confidence of a token in constant time.
+
+    Positions are in the coordinates of the base, annotations spans and tokens are (start, end)
+    with end excluded.
+    """
+
+    def __init__(self, start: int, end: int, annotations: List):
+        """
+        annotations: objects with a span and a confidence (between 0 and 1, or None), like OCRConfidence
+        """
+        self.start = start
+        self.end = end
+        confidences = np.full(max(end - start, 1), NO_CONFIDENCE, dtype=np.int8)
+        for annotation in annotations:
+            if annotation.confidence is None or annotation.span is None:
+                continue
+            c = int(annotation.confidence * 100)
+            a_start = max(annotation.span.start, start) - start
+            a_end = min(annotation.span.end, end) - start
+            if a_end > a_start:
+                np.minimum(confidences[a_start:a_end], c, out=confidences[a_start:a_end])
+        self.confidences = confidences
+        self.table = RangeMinTable(confidences)
+
+    def get_clamped_ranges(self, starts: np.ndarray, ends: np.ndarray):
+        starts = np.clip(np.asarray(starts, dtype=np.int64) - self.start, 0, len(self.confidences) - 1)
+        ends = np.clip(np.asarray(ends, dtype=np.int64) - self.start, starts + 1, len(self.confidences))
+        return starts, ends
+
+    def get_lowest_confidence(self, start: int, end: int) -> int:
+        """
+        Returns the lowest confidence of the characters of a token, None if no character has a confidence
+        """
+        start = min(max(start - self.start, 0), len(self.confidences) - 1)
+        end = min(max(end - self.start, start + 1), len(self.confidences))
+        c = int(self.table.get_min(start, end))
+        return None if c == NO_CONFIDENCE else c
+
+    def get_lowest_confidences(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Vectorized get_lowest_confidence(), returns NO_CONFIDENCE for the tokens with no confidence
+        """
+        if len(starts) == 0:
+            return np.empty(0, dtype=np.int8)
+        return self.table.get_mins(*self.get_clamped_ranges(starts, ends))
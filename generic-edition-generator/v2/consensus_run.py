@@ -0,0 +1,61 @@
+import numpy as np
+from typing import List, Tuple
+from tokenizer import Token, TokenList
+
+class ConsensusRun():
+    """
+    A block of an alignment where all the witnesses have the same tokens: nb_rows aligned
+    positions with no gap and the same token string in every witness. It replaces nb_rows rows
+    of an alignment matrix, which don't need to be weighed since there is nothing to elect.
+
+    Row i of the block contains the token first_token_indexes[column_i]+i of each witness,
+    the token lists are not copied. The rows of the block are inserted before the row row_i
+    of the matrix of the variant regions (see FDMPVulgaligner.get_compressed_alignment()).
+    """
+
+    def __init__(self, token_lists: List[TokenList], first_token_indexes: List[int], nb_rows: int, row_i: int):
+        self.token_lists = token_lists
+        self.first_token_indexes = first_token_indexes
+        self.nb_rows = nb_rows
+        self.row_i = row_i
+
+    @property
+    def nb_columns(self) -> int:
+        return len(self.token_lists)
+
+    def get_column_tokens(self, column_i: int) -> TokenList:
+        first_token_i = self.first_token_indexes[column_i]
+        return self.token_lists[column_i][first_token_i:first_token_i+self.nb_rows]
+
+    def get_column_ranges(self, column_i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the starts and the ends of the tokens of a column
+        """
+        tokens = self.get_column_tokens(column_i)
+        return np.array([t[0] for t in tokens], dtype=np.int32), np.array([t[1] for t in tokens], dtype=np.int32)
+
+    def get_strings(self) -> List[str]:
+        return [t[3] for t in self.get_column_tokens(0)]
+
+    def to_rows(self) -> List[TokenList]:
+        """
+        Returns the rows of the block as in a list of lists token matrix
+        """
+        return [list(row) for row in zip(*[self.get_column_tokens(column_i) for column_i in range(self.nb_columns)])]
+
+    def __len__(self) -> int:
+        return self.nb_rows
+
+def get_alignment_rows(token_matrix, consensus_runs: List[ConsensusRun]) -> List[TokenList]:
+    """
+    Returns the rows of a compressed alignment (the matrix of the variant regions and the
+    consensus runs) as the rows of the full alignment matrix
+    """
+    rows = []
+    row_start = 0
+    for consensus_run in consensus_runs:
+        rows += [list(token_matrix[row_i]) for row_i in range(row_start, consensus_run.row_i)]
+        rows += consensus_run.to_rows()
+        row_start = consensus_run.row_i
+    rows += [list(token_matrix[row_i]) for row_i in range(row_start, len(token_matrix))]
+    return rows
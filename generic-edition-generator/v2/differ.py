@@ -0,0 +1,20 @@
+from typing import List, Tuple
+
+# a diff is a tuple with two values:
+# - a character: '=', '-' or '+' with self-evident signification
+# - an integer representing the number of characters (or elements of an array)
+Diff = Tuple[str,int]
+
+class Differ():
+    """
+    A differ computes the differences between the token strings of two witnesses,
+    in the format of fast_diff_match_patch.
+    """
+
+    def diff(self, base_token_string, other_token_string) -> List[Diff]:
+        """
+        Returns a list of diffs such that the sum of the '=' and '-' counts is the length
+        of base_token_string and the sum of the '=' and '+' counts is the length of
+        other_token_string.
+        """
+        return []
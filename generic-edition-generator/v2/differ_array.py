@@ -0,0 +1,200 @@
+import numpy as np
+from differ import Differ, Diff
+from anchors import longest_increasing_subsequence
+from typing import List
+
+def get_code_array(token_string) -> np.ndarray:
+    """
+    Returns the token string as an array of int32 codes. Token strings can be
+    strings (each character encoding a code) or arrays of codes.
+    """
+    if isinstance(token_string, str):
+        return np.frombuffer(token_string.encode("utf-32-le", "surrogatepass"), dtype=np.int32)
+    return np.asarray(token_string, dtype=np.int32)
+
+def get_common_prefix_len(a: np.ndarray, b: np.ndarray) -> int:
+    n = min(len(a), len(b))
+    different = np.flatnonzero(a[:n] != b[:n])
+    return int(different[0]) if len(different) else n
+
+def get_common_suffix_len(a: np.ndarray, b: np.ndarray, max_len: int) -> int:
+    n = min(len(a), len(b), max_len)
+    if n == 0:
+        return 0
+    different = np.flatnonzero(a[len(a)-n:][::-1] != b[len(b)-n:][::-1])
+    return int(different[0]) if len(different) else n
+
+def get_unique_matches(a: np.ndarray, b: np.ndarray):
+    """
+    Returns the positions in a and b of the codes appearing exactly once in a and in b,
+    sorted by position in a
+    """
+    a_codes, a_indexes, a_counts = np.unique(a, return_index=True, return_counts=True)
+    b_codes, b_indexes, b_counts = np.unique(b, return_index=True, return_counts=True)
+    a_unique = a_counts == 1
+    b_unique = b_counts == 1
+    _, a_i, b_i = np.intersect1d(a_codes[a_unique], b_codes[b_unique], assume_unique=True, return_indices=True)
+    a_positions = a_indexes[a_unique][a_i]
+    b_positions = b_indexes[b_unique][b_i]
+    order = np.argsort(a_positions)
+    return a_positions[order].tolist(), b_positions[order].tolist()
+
+class DiffBuilder():
+    """
+    Accumulates diffs, merging consecutive diffs of the same type
+    """
+
+    def __init__(self):
+        self.diffs: List[List] = []
+
+    def add(self, op: str, n: int):
+        if n <= 0:
+            return
+        if self.diffs and self.diffs[-1][0] == op:
+            self.diffs[-1][1] += n
+        else:
+            self.diffs.append([op, n])
+
+    def get_diffs(self) -> List[Diff]:
+        """
+        Returns the diffs with all the changes between two equalities as one '-' and one '+',
+        like fdmp
+        """
+        res = []
+        minus_c = 0
+        plus_c = 0
+        for op, n in self.diffs:
+            if op == '=':
+                if minus_c:
+                    res.append(('-', minus_c))
+                if plus_c:
+                    res.append(('+', plus_c))
+                minus_c = 0
+                plus_c = 0
+                res.append(('=', n))
+            elif op == '-':
+                minus_c += n
+            else:
+                plus_c += n
+        if minus_c:
+            res.append(('-', minus_c))
+        if plus_c:
+            res.append(('+', plus_c))
+        return res
+
+class ArrayDiffer(Differ):
+    """
+    Differ working on arrays of token codes instead of strings, so that codes are not limited
+    by what fdmp accepts as characters and don't need to be split on two characters
+    (see Vocabulary.split_code_for_2_bytes).
+
+    The algorithm:
+    - removes the common prefix and suffix (vectorized)
+    - aligns the codes appearing exactly once in both sequences, keeping the longest
+      subsequence in the same order (patience diff), and diffs the ranges between them recursively
+    - uses the Myers O(ND) algorithm on the ranges without such codes
+
+    max_myers_cost: maximum number of differences in the Myers algorithm, ranges needing
+    more are considered completely different (all deleted and inserted). This bounds
+    the time spent on unrelated ranges.
+
+    small_range_size: ranges with less codes (in both sequences) go directly to the Myers algorithm,
+    NumPy operations are slower than Python on small lists.
+    """
+
+    def __init__(self, max_myers_cost: int = 2000, small_range_size: int = 64):
+        self.max_myers_cost = max_myers_cost
+        self.small_range_size = small_range_size
+
+    def diff(self, base_token_string, other_token_string) -> List[Diff]:
+        a = get_code_array(base_token_string)
+        b = get_code_array(other_token_string)
+        builder = DiffBuilder()
+        self.diff_ranges(a, b, builder)
+        return builder.get_diffs()
+
+    def diff_ranges(self, a: np.ndarray, b: np.ndarray, builder: DiffBuilder):
+        if len(a) + len(b) < self.small_range_size:
+            self.myers(a.tolist(), b.tolist(), builder)
+            return
+        prefix_len = get_common_prefix_len(a, b)
+        suffix_len = get_common_suffix_len(a, b, min(len(a), len(b)) - prefix_len)
+        builder.add('=', prefix_len)
+        a_middle = a[prefix_len:len(a)-suffix_len]
+        b_middle = b[prefix_len:len(b)-suffix_len]
+        if len(a_middle) == 0 or len(b_middle) == 0:
+            builder.add('-', len(a_middle))
+            builder.add('+', len(b_middle))
+        else:
+            a_positions, b_positions = get_unique_matches(a_middle, b_middle)
+            if a_positions:
+                kept = longest_increasing_subsequence(b_positions)
+                a_i = 0
+                b_i = 0
+                for k in kept:
+                    a_pos = a_positions[k]
+                    b_pos = b_positions[k]
+                    self.diff_ranges(a_middle[a_i:a_pos], b_middle[b_i:b_pos], builder)
+                    builder.add('=', 1)
+                    a_i = a_pos + 1
+                    b_i = b_pos + 1
+                self.diff_ranges(a_middle[a_i:], b_middle[b_i:], builder)
+            else:
+                self.myers(a_middle.tolist(), b_middle.tolist(), builder)
+        builder.add('=', suffix_len)
+
+    def myers(self, a: List[int], b: List[int], builder: DiffBuilder):
+        """
+        Classic Myers algorithm, keeping the V array of each step to find the path back
+        """
+        n = len(a)
+        m = len(b)
+        max_d = min(n + m, self.max_myers_cost)
+        offset = max_d + 1
+        v = [0] * (2 * max_d + 3)
+        trace = []
+        found = False
+        for d in range(max_d + 1):
+            # keep the values of the previous step, only the diagonals -d..d can be read
+            trace.append(v[offset-d-1:offset+d+2])
+            for k in range(-d, d+1, 2):
+                if k == -d or (k != d and v[offset+k-1] < v[offset+k+1]):
+                    x = v[offset+k+1]
+                else:
+                    x = v[offset+k-1] + 1
+                y = x - k
+                while x < n and y < m and a[x] == b[y]:
+                    x += 1
+                    y += 1
+                v[offset+k] = x
+                if x >= n and y >= m:
+                    found = True
+                    break
+            if found:
+                break
+        if not found:
+            builder.add('-', n)
+            builder.add('+', m)
+            return
+        reversed_diffs = []
+        x = n
+        y = m
+        for d in range(len(trace)-1, -1, -1):
+            previous_v = trace[d]
+            # previous_v[i] is the value for diagonal i-d-1
+            k = x - y
+            if k == -d or (k != d and previous_v[k-1+d+1] < previous_v[k+1+d+1]):
+                previous_k = k + 1
+            else:
+                previous_k = k - 1
+            previous_x = previous_v[previous_k+d+1]
+            previous_y = previous_x - previous_k
+            snake_len = min(x - previous_x, y - previous_y) if d > 0 else x
+            if snake_len > 0:
+                reversed_diffs.append(('=', snake_len))
+            if d > 0:
+                reversed_diffs.append(('+', 1) if x - snake_len == previous_x else ('-', 1))
+            x = previous_x
+            y = previous_y
+        for op, c in reversed(reversed_diffs):
+            builder.add(op, c)
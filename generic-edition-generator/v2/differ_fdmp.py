@@ -0,0 +1,11 @@
+from fast_diff_match_patch import diff
+from differ import Differ, Diff
+from typing import List
+
+class FDMPDiffer(Differ):
+    """
+    Differ using the fast_diff_match_patch (fdmp) library on strings
+    """
+
+    def diff(self, base_token_string: str, other_token_string: str) -> List[Diff]:
+        return diff(base_token_string, other_token_string, checklines=0, cleanup=None)
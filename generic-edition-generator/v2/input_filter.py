@@ -1,4 +1,5 @@
 import re
+import numpy as np
 from bisect import bisect, bisect_left
 from typing import List, Tuple
 
@@ -54,6 +55,33 @@ class InputFilter():
             return corrected
         return self.previous_filter.correct_position(corrected)
 
+    def correct_positions(self, positions: np.ndarray) -> np.ndarray:
+        """
+        vectorized correct(), for an array of positions
+        """
+        if not self.positions:
+            return positions
+        previous_position_is = np.searchsorted(np.asarray(self.positions), positions, side="right")
+        diffs = np.concatenate(([0], np.asarray(self.diffs, dtype=np.int64)))
+        return positions + diffs[previous_position_is]
+
+    def correct_positions_recursively(self, positions: np.ndarray) -> np.ndarray:
+        """
+        vectorized correct_position(), for an array of positions
+        """
+        corrected = self.correct_positions(positions)
+        if self.previous_filter is None:
+            return corrected
+        return self.previous_filter.correct_positions_recursively(corrected)
+
+    def get_position_map(self, length: int) -> np.ndarray:
+        """
+        returns an array giving the position in the original string of each position
+        of the output string (of size length + 1, to include the end of the string),
+        composing the corrections of the whole chain. It can be called after get_string().
+        """
+        return self.correct_positions_recursively(np.arange(length + 1, dtype=np.int64))
+
     def add_position_diff(self, position: int, cumulative_diff: int):
         """
         the main function to use in subclasses, indicate position diffs
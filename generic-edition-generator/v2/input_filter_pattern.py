@@ -18,13 +18,13 @@ class PatternInputFilter(InputFilter):
     def get_string(self):
         orig = self.get_arg_string()
         last_match_end = 0
-        output = ""
+        output = []
         output_len = 0
         cumulative = 0
         for m in self.pattern.finditer(orig):
             group_size = m.end() - m.start()
             skipped_size = m.start() - last_match_end
-            output += orig[last_match_end:m.start()]
+            output.append(orig[last_match_end:m.start()])
             last_match_end = m.end()
             output_len += skipped_size
 
@@ -50,11 +50,13 @@ class PatternInputFilter(InputFilter):
             elif replacement_len > group_size:
                 # when the replacement is large, new indexes point to
                 # the last original index
-                for i in range(group_size, replacement_len):
-                    cumulative -= 1
-                    self.add_position_diff(output_len+i, cumulative)
+                self.add_position_diff(output_len+group_size, cumulative-1)
+                nb_extra = replacement_len - group_size
+                self.positions.extend(range(output_len+group_size+1, output_len+replacement_len))
+                self.diffs.extend(range(cumulative-2, cumulative-nb_extra-1, -1))
+                cumulative -= nb_extra
 
-            output += replacement
+            output.append(replacement)
             output_len += replacement_len
 
         if last_match_end == 0:
@@ -62,7 +64,6 @@ class PatternInputFilter(InputFilter):
             return orig
 
         if last_match_end < len(orig):
-            output += orig[last_match_end:]
-
-        return output
+            output.append(orig[last_match_end:])
 
+        return "".join(output)
@@ -21,6 +21,9 @@ class PositionInputFilter(InputFilter):
         """
         return current_position + self.start
 
+    def correct_positions(self, positions):
+        return positions + self.start
+
     def get_string(self):
         # we don't even need to add the position diff, but just in case
         self.add_position_diff(0, self.start)
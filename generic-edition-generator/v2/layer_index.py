@@ -0,0 +1,44 @@
+import numpy as np
+from typing import List
+
+class LayerIntervalIndex():
+    """
+    An index of the annotations of a layer by span, to find the annotations overlapping
+    a range of characters in O(log n + k).
+
+    The annotations are sorted by start. Since annotations can overlap, the ends are not
+    sorted, so the index also keeps the maximum end of all the annotations up to each
+    position (prefix maximum, non-decreasing). All the annotations ending after a position
+    are after the first annotation where this maximum reaches the position.
+
+    Ranges are closed: an annotation (s, e) overlaps (start, end) if s <= end and e >= start.
+    """
+
+    def __init__(self, starts: List[int], ends: List[int], annotations: List):
+        order = np.argsort(np.asarray(starts, dtype=np.int64), kind="stable")
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+        self.annotations = [annotations[i] for i in order.tolist()]
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def get_index_range(self, start: int, end: int):
+        """
+        Returns the indexes (lo, hi) such that all the annotations overlapping (start, end)
+        are between lo and hi. Annotations between lo and hi all start before end but some can
+        end before start when annotations overlap.
+        """
+        lo = int(np.searchsorted(self.max_ends, start, side="left"))
+        hi = int(np.searchsorted(self.starts, end, side="right"))
+        return lo, hi
+
+    def get_indexes_in_range(self, start: int, end: int) -> np.ndarray:
+        lo, hi = self.get_index_range(start, end)
+        if lo >= hi:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.ends[lo:hi] >= start) + lo
+
+    def get_annotations_in_range(self, start: int, end: int) -> List:
+        return [self.annotations[i] for i in self.get_indexes_in_range(start, end).tolist()]
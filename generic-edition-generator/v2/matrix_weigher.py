@@ -1,11 +1,14 @@
+import numpy as np
 from typing import List, Tuple
 from token_weigher import TokenWeigher
 from vulgaligner import TokenMatrix
+from token_matrix import ArrayTokenMatrix
 from tokenizer import Token, TokenList
 
-WeightedWeights = Tuple[List[int], int]
+WeightedWeights = Tuple[np.ndarray, int, bool]
 WeightedWeighers = Tuple[TokenWeigher, int]
-WeightMatrix = List[List[int]]
+# array of floats, NaN for the cells with no weight
+WeightMatrix = np.ndarray
 
 class TokenMatrixWeigher():
     """
@@ -48,60 +51,68 @@ class TokenMatrixWeigher():
             result.append((weigher.weigh(tokens), weigher_weight, weigher.relative))
         return result
 
-    def fill_average_row_weights(self, token_matrix, weight_matrix, row_index: int):
+    def get_identical_rows(self, token_matrix: ArrayTokenMatrix) -> np.ndarray:
         """
-        Get the weighted average of the weights for a column
+        Returns a boolean array indicating the rows where all the tokens are identical,
+        see is_the_same_token()
         """
-        row_weighted_weights = self.get_row_weighted_weights(token_matrix[row_index])
-        # optimization: if all the tokens are identical, we don't weigh them
-        if row_weighted_weights is None:
-            return
-        # optimization: with only one weigher, we just use its output
-        if len(row_weighted_weights) == 1:
-            weights = row_weighted_weights[0][0]
-            for col_index, weight in enumerate(weights):
-                weight_matrix[row_index][col_index] = weight
-            return
-        nb_columns = len(token_matrix[0])
-        # prepare the weighted average calculation
-        absolute_weight_sums: List[int] = [0 for _ in range(nb_columns)]
-        relative_weight_sums: List[int] = [0 for _ in range(nb_columns)]
-        absolute_weight_totals: List[int] = [0 for _ in range(nb_columns)]
-        relative_weight_totals: List[int] = [0 for _ in range(nb_columns)]
-        for (weights, weights_weight, weigher_relative) in row_weighted_weights:
-            for col_index, weight in enumerate(weights):
-                if weight is None:
-                    continue
-                if weigher_relative:
-                    relative_weight_sums[col_index] += weight * weights_weight
-                    relative_weight_totals[col_index] += weights_weight
-                else:
-                    absolute_weight_sums[col_index] += weight * weights_weight
-                    absolute_weight_totals[col_index] += weights_weight
-        for col_index, weight_total in enumerate(absolute_weight_totals):
-            if weight_total > 0:
-                weight = absolute_weight_sums[col_index] // weight_total
-                if relative_weight_sums[col_index] > 0:
-                    relative_weight = relative_weight_sums[col_index] // relative_weight_totals[col_index]
-                    weight = int(weight * relative_weight / 100)
-                weight_matrix[row_index][col_index] = weight
+        # if there's a gap, then not all the tokens are the same, by design
+        return ~token_matrix.gaps.any(axis=1) & (token_matrix.codes == token_matrix.codes[:, :1]).all(axis=1)
 
     def get_weight_matrix(self, token_matrix: TokenMatrix) -> WeightMatrix:
         """
         Returns a matrix with the same dimensions as the TokenMatrix, containing the
-        final weight of each token, averaged between the different weighers.
+        final weight of each token, averaged between the different weighers. Cells
+        with no weight have the value NaN.
 
-        TODO: TokenMatrix and this matrix should probably instead by numpy arrays.
+        Each weigher weighs the whole matrix at once and the weighted averages
+        are computed on the whole matrix.
         """
-        nb_rows = len(token_matrix)
-        nb_columns = len(token_matrix[0])
         if len(self.weighted_weighters) == 0:
             return None
-        weight_matrix: WeightMatrix = [[None for _ in range(nb_columns)] for _ in range(nb_rows)]
-        for row_index in range(nb_rows):
-            self.fill_average_row_weights(token_matrix, weight_matrix, row_index)
+        if not isinstance(token_matrix, ArrayTokenMatrix):
+            token_matrix = ArrayTokenMatrix.from_rows(token_matrix)
+        weighted_weights: List[WeightedWeights] = []
+        for (weigher, weigher_weight) in self.weighted_weighters:
+            weighted_weights.append((weigher.weigh_matrix(token_matrix), weigher_weight, weigher.relative))
+        if len(weighted_weights) == 1:
+            # optimization: with only one weigher, we just use its output
+            weight_matrix = weighted_weights[0][0]
+        else:
+            shape = token_matrix.gaps.shape
+            absolute_weight_sums = np.zeros(shape, dtype=np.int64)
+            relative_weight_sums = np.zeros(shape, dtype=np.int64)
+            absolute_weight_totals = np.zeros(shape, dtype=np.int64)
+            relative_weight_totals = np.zeros(shape, dtype=np.int64)
+            for (weights, weights_weight, weigher_relative) in weighted_weights:
+                has_weight = ~np.isnan(weights)
+                int_weights = np.where(has_weight, weights, 0).astype(np.int64)
+                if weigher_relative:
+                    relative_weight_sums += int_weights * weights_weight
+                    relative_weight_totals += has_weight * weights_weight
+                else:
+                    absolute_weight_sums += int_weights * weights_weight
+                    absolute_weight_totals += has_weight * weights_weight
+            weight_matrix = absolute_weight_sums // np.maximum(absolute_weight_totals, 1)
+            relative_weights = relative_weight_sums // np.maximum(relative_weight_totals, 1)
+            weight_matrix = np.where(relative_weight_sums > 0, np.trunc(weight_matrix * relative_weights / 100), weight_matrix)
+            weight_matrix = np.where(absolute_weight_totals > 0, weight_matrix, np.nan)
+        if self.weigh_identical_rows:
+            # optimization: if all the tokens are identical, we don't weigh them
+            weight_matrix = np.where(self.get_identical_rows(token_matrix)[:, None], np.nan, weight_matrix)
         return weight_matrix
 
+    @staticmethod
+    def get_top_indexes(weight_matrix: WeightMatrix) -> np.ndarray:
+        """
+        Returns the column index of the highest weight of each row, the first column
+        is returned for rows where no weight is above 0.
+        """
+        weight_matrix = np.nan_to_num(weight_matrix, nan=0)
+        top_indexes = np.argmax(weight_matrix, axis=1)
+        top_indexes[weight_matrix.max(axis=1, initial=0) <= 0] = 0
+        return top_indexes
+
 
 if __name__ == "__main__":
     from token_weigher_count import TokenCountWeigher
@@ -116,7 +127,6 @@ if __name__ == "__main__":
         [(123, 124, 1, 'བ'), None, (120, 122, 1, '('), None, None, None]
         ]
     row_index = 5
-    weight_matrix = [[None for _ in range(len(token_matrix[0]))] for _ in range(len(token_matrix))]
     weigher = TokenMatrixWeigher()
     # assert(weigher.is_the_same_token([(0,0,0,"a"), (0,0,0,"a"), (0,0,0,"a")]))
     # assert(not weigher.is_the_same_token([(0,0,0,"a"), (0,0,0,"q"), (0,0,0,"a")]))
@@ -124,7 +134,7 @@ if __name__ == "__main__":
     weigher.add_weigher(TokenCountWeigher(), 1)
     weigher.add_weigher(ValidBoTokenWeigher(), 1)
     # weigher.add_weigher(ValidBoTokenWeigher(), 1)
-    weigher.fill_average_row_weights(token_matrix, weight_matrix, row_index)
+    weight_matrix = weigher.get_weight_matrix(token_matrix)
     print(weight_matrix)
-    expected_weight_matrix = [[68, 68, 68, 43, 68, 16]]
-    assert expected_weight_matrix == weight_matrix
\ No newline at end of file
+    expected_weights = [16, 66, 16, 66, 66, 66]
+    assert expected_weights == weight_matrix[row_index].tolist()
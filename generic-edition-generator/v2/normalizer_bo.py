@@ -49,6 +49,9 @@ CATEGORIES =  ([Cats.Other]           # 0F00
              + [Cats.Subscript] * 48  # 0F8D-0FBC
              )
 
+# category of each character between 0F00 and 0FBC, as integers
+CATEGORY_TABLE = bytes(c.value for c in CATEGORIES)
+
 def charcat(c):
     ''' Returns the category for a single char string'''
     o = ord(c)
@@ -60,122 +63,175 @@ def charcat(c):
 #for i, c in enumerate(CATEGORIES):
 #    print("%x : %d" % (0x0F00 + i , c.value))
 
+def get_category_chars(predicate):
+    """
+    Returns a regex character class with the characters whose category value matches predicate
+    """
+    return "[%s]" % "".join(chr(0x0F00 + i) for i, cat in enumerate(CATEGORY_TABLE) if predicate(cat))
+
+BASE_CHARS = get_category_chars(lambda cat: cat == Cats.Base.value)
+# characters that are part of the stack of the previous base
+COMBINING_CHARS = get_category_chars(lambda cat: cat > Cats.Base.value)
+BASE_OR_COMBINING_CHARS = get_category_chars(lambda cat: cat >= Cats.Base.value)
+
+# stacks with only one combining character are always in order
+STACK_TO_SORT_RE = re.compile(BASE_CHARS + COMBINING_CHARS + "{2,}")
+# combining characters not part of a stack
+INVALID_COMBINING_RE = re.compile("(?<!" + BASE_OR_COMBINING_CHARS + ")" + COMBINING_CHARS)
+# two consecutive characters in a stack that are not in the canonical order
+UNORDERED_RE = re.compile("|".join(get_category_chars(lambda cat: cat == k) + get_category_chars(lambda cat: Cats.Base.value < cat < k)
+    for k in range(Cats.BottomVowel.value, len(Cats))))
+
+LEADING_DIACRITICS_RE = re.compile(r"^([\u0f71-\u0f84\u0f8d-\u0fbc]+)([\u0f40-\u0f6c])")
+LEADING_DIACRITICS_PAGE_RE = re.compile("(?<!" + BASE_OR_COMBINING_CHARS + r")([\u0f71-\u0f84\u0f8d-\u0fbc]+)([\u0f40-\u0f6c])")
+
+# maps each character of 0F00-0FBC to a character representing its category, other characters
+# are kept and are never compared
+CATEGORY_TRANSLATION = {0x0F00 + i: chr(0x30 + cat) for i, cat in enumerate(CATEGORY_TABLE)}
+
+def sort_stack(m):
+    stack = m.group(0)
+    if UNORDERED_RE.search(stack) is None:
+        return stack
+    cats = stack.translate(CATEGORY_TRANSLATION)
+    # sort the chars by category then position in string (sorted() is stable)
+    return "".join(stack[i] for i in sorted(range(len(stack)), key=cats.__getitem__))
+
+def reorder_stacks(txt):
+    valid = INVALID_COMBINING_RE.search(txt) is None
+    # most strings are already in order
+    if UNORDERED_RE.search(txt) is not None:
+        txt = STACK_TO_SORT_RE.sub(sort_stack, txt)
+    return txt, valid
+
 def unicode_reorder(txt):
     # case of a syllable starting with a diacritic (ex: a vowel or subscript)
     # we push it after the first main letter
-    txt = re.sub(r"^([\u0f71-\u0f84\u0f8d-\u0fbc]+)([\u0f40-\u0f6c])", r"\2\1", txt)
+    txt = LEADING_DIACRITICS_RE.sub(r"\2\1", txt)
     # inpired from code for Khmer Unicode provided by SIL
     # https://docs.microsoft.com/en-us/typography/script-development/tibetan#reor
     # https://docs.microsoft.com/en-us/typography/script-development/use#glyph-reordering
-    charcats = [charcat(c) for c in txt]
-    # find subranges of base+non other and sort components in the subrange
-    i = 0
-    res = []
-    valid = True
-    while i < len(charcats):
-        c = charcats[i]
-        if c != Cats.Base:
-            if c.value > Cats.Base.value:
-                valid = False
-            res.append(txt[i])
-            i += 1
-            continue
-        # scan for end of component
-        j = i + 1
-        while j < len(charcats) and charcats[j].value > Cats.Base.value:
-            j += 1
-        # sort syllable based on character categories
-        # sort the char indices by category then position in string
-        newindices = sorted(range(i, j), key=lambda e:(charcats[e].value, e))
-        replaces = "".join(txt[n] for n in newindices)
-        res.append(replaces)
-        i = j
-    return "".join(res), valid
+    # stacks are a base followed by characters of higher categories, the characters
+    # of a stack are sorted by category. Characters of higher categories outside of
+    # a stack make the string invalid.
+    return reorder_stacks(txt)
 
-def normalize_unicode(s, form="nfd"):
-    # first, unify Unicode form:
-    # http://www.unicode.org/faq/normalization.html
-    # https://unicode.org/reports/tr15/
-    # https://unicode.org/charts/normalization/chart_Tibetan.html
-    # although for some reason this chart considers 0f0c -> 0f0b in NFD
-    #
-    # deprecated or discouraged characters
-    s = s.replace("\u0f73", "\u0f71\u0f72") # use is discouraged
-    s = s.replace("\u0f75", "\u0f71\u0f74") # use is discouraged
-    s = s.replace("\u0f77", "\u0fb2\u0f71\u0f80") # deprecated
-    s = s.replace("\u0f79", "\u0fb3\u0f71\u0f80") # deprecated
-    s = s.replace("\u0f81", "\u0f71\u0f80") # use is discouraged
-    if form == "nfd":
-        s = s.replace("\u0f43", "\u0f42\u0fb7")
-        s = s.replace("\u0f4d", "\u0f4c\u0fb7")
-        s = s.replace("\u0f52", "\u0f51\u0fb7")
-        s = s.replace("\u0f57", "\u0f56\u0fb7")
-        s = s.replace("\u0f5c", "\u0f5b\u0fb7")
-        s = s.replace("\u0f69", "\u0f40\u0fb5")
-        s = s.replace("\u0f76", "\u0fb2\u0f80")
-        s = s.replace("\u0f78", "\u0fb3\u0f80")
-        s = s.replace("\u0f93", "\u0f92\u0fb7")
-        s = s.replace("\u0f9d", "\u0f9c\u0fb7")
-        s = s.replace("\u0fa2", "\u0fa1\u0fb7")
-        s = s.replace("\u0fa7", "\u0fa6\u0fb7")
-        s = s.replace("\u0fac", "\u0fab\u0fb7")
-        s = s.replace("\u0fb9", "\u0f90\u0fb5")
-    else:
-        s = s.replace("\u0f42\u0fb7", "\u0f43")
-        s = s.replace("\u0f4c\u0fb7", "\u0f4d")
-        s = s.replace("\u0f51\u0fb7", "\u0f52")
-        s = s.replace("\u0f56\u0fb7", "\u0f57")
-        s = s.replace("\u0f5b\u0fb7", "\u0f5c")
-        s = s.replace("\u0f40\u0fb5", "\u0f69")
-        s = s.replace("\u0fb2\u0f80", "\u0f76")
-        s = s.replace("\u0fb3\u0f80", "\u0f78")
-        s = s.replace("\u0f92\u0fb7", "\u0f93")
-        s = s.replace("\u0f9c\u0fb7", "\u0f9d")
-        s = s.replace("\u0fa1\u0fb7", "\u0fa2")
-        s = s.replace("\u0fa6\u0fb7", "\u0fa7")
-        s = s.replace("\u0fab\u0fb7", "\u0fac")
-        s = s.replace("\u0f90\u0fb5", "\u0fb9")
+def unicode_reorder_page(txt):
+    """
+    Same as unicode_reorder() but for a whole page: the diacritics are pushed after the
+    first main letter at the beginning of all the syllables, not just at the beginning
+    of the string. The result is the same as cutting the page after each character that
+    is not a letter or a diacritic (tsheg, space, etc.) and applying unicode_reorder() on
+    each part, valid being False if one of the parts is not valid.
+
+    The reordering only moves characters, so positions in the page stay valid.
+    """
+    txt = LEADING_DIACRITICS_PAGE_RE.sub(r"\2\1", txt)
+    return reorder_stacks(txt)
+
+# Substitutions are lists of (pattern, replacement) applied in order, the pattern
+# being either a string (replaced with str.replace) or a compiled regex (replaced
+# with re.sub). They are kept as data so that they can be compiled, see
+# normalizer_bo_compiled.py
+
+def apply_substitutions(s, substitutions):
+    for pattern, replacement in substitutions:
+        if isinstance(pattern, str):
+            s = s.replace(pattern, replacement)
+        else:
+            s = pattern.sub(replacement, s)
+    return s
+
+# first, unify Unicode form:
+# http://www.unicode.org/faq/normalization.html
+# https://unicode.org/reports/tr15/
+# https://unicode.org/charts/normalization/chart_Tibetan.html
+# although for some reason this chart considers 0f0c -> 0f0b in NFD
+#
+# deprecated or discouraged characters
+UNICODE_DISCOURAGED_SUBSTITUTIONS = [
+    ("\u0f73", "\u0f71\u0f72"), # use is discouraged
+    ("\u0f75", "\u0f71\u0f74"), # use is discouraged
+    ("\u0f77", "\u0fb2\u0f71\u0f80"), # deprecated
+    ("\u0f79", "\u0fb3\u0f71\u0f80"), # deprecated
+    ("\u0f81", "\u0f71\u0f80") # use is discouraged
+]
+
+UNICODE_NFD_SUBSTITUTIONS = [
+    ("\u0f43", "\u0f42\u0fb7"),
+    ("\u0f4d", "\u0f4c\u0fb7"),
+    ("\u0f52", "\u0f51\u0fb7"),
+    ("\u0f57", "\u0f56\u0fb7"),
+    ("\u0f5c", "\u0f5b\u0fb7"),
+    ("\u0f69", "\u0f40\u0fb5"),
+    ("\u0f76", "\u0fb2\u0f80"),
+    ("\u0f78", "\u0fb3\u0f80"),
+    ("\u0f93", "\u0f92\u0fb7"),
+    ("\u0f9d", "\u0f9c\u0fb7"),
+    ("\u0fa2", "\u0fa1\u0fb7"),
+    ("\u0fa7", "\u0fa6\u0fb7"),
+    ("\u0fac", "\u0fab\u0fb7"),
+    ("\u0fb9", "\u0f90\u0fb5")
+]
+
+UNICODE_NFC_SUBSTITUTIONS = [(decomposed, composed) for composed, decomposed in UNICODE_NFD_SUBSTITUTIONS]
+
+UNICODE_FINAL_SUBSTITUTIONS = [
     # 0f00 has not been marked as a composed character in Unicode
     # This is something that is now seen as a mistake, but it cannot be
     # changed because of Unicode change policies.
-    s = s.replace("\u0f00", "\u0f68\u0f7c\u0f7e")
+    ("\u0f00", "\u0f68\u0f7c\u0f7e"),
     # ra does't transform into a small rago before nya or la, so using 0f65
     # does not change its graphical representation in that case
-    s = s.replace("\u0f65\u0f99", "\u0f62\u0f99")
-    s = s.replace("\u0f65\u0fb3", "\u0f62\u0fb3")
-    s, valid = unicode_reorder(s)
-    return s, valid
+    ("\u0f65\u0f99", "\u0f62\u0f99"),
+    ("\u0f65\u0fb3", "\u0f62\u0fb3")
+]
 
-def normalize_graphical(s):
+def get_normalize_unicode_substitutions(form="nfd"):
     """
-    These substitutions normalize things that have the same
-    graphical representation
+    Returns the substitutions done in normalize_unicode() before the reordering
     """
+    form_substitutions = UNICODE_NFD_SUBSTITUTIONS if form == "nfd" else UNICODE_NFC_SUBSTITUTIONS
+    return UNICODE_DISCOURAGED_SUBSTITUTIONS + form_substitutions + UNICODE_FINAL_SUBSTITUTIONS
+
+def normalize_unicode(s, form="nfd"):
+    s = apply_substitutions(s, get_normalize_unicode_substitutions(form))
+    s, valid = unicode_reorder(s)
+    return s, valid
+
+GRAPHICAL_SUBSTITUTIONS = [
     # no graphical distinction between 0f0b and 0f0c
-    s = s.replace("\u0f0c", "\u0f0b")
+    ("\u0f0c", "\u0f0b"),
     # double shad is just two shad
-    s = s.replace("\u0f0e", "\u0f0d\u0f0d")
+    ("\u0f0e", "\u0f0d\u0f0d"),
     # the distinction between 0f38 and 0f27 is semantic but rarely
     # distinguished graphically and often completely missed by inputters
-    s = s.replace("\u0f38", "\u0f27")
+    ("\u0f38", "\u0f27"),
     # /!\ some fonts don't display these combinations in the exact same way
     # but since there's no semantic distinction and the graphical variation
     # is unclear, it seems safe
-    s = s.replace("\u0f7a\u0f7a", "\u0f7b")
-    s = s.replace("\u0f7c\u0f7c", "\u0f7d")
+    ("\u0f7a\u0f7a", "\u0f7b"),
+    ("\u0f7c\u0f7c", "\u0f7d"),
     # the diference between 0f71 and 0fb0 is often very ambiguous when
     # looking at original sources. We normalize them in order to
     # make the data coherent:
     # no 0f71 in the middle of stacks, only 0fb0
-    s = re.sub(r"[\u0f71]([\u0f8d-\u0fac\u0fae\u0fb0\u0fb3-\u0fbc])", "\u0fb0\\1", s)
+    (re.compile(r"[\u0f71]([\u0f8d-\u0fac\u0fae\u0fb0\u0fb3-\u0fbc])"), "\u0fb0\\1"),
     # no 0fb0 at the end of stacks, only 0f71
-    s = re.sub(r"[\u0fb0]([^\u0f8d-\u0fac\u0fae\u0fb0\u0fb3-\u0fbc]|$)", "\u0f71\\1", s)
+    (re.compile(r"[\u0fb0]([^\u0f8d-\u0fac\u0fae\u0fb0\u0fb3-\u0fbc]|$)"), "\u0f71\\1")
     # things we do not normalize:
     # 0f74+0f71 -> 0f71+0f74, because the combination appears sometimes in the sources
     # for instance སུྰ in https://adarsha.dharma-treasure.org/kdbs/jiangkangyur/pbs/2618229
     # same for 0fb1+0f71 since the combination also appears
     # for instance སཱྱ on https://adarsha.dharma-treasure.org/kdbs/jiangkangyur?pbId=2627013
-    return s
+]
+
+def normalize_graphical(s):
+    """
+    These substitutions normalize things that have the same
+    graphical representation
+    """
+    return apply_substitutions(s, GRAPHICAL_SUBSTITUTIONS)
 
 def normalize_punctuation(s, use_gter_shad=False, original_eol=True):
     # normalize spaces
@@ -232,47 +288,60 @@ def normalize_punctuation(s, use_gter_shad=False, original_eol=True):
     # TODO
     return s
 
+PUNCTUATION_TOKEN_ALWAYS_EOL_SUBSTITUTIONS = [
+    # normalize spaces (except new lines)
+    (re.compile(r"[^\S\r\n]+"), " "),
+    # normalize new line characters
+    ("\r\n", "\n")
+]
+
+PUNCTUATION_TOKEN_ALWAYS_NO_EOL_SUBSTITUTIONS = [
+    # remove all yig mgo: 0f01+diacritic?, 0f02-0f07, 0fd0-0fd1, 0fd3-0fd4
+    # as well as their surrounding punctuation: space, 0f0d-0f11, 0f14
+    (re.compile(r"[ \u0f0d-\u0f11\u0f14]*[\u0f01-\u0f07\u0fd0\u0fd1\u0fd3\u0fd4]+[ \u0f0d-\u0f11\u0f14\u0f71-\u0f87]*"), ""),
+    # ensure space after ཀ, ག and ཤ at end of line so that it merges well with the following one
+    # remove line breaks and spaces at beginning of lines
+    (re.compile(r"([ཀགཤ][\u0f71-\u0f87]*)\n"), r"\1 "),
+    # remove new line + all punctuation at beginning of line
+    (re.compile(r"(?:^|\n|\r\n)[\u0f0b-\u0f14\s]+"), ""),
+    # normalize spaces
+    (re.compile(r"\s+"), " "),
+    # since the token comes from the tokenizer, normal tshegs are merges with the previous token
+    # so the tshegs in the strings typically come from padding at the end of a line, which we want
+    # to remove if we don't keep the end of lines
+    ("\u0f0b", ""),
+    # 0f11 is just a normal shad that appears in some cases at the beginning of a page,
+    # mostly when there is just one syllable before the shad on the first line, but it
+    # has no semantic significance, it should be turned into a normal shad when combining
+    # multiple texts
+    ("\u0f11", "\u0f0d")
+]
+
+PUNCTUATION_TOKEN_ALWAYS_FINAL_SUBSTITUTIONS = [
+    # normalization of 0f0c and 0f0e are done through the usual normalization
+    # replace shads with surrounding spaces by a simple shad with a space after
+    (re.compile(r"( *[\u0f0d] *)+"), "\u0f0d ")
+]
+
+def get_punctuation_token_always_substitutions(keep_eol=True):
+    eol_substitutions = PUNCTUATION_TOKEN_ALWAYS_EOL_SUBSTITUTIONS if keep_eol else PUNCTUATION_TOKEN_ALWAYS_NO_EOL_SUBSTITUTIONS
+    return eol_substitutions + PUNCTUATION_TOKEN_ALWAYS_FINAL_SUBSTITUTIONS
+
 def normalize_punctuation_token_always(s, keep_eol=True):
     """
     Here we assume we have a token that comes out of the TibetanTokenizer
     """
-    # normalize spaces
-    if keep_eol:
-        # normalize spaces (except new lines)
-        s = re.sub(r"[^\S\r\n]+", " ", s)
-        # normalize new line characters
-        s = s.replace("\r\n", "\n")
-    else:
-        # remove all yig mgo: 0f01+diacritic?, 0f02-0f07, 0fd0-0fd1, 0fd3-0fd4
-        # as well as their surrounding punctuation: space, 0f0d-0f11, 0f14
-        s = re.sub(r"[ \u0f0d-\u0f11\u0f14]*[\u0f01-\u0f07\u0fd0\u0fd1\u0fd3\u0fd4]+[ \u0f0d-\u0f11\u0f14\u0f71-\u0f87]*", "", s)
-        # ensure space after ཀ, ག and ཤ at end of line so that it merges well with the following one
-        # remove line breaks and spaces at beginning of lines
-        s = re.sub(r"([ཀགཤ][\u0f71-\u0f87]*)\n", r"\1 ", s)
-        # remove new line + all punctuation at beginning of line
-        s = re.sub(r"(?:^|\n|\r\n)[\u0f0b-\u0f14\s]+", "", s)
-        # normalize spaces
-        s = re.sub(r"\s+", " ", s)
-        # since the token comes from the tokenizer, normal tshegs are merges with the previous token
-        # so the tshegs in the strings typically come from padding at the end of a line, which we want
-        # to remove if we don't keep the end of lines
-        s = s.replace("\u0f0b", "")
-        # 0f11 is just a normal shad that appears in some cases at the beginning of a page,
-        # mostly when there is just one syllable before the shad on the first line, but it
-        # has no semantic significance, it should be turned into a normal shad when combining
-        # multiple texts
-        s = s.replace("\u0f11", "\u0f0d")
-    # normalization of 0f0c and 0f0e are done through the usual normalization
-    # replace shads with surrounding spaces by a simple shad with a space after
-    s = re.sub(r"( *[\u0f0d] *)+", "\u0f0d ", s)
-    return s
+    return apply_substitutions(s, get_punctuation_token_always_substitutions(keep_eol))
 
-def normalize_punctuation_token_pre_token_diff(s, keep_eol=True):
+PUNCTUATION_TOKEN_PRE_TOKEN_DIFF_SUBSTITUTIONS = [
     # fold different types of shad into regular shad
-    s = re.sub(r"[\u0f0f-\u0f14]", "\u0f0d", s)
-    s = s.replace("\u0fd2", "\u0f0b")
-    s = s.replace("\n", "")
-    return s
+    (re.compile(r"[\u0f0f-\u0f14]"), "\u0f0d"),
+    ("\u0fd2", "\u0f0b"),
+    ("\n", "")
+]
+
+def normalize_punctuation_token_pre_token_diff(s, keep_eol=True):
+    return apply_substitutions(s, PUNCTUATION_TOKEN_PRE_TOKEN_DIFF_SUBSTITUTIONS)
 
 
 def normalize_unusual(s):
@@ -333,83 +402,86 @@ OLD_TIB_P3 = re.compile(r"([ཀ-ཐདྷ-ཕབྷཙ-ཟཡ-ྼ])ག([ིྀ][^ཀ-
 # see also https://github.com/tibetan-nlp/tibcg3/issues/6
 OLD_TIB_P4 = re.compile(r"([ཀ-ྼ][ཀ-ྼ]+)([ཀ-ཟཡ-ཬ])([ོེིྀུ])")
 
+OLD_TIB_SUBSTITUTIONS = [
+    (OLD_TIB_P1, r"\1ས་ཏེ"),
+    (OLD_TIB_P2, r"\1་ཏ\2"),
+    (OLD_TIB_P3, r"\1ག་ག\2"),
+    (OLD_TIB_P4, r"\1\2་\2\3"),
+    ("ོེ", "ོའི"),
+    ("བགྱིསྣ", "བགྱིས་ན"),
+    ("རབལ", "རབ་ལ"),
+    ("མཆིསྣ", "མཆིས་ན"),
+    # s = s.replace("མོལ", "མོ་ལ") indicated in the doc, but would conflict with other things
+    ("ཐོགསླ", "ཐོག་སླ"),
+    ("ལྕེབསའོ", "ལྕེབས་སོ"),
+    ("གཤེགསའོ", "གཤེགས་སོ"),
+    ("བཏགསའོ", "བཏགས་སོ"),
+    ("ལསྩོགསྟེ", "ལ་སྩོགས་སྟེ"),
+    # builder.add("མའང", "མ་འང") indicated but more or less useless
+    ("མྱི", "མི"),
+    ("མྱེ", "མེ"),
+    ("གསྩན", "གསན"),
+    ("གསྩང", "གསང"),
+    ("སྩོགས", "སོགས"),
+    ("སྩུབ", "སུབ"),
+    ("སྩང", "སང"),
+    ("སྩངས", "སངས"),
+    ("གསྩུག", "གསུག"),
+    ("བསྩག", "བསག"),
+    ("མཀ", "མཁ"),
+    ("མཅ", "མཆ"),
+    ("མཏ", "མཐ"),
+    ("མཙ", "མཚ"),
+    ("འཀ", "འཁ"),
+    ("འཅ", "འཆ"),
+    ("འཏ", "འཐ"),
+    ("འཔ", "འཕ"),
+    ("འཙ", "འཚ"),
+    ("དཁ", "དཀ"),
+    ("དཕ", "དཔ"),
+    ("གཆ", "གཅ"),
+    ("གཐ", "གཏ"),
+    ("གཚ", "གཙ"),
+    ("བཁ", "བཀ"),
+    ("བཆ", "བཅ"),
+    ("བཐ", "བཏ"),
+    ("བཚ", "བཙ"),
+    ("སྑ", "སྐ"),
+    ("སྠ", "སྟ"),
+    ("སྥ", "སྤ"),
+    ("སྪ", "སྩ"),
+    ("རྑ", "རྐ"),
+    ("རྪ", "རྩ"),
+    ("རྠ", "རྟ"),
+    ("ལྑ", "ལྐ"),
+    ("ལྖ", "ལྕ"),
+    ("ལྠ", "ལྟ"),
+    ("ལྥ", "ལྤ"),
+    ("པྱག", "ཕྱག"),
+    ("པྱི", "ཕྱི"),
+    ("པོ་ཉ", "ཕོ་ཉ"),
+    ("དམག་ཕོན", "དམག་དཔོན"),
+    ("པོག་པ", "ཕོག་པ"),
+    ("ཕོ་བྲང", "པོ་བྲང"),
+    ("བལ་ཕོ", "བལ་པོ"),
+    ("ཕལ་ཕོ", "ཕལ་པོ"),
+    ("རྩང་ཅེན", "རྩང་ཆེན"),
+    ("ལོ་ཕར", "ལོ་པར"),
+    ("བློན་ཅེ", "བློན་ཆེ"),
+    ("ཞལ་ཅེ", "ཞལ་ཆེ"),
+    ("མེར་ཁེ", "མེར་ཀེ"),
+    ("ལོ་ཆིག", "ལོ་གཅིག"),
+    ("ཆེད་པོ", "ཆེན་པོ"),
+    ("ཅེད་པོ", "ཆེན་པོ"),
+    ("ཅེན་པོ", "ཆེན་པོ")
+]
+
 def normalize_old_tib(s):
     """
     Normalizes Old Tibetan strings into classical Tibetan
     /! should be applied before tokenization as it introduces tshegs 
     """
-    s = OLD_TIB_P1.sub(r"\1ས་ཏེ", s)
-    s = OLD_TIB_P2.sub(r"\1་ཏ\2", s)
-    s = OLD_TIB_P3.sub(r"\1ག་ག\2", s)
-    s = OLD_TIB_P4.sub(r"\1\2་\2\3", s)
-    s = s.replace("ོེ", "ོའི")
-    s = s.replace("བགྱིསྣ", "བགྱིས་ན")
-    s = s.replace("རབལ", "རབ་ལ")
-    s = s.replace("མཆིསྣ", "མཆིས་ན")
-    # s = s.replace("མོལ", "མོ་ལ") indicated in the doc, but would conflict with other things
-    s = s.replace("ཐོགསླ", "ཐོག་སླ")
-    s = s.replace("ལྕེབསའོ", "ལྕེབས་སོ")
-    s = s.replace("གཤེགསའོ", "གཤེགས་སོ")
-    s = s.replace("བཏགསའོ", "བཏགས་སོ")
-    s = s.replace("ལསྩོགསྟེ", "ལ་སྩོགས་སྟེ")
-    # builder.add("མའང", "མ་འང") indicated but more or less useless
-    s = s.replace("མྱི", "མི")
-    s = s.replace("མྱེ", "མེ")
-    s = s.replace("གསྩན", "གསན")
-    s = s.replace("གསྩང", "གསང")
-    s = s.replace("སྩོགས", "སོགས")
-    s = s.replace("སྩུབ", "སུབ")
-    s = s.replace("སྩང", "སང")
-    s = s.replace("སྩངས", "སངས")
-    s = s.replace("གསྩུག", "གསུག")
-    s = s.replace("བསྩག", "བསག")
-    s = s.replace("མཀ", "མཁ")
-    s = s.replace("མཅ", "མཆ")
-    s = s.replace("མཏ", "མཐ")
-    s = s.replace("མཙ", "མཚ")
-    s = s.replace("འཀ", "འཁ")
-    s = s.replace("འཅ", "འཆ")
-    s = s.replace("འཏ", "འཐ")
-    s = s.replace("འཔ", "འཕ")
-    s = s.replace("འཙ", "འཚ")
-    s = s.replace("དཁ", "དཀ")
-    s = s.replace("དཕ", "དཔ")
-    s = s.replace("གཆ", "གཅ")
-    s = s.replace("གཐ", "གཏ")
-    s = s.replace("གཚ", "གཙ")
-    s = s.replace("བཁ", "བཀ")
-    s = s.replace("བཆ", "བཅ")
-    s = s.replace("བཐ", "བཏ")
-    s = s.replace("བཚ", "བཙ")
-    s = s.replace("སྑ", "སྐ")
-    s = s.replace("སྠ", "སྟ")
-    s = s.replace("སྥ", "སྤ")
-    s = s.replace("སྪ", "སྩ")
-    s = s.replace("རྑ", "རྐ")
-    s = s.replace("རྪ", "རྩ")
-    s = s.replace("རྠ", "རྟ")
-    s = s.replace("ལྑ", "ལྐ")
-    s = s.replace("ལྖ", "ལྕ")
-    s = s.replace("ལྠ", "ལྟ")
-    s = s.replace("ལྥ", "ལྤ")
-    s = s.replace("པྱག", "ཕྱག")
-    s = s.replace("པྱི", "ཕྱི")
-    s = s.replace("པོ་ཉ", "ཕོ་ཉ")
-    s = s.replace("དམག་ཕོན", "དམག་དཔོན")
-    s = s.replace("པོག་པ", "ཕོག་པ")
-    s = s.replace("ཕོ་བྲང", "པོ་བྲང")
-    s = s.replace("བལ་ཕོ", "བལ་པོ")
-    s = s.replace("ཕལ་ཕོ", "ཕལ་པོ")
-    s = s.replace("རྩང་ཅེན", "རྩང་ཆེན")
-    s = s.replace("ལོ་ཕར", "ལོ་པར")
-    s = s.replace("བློན་ཅེ", "བློན་ཆེ")
-    s = s.replace("ཞལ་ཅེ", "ཞལ་ཆེ")
-    s = s.replace("མེར་ཁེ", "མེར་ཀེ")
-    s = s.replace("ལོ་ཆིག", "ལོ་གཅིག")
-    s = s.replace("ཆེད་པོ", "ཆེན་པོ")
-    s = s.replace("ཅེད་པོ", "ཆེན་པོ")
-    s = s.replace("ཅེན་པོ", "ཆེན་པོ")
-    return s
+    return apply_substitutions(s, OLD_TIB_SUBSTITUTIONS)
 
 def test_normalize_old_tib(s):
     assert(normalize_old_tib("དྲངསྟེ") == "དྲངས་ཏེ")
@@ -421,37 +493,40 @@ def normalize_bo_token(s):
     remove_tsheg(s)
     normalize_lenient(s)
 
-def normalize_lenient(s):
+LENIENT_SUBSTITUTIONS = [
     # remove some marks
-    s = re.sub(r"[\u0f35\u0f37\u0f39]", "", s)
+    (re.compile(r"[\u0f35\u0f37\u0f39]"), ""),
     # retroflex -> dental
-    s = s.replace("ཊ", "ཏ")
-    s = s.replace("ཋ", "ཐ")
-    s = s.replace("ཌ", "ད")
-    s = s.replace("ཎ", "ན")
-    s = s.replace("ྚ", "ྟ")
-    s = s.replace("ྛ", "ྠ")
-    s = s.replace("ྜ", "ྡ")
-    s = s.replace("ྞ", "ྣ")
-    s = s.replace("ཥ", "ཤ")
-    s = s.replace("ྵ" , "ྴ") # requires NFD
+    ("ཊ", "ཏ"),
+    ("ཋ", "ཐ"),
+    ("ཌ", "ད"),
+    ("ཎ", "ན"),
+    ("ྚ", "ྟ"),
+    ("ྛ", "ྠ"),
+    ("ྜ", "ྡ"),
+    ("ྞ", "ྣ"),
+    ("ཥ", "ཤ"),
+    ("ྵ", "ྴ"), # requires NFD
     # normalize non-semantic graphical variation
-    s = s.replace("ྻ", "ྱ")
-    s = s.replace("ྼ", "ྲ")
-    s = s.replace("ཪ", "ར")
+    ("ྻ", "ྱ"),
+    ("ྼ", "ྲ"),
+    ("ཪ", "ར"),
     # a common Sanskrit normalization is r+repeated consonnant
-    s = re.sub(r"ར([\u0f90-\u0fbc])\1", r"ར\1", s)
+    (re.compile(r"ར([\u0f90-\u0fbc])\1"), r"ར\1"),
     # anusvara / anunasika normalization
-    s = s.replace("\u0f82", "\u0f7e")
-    s = s.replace("\u0f83", "\u0f7e")
-    s = s.replace("\u0f86", "\u0f7e")
+    ("\u0f82", "\u0f7e"),
+    ("\u0f83", "\u0f7e"),
+    ("\u0f86", "\u0f7e"),
     # normalize gigus
-    s = s.replace("\u0f80", "\u0f72") # requires NFD
+    ("\u0f80", "\u0f72"), # requires NFD
     # remove achung and wasur
-    s = s.replace("ཱ", "")
-    s = s.replace("ྺ", "")
-    s = s.replace("ྭ", "")
-    return s
+    ("ཱ", ""),
+    ("ྺ", ""),
+    ("ྭ", "")
+]
+
+def normalize_lenient(s):
+    return apply_substitutions(s, LENIENT_SUBSTITUTIONS)
 
 SUBST_SYLS = None
 
@@ -476,10 +551,11 @@ def normalize_substs(s):
         return substs[s]
     return s
 
+PUNCTUATION_RE = re.compile(r"[\s\u0f0b\u0fd2]")
+
 def remove_punctuation(s):
     # we assume that Unicode normalization already took place
-    s = re.sub(r"[\s\u0f0b\u0fd2]", "", s)
-    return s
+    return PUNCTUATION_RE.sub("", s)
 
 def normalize_ngatadara(s):
     """
@@ -568,7 +644,7 @@ class TibetanNormalizer(Normalizer):
 
     def normalize_always(self, s):
         if HAS_TIBETAN_RE.search(s):
-            s = normalize_unicode(s)
+            s, valid = normalize_unicode(s)
             s = normalize_graphical(s)
         else:
             s = normalize_punctuation_token_always(s, self.keep_eol)
@@ -0,0 +1,183 @@
+import re
+from normalizer_bo import (TibetanNormalizer, HAS_TIBETAN_RE, PUNCTUATION_RE, GRAPHICAL_SUBSTITUTIONS,
+    PUNCTUATION_TOKEN_PRE_TOKEN_DIFF_SUBSTITUTIONS, OLD_TIB_SUBSTITUTIONS, LENIENT_SUBSTITUTIONS,
+    get_normalize_unicode_substitutions, get_punctuation_token_always_substitutions,
+    unicode_reorder, remove_affixes, normalize_substs)
+
+# A plan is a list of stages, each stage being a function taking a string and returning
+# a string. Compiling a list of substitutions (see normalizer_bo.py) gives a plan where:
+# - consecutive literal substitutions that can be applied simultaneously are merged into
+#   a single pass, using str.translate when all the patterns are single characters, and
+#   a regex alternation with a dict lookup otherwise
+# - regexes are compiled once
+# The result of a plan is always the same as the result of apply_substitutions().
+
+def can_overlap(a, b):
+    """
+    Returns True if an occurrence of a and an occurrence of b can share characters
+    """
+    if a in b or b in a:
+        return True
+    for i in range(1, min(len(a), len(b))):
+        if a[-i:] == b[:i] or b[-i:] == a[:i]:
+            return True
+    return False
+
+def can_match_output(pattern, replacement):
+    """
+    Returns True if pattern can match characters coming from replacement
+    once replacement has been inserted in a string
+    """
+    if not replacement:
+        # removing a string can make the two sides of a longer pattern adjacent
+        return len(pattern) > 1
+    return can_overlap(pattern, replacement)
+
+def conflicts_with_group(group, pattern, replacement):
+    """
+    Returns True if the literal substitution (pattern, replacement) cannot be applied
+    simultaneously with the substitutions of the group (applied before it).
+    """
+    for group_pattern, group_replacement in group:
+        if can_match_output(pattern, group_replacement):
+            return True
+        # the patterns could compete for the same characters
+        if group_pattern != pattern and can_overlap(pattern, group_pattern):
+            return True
+    return False
+
+# Most strings do not contain any of the patterns of a stage. Checking this with
+# a regex search is much faster than str.translate() or re.sub() with a function.
+
+def get_translate_stage(group):
+    table = str.maketrans({pattern: replacement for pattern, replacement in group})
+    prefilter = re.compile("[%s]" % "".join(re.escape(pattern) for pattern, _ in group))
+    def translate(s):
+        if prefilter.search(s) is None:
+            return s
+        return s.translate(table)
+    return translate
+
+def get_multi_replace_stage(group):
+    mapping = {}
+    for pattern, replacement in group:
+        mapping.setdefault(pattern, replacement)
+    if len(mapping) == 1:
+        pattern, replacement = next(iter(mapping.items()))
+        def replace(s):
+            return s.replace(pattern, replacement)
+        return replace
+    patterns = sorted(mapping, key=len, reverse=True)
+    regex = re.compile("|".join(re.escape(pattern) for pattern in patterns))
+    def replace_match(m):
+        return mapping[m.group(0)]
+    def multi_replace(s):
+        if regex.search(s) is None:
+            return s
+        return regex.sub(replace_match, s)
+    return multi_replace
+
+def can_apply_before(first, second):
+    """
+    Returns True if the substitutions of second cannot match in the output of the
+    substitutions of first (both being parts of a group that can be applied simultaneously)
+    """
+    for _, replacement in first:
+        for pattern, _ in second:
+            if can_match_output(pattern, replacement):
+                return False
+    return True
+
+def get_group_stages(group):
+    """
+    Returns the stages for a group of literal substitutions that can be applied simultaneously
+    """
+    # the first occurence of a pattern is the only one that can match
+    seen = set()
+    group = [(p, r) for p, r in group if not (p in seen or seen.add(p))]
+    single = [(p, r) for p, r in group if len(p) == 1]
+    multi = [(p, r) for p, r in group if len(p) > 1]
+    if not multi:
+        return [get_translate_stage(single)]
+    if not single or len(group) == 1:
+        return [get_multi_replace_stage(group)]
+    if can_apply_before(multi, single):
+        return [get_multi_replace_stage(multi), get_translate_stage(single)]
+    if can_apply_before(single, multi):
+        return [get_translate_stage(single), get_multi_replace_stage(multi)]
+    return [get_multi_replace_stage(group)]
+
+def get_regex_stage(regex, replacement):
+    def regex_replace(s):
+        return regex.sub(replacement, s)
+    return regex_replace
+
+def compile_substitutions(substitutions):
+    """
+    Returns the plan corresponding to a list of substitutions. Callables can be used
+    in the list instead of substitutions, they are kept as stages.
+    """
+    plan = []
+    group = []
+    def close_group():
+        if group:
+            plan.extend(get_group_stages(group))
+            group.clear()
+    for substitution in substitutions:
+        if callable(substitution):
+            close_group()
+            plan.append(substitution)
+            continue
+        pattern, replacement = substitution
+        if isinstance(pattern, str) and pattern:
+            if conflicts_with_group(group, pattern, replacement):
+                close_group()
+            group.append((pattern, replacement))
+            continue
+        close_group()
+        if isinstance(pattern, str):
+            pattern = re.compile(re.escape(pattern))
+        plan.append(get_regex_stage(pattern, replacement))
+    close_group()
+    return plan
+
+def apply_plan(s, plan):
+    for stage in plan:
+        s = stage(s)
+    return s
+
+def unicode_reorder_str(s):
+    return unicode_reorder(s)[0]
+
+class CompiledTibetanNormalizer(TibetanNormalizer):
+    """
+    Same results as TibetanNormalizer, but the substitutions of each method are compiled
+    into a plan when the normalizer is created instead of being applied one by one.
+    """
+
+    def __init__(self, keep_eol = True, normalize_old_tib = False, normalize_semantic = True):
+        super().__init__(keep_eol, normalize_old_tib, normalize_semantic)
+        self.always_bo_plan = compile_substitutions(get_normalize_unicode_substitutions() + [unicode_reorder_str] + GRAPHICAL_SUBSTITUTIONS)
+        self.always_other_plan = compile_substitutions(get_punctuation_token_always_substitutions(keep_eol))
+        pre_token_diff_bo = [(PUNCTUATION_RE, "")]
+        if normalize_old_tib:
+            pre_token_diff_bo += OLD_TIB_SUBSTITUTIONS
+        pre_token_diff_bo += LENIENT_SUBSTITUTIONS
+        if normalize_semantic:
+            pre_token_diff_bo += [remove_affixes, normalize_substs]
+        self.pre_token_diff_bo_plan = compile_substitutions(pre_token_diff_bo)
+        self.pre_token_diff_other_plan = compile_substitutions(PUNCTUATION_TOKEN_PRE_TOKEN_DIFF_SUBSTITUTIONS)
+        self.pre_token_comparison_plan = compile_substitutions([(PUNCTUATION_RE, "")])
+
+    def normalize_always(self, s):
+        if HAS_TIBETAN_RE.search(s):
+            return apply_plan(s, self.always_bo_plan)
+        return apply_plan(s, self.always_other_plan)
+
+    def normalize_pre_token_diff(self, s):
+        if HAS_TIBETAN_RE.search(s):
+            return apply_plan(s, self.pre_token_diff_bo_plan)
+        return apply_plan(s, self.pre_token_diff_other_plan)
+
+    def normalize_pre_token_comparison(self, s):
+        return apply_plan(s, self.pre_token_comparison_plan)
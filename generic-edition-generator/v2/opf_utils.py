@@ -4,8 +4,14 @@ from openpecha.core.layer import Layer, LayerEnum, PechaMetadata
 from openpecha.core.annotations import OCRConfidence, Pagination, Span, BaseAnnotation
 from tokenizer import Token
 from typing import List
-from bisect import bisect
 from input_filter_position import PositionInputFilter
+from layer_index import LayerIntervalIndex
+from pagination_index import PaginationIndex
+from page_matcher import MinHasher, PageMatcher
+import logging
+import warnings
+
+logger = logging.getLogger('OPFUtils')
 
 class OPSegment:
     """
@@ -27,39 +33,74 @@ class OPSegment:
         return tokenizer.tokenize(inpt)
 
 
-class OPFragmentLayerAccessor():
-
-    def __init__(self, op_segment: OPSegment, layer_type: LayerEnum, can_overlap=False):
-        self.start_chars = []
-        self.start_chars_to_ann = {}
-        layer: Layer = op_segment.op.get_layer(op_segment.base_id, layer_type)
-        if layer is None:
-            return
+def build_layer_index(op: OpenPecha, base_id: str, layer_type: LayerEnum) -> LayerIntervalIndex:
+    """
+    Returns an interval index of the annotations of a layer
+    """
+    starts = []
+    ends = []
+    annotations = []
+    layer: Layer = op.get_layer(base_id, layer_type)
+    if layer is not None:
         for annotation_id, annotation in layer.get_annotations():
             if annotation.span is None:
                 continue
-            # check if annotation is in the interval
-            if annotation.span.end >= op_segment.start and annotation.span.start <= op_segment.end:
-                self.start_chars_to_ann[annotation.span.start] = annotation
-        self.start_chars = sorted(self.start_chars_to_ann.keys())
-        # this only works in the case where annotations don't overlap
-        # TODO: more general case
+            starts.append(annotation.span.start)
+            ends.append(annotation.span.end)
+            annotations.append(annotation)
+    return LayerIntervalIndex(starts, ends, annotations)
+
+class OPLayerIndexes():
+    """
+    The interval indexes of the layers of some OPFs, each one built on its first use. The owner
+    must call reset() when the bases and layers of the OPFs are reset (op.reset_base_and_layers()).
+    """
+
+    def __init__(self):
+        # (id of the op, base id, layer type) -> LayerIntervalIndex
+        self.indexes = {}
+
+    def get(self, op: OpenPecha, base_id: str, layer_type: LayerEnum) -> LayerIntervalIndex:
+        key = (id(op), base_id, layer_type)
+        index = self.indexes.get(key)
+        if index is None:
+            index = build_layer_index(op, base_id, layer_type)
+            self.indexes[key] = index
+        return index
+
+    def reset(self):
+        self.indexes = {}
+
+
+class OPFragmentLayerAccessor():
+    """
+    A view on the annotations of a layer overlapping a segment, annotations can overlap. The
+    layer is indexed by each accessor, or once per base if layer_indexes is passed.
+    """
+
+    def __init__(self, op_segment: OPSegment, layer_type: LayerEnum, can_overlap=None, layer_indexes: OPLayerIndexes = None):
+        """
+        can_overlap: deprecated, overlapping annotations are always supported
+        layer_indexes: the indexes shared by the accessors of the same bases (see OPLayerIndexes)
+        """
+        if can_overlap is not None:
+            warnings.warn("can_overlap is deprecated, overlapping annotations are always supported", DeprecationWarning, stacklevel=2)
+        self.start = op_segment.start
+        self.end = op_segment.end
+        if layer_indexes is not None:
+            self.index = layer_indexes.get(op_segment.op, op_segment.base_id, layer_type)
+        else:
+            self.index = build_layer_index(op_segment.op, op_segment.base_id, layer_type)
 
     def get_annotations_in_range(self, start: int, end: int) -> List[BaseAnnotation]:
-        res = []
-        if len(self.start_chars) == 0:
-            return res
-        start_char_before_i = bisect(self.start_chars, start)
-        if start_char_before_i is None:
-            return res
-        while start_char_before_i < len(self.start_chars):
-            start_char = self.start_chars[start_char_before_i]
-            if start_char > end:
-                return res
-            annotation = self.start_chars_to_ann[start_char]
-            res.append(annotation)
-            start_char_before_i += 1
-        return res
+        """
+        Returns the annotations overlapping both (start, end) and the segment, sorted by start
+        """
+        start = max(start, self.start)
+        end = min(end, self.end)
+        if start > end:
+            return []
+        return self.index.get_annotations_in_range(start, end)
 
 
 class OPCursor:
@@ -67,6 +108,10 @@ class OPCursor:
     A cursor in an opf, has the following components:
     - base layer id
     - start (int)
+
+    The text is collected in a list of chunks and the annotations in lists, they are
+    written in the opf in flush(). Consecutive tokens with the same confidence are
+    merged in one confidence annotation.
     """
     def __init__(self, op: OpenPecha, base_id: str, coord: int):
         self.op = op
@@ -74,42 +119,125 @@ class OPCursor:
         base = op.get_base(self.base_id)
         if base is None:
             base = ""
-        self.base = base
+        self.chunks = [base]
         self.coord = coord
         self.last_page_start = 0
+        # [start, end, confidence] of the confidence runs, the last one can still be extended
+        self.confidence_runs = []
+        # (pagination annotation of the base, start, end)
+        self.pages = []
 
     def append_token(self, token: Token, token_confidence: int):
-        if not token or not token[3]:
+        if not token:
             return
-        self.base += token[3]
-        next_coord = self.coord+len(token[3])
-        if token_confidence is not None:
-            confidence_layer = self.op.get_layer(self.base_id, LayerEnum.ocr_confidence)
-            annotation = OCRConfidence(confidence=token_confidence/100, span=Span(start=self.coord, end=next_coord))
-            confidence_layer.set_annotation(annotation)
+        self.append_string(token[3], token_confidence)
+
+    def append_string(self, s: str, confidence: int):
+        if not s:
+            return
+        self.chunks.append(s)
+        next_coord = self.coord+len(s)
+        if confidence is not None:
+            last_run = self.confidence_runs[-1] if self.confidence_runs else None
+            if last_run is not None and last_run[1] == self.coord and last_run[2] == confidence:
+                last_run[1] = next_coord
+            else:
+                self.confidence_runs.append([self.coord, next_coord, confidence])
         self.coord = next_coord
 
     def end_page(self, base_pagination_annotation):
-        self.base += "\n\n"
-        annotation = Pagination(
-            reference=base_pagination_annotation["reference"],
-            imgnum=base_pagination_annotation["imgnum"],
-            span=Span(start=self.last_page_start, end=self.coord))
-        pagination_layer = self.op.get_layer(self.base_id, LayerEnum.pagination)
-        pagination_layer.set_annotation(annotation)
+        self.chunks.append("\n\n")
+        self.pages.append((base_pagination_annotation, self.last_page_start, self.coord))
         self.coord += 2
         self.last_page_start = self.coord
 
-    def flush(self):
-        self.op.set_base(self.base, self.base_id, update_layer_coordinates=False)
+    def get_base(self) -> str:
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+        return self.chunks[0]
 
+    def flush(self):
+        self.op.set_base(self.get_base(), self.base_id, update_layer_coordinates=False)
+        if self.confidence_runs:
+            confidence_layer = self.op.get_layer(self.base_id, LayerEnum.ocr_confidence)
+            for start, end, confidence in self.confidence_runs:
+                confidence_layer.set_annotation(OCRConfidence(confidence=confidence/100, span=Span(start=start, end=end)))
+            self.confidence_runs = []
+        if self.pages:
+            pagination_layer = self.op.get_layer(self.base_id, LayerEnum.pagination)
+            for base_pagination_annotation, start, end in self.pages:
+                pagination_layer.set_annotation(Pagination(
+                    reference=base_pagination_annotation["reference"],
+                    imgnum=base_pagination_annotation["imgnum"],
+                    span=Span(start=start, end=end)))
+            self.pages = []
 
-def find_annotation_of_reference(layer: Layer, reference: str):
-    for ann in layer.annotations.values():
-        if ann["reference"] == reference:
-            return ann
 
 def find_comparable_base_id(original_op, original_base_id, target_op):
     # for now we assume the bases have the same IDs in all the OPs
     # but that may not always be true
     return original_base_id
+
+def get_page_matcher(op: OpenPecha, base_id: str, pagination_index: PaginationIndex, minhasher: MinHasher, threshold: float) -> PageMatcher:
+    """
+    Returns a PageMatcher of the pages of a base, the keys are the (start, end) of the pages
+    """
+    page_matcher = PageMatcher(minhasher, threshold=threshold)
+    base = op.get_base(base_id)
+    for ann in pagination_index.annotations:
+        start, end = ann["span"]["start"], ann["span"]["end"]
+        page_matcher.add_page((start, end), base[start:end])
+    return page_matcher
+
+def iter_page_segments(base_op: OpenPecha, base_id: str, other_ops: List[OpenPecha], match_threshold: float = None):
+    """
+    Iterates over the pages of a base, yielding for each page its pagination annotation and
+    a tuple of the segments of the page in all the witnesses having it (base_op first).
+
+    The pagination of each witness is indexed once (see PaginationIndex), pages are matched
+    by image reference.
+
+    If match_threshold is set, the pages are also compared on their text (see PageMatcher): the
+    page of a witness with the same reference is only used if its similarity with the base page
+    reaches match_threshold, else (or if there is no page with the same reference) the most similar
+    page of the witness is used. Pages without a similar enough counterpart are logged and left out
+    of the segments, so that unrelated texts are never aligned.
+    """
+    base_pagination = base_op.get_layer(base_id, LayerEnum.pagination)
+    if base_pagination is None:
+        return
+    minhasher = MinHasher() if match_threshold is not None else None
+    other_witnesses = []
+    for other_op in other_ops:
+        other_base_id = find_comparable_base_id(base_op, base_id, other_op)
+        if other_base_id is None:
+            continue
+        other_pagination = other_op.get_layer(other_base_id, LayerEnum.pagination)
+        if other_pagination is None:
+            continue
+        other_pagination_index = PaginationIndex(other_pagination)
+        page_matcher = None
+        if match_threshold is not None:
+            page_matcher = get_page_matcher(other_op, other_base_id, other_pagination_index, minhasher, match_threshold)
+        other_witnesses.append((other_op, other_base_id, other_pagination_index, page_matcher))
+    base = base_op.get_base(base_id) if match_threshold is not None else None
+    for ann in base_pagination.annotations.values():
+        start, end = ann["span"]["start"], ann["span"]["end"]
+        segments = [OPSegment(base_op, base_id, start, end)]
+        # the witnesses share the minhasher, the signature of the base page is computed once
+        signature = None
+        for other_op, other_base_id, other_pagination_index, page_matcher in other_witnesses:
+            span = other_pagination_index.get_span_of_reference(ann["reference"])
+            if page_matcher is not None:
+                if signature is None:
+                    signature = page_matcher.get_signature(base[start:end])
+                matched_span, similarity = page_matcher.match_page(signature, span)
+                if matched_span is None:
+                    logger.warning("page %s of %s has no counterpart in %s (best similarity %.2f)", ann["reference"], base_id, other_op.pecha_id, similarity)
+                elif matched_span != span:
+                    logger.info("page %s of %s matched to %s in %s (similarity %.2f)", ann["reference"], base_id, matched_span, other_op.pecha_id, similarity)
+                span = matched_span
+            if span is None:
+                continue
+            segments.append(OPSegment(other_op, other_base_id, span[0], span[1]))
+        yield ann, tuple(segments)
@@ -0,0 +1,144 @@
+import re
+import zlib
+import numpy as np
+from typing import Dict, Hashable, List, Tuple
+
+# spaces, tshegs, shads and the other marks separating Tibetan syllables
+SYLLABLE_SEPARATORS = re.compile(r"[\s༁-༔]+")
+
+# Mersenne prime 2^31-1, the hash functions are (a*x + b) mod MINHASH_PRIME, a*x fits in 64 bits
+MINHASH_PRIME = (1 << 31) - 1
+
+def get_syllable_shingles(text: str, shingle_size: int = 3) -> np.ndarray:
+    """
+    Returns the hashes of the sequences of shingle_size consecutive syllables of a text (a single
+    shingle if the text has less syllables). The hashes are the same in all processes.
+    """
+    syllables = [s for s in SYLLABLE_SEPARATORS.split(text) if s]
+    if not syllables:
+        return np.zeros(0, dtype=np.uint64)
+    nb_shingles = max(1, len(syllables) - shingle_size + 1)
+    shingles = {"\0".join(syllables[i:i+shingle_size]) for i in range(nb_shingles)}
+    return np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+
+class MinHasher():
+    """
+    Computes the MinHash signatures of sets of shingles: the minimum of nb_hashes random hash
+    functions over the set. The proportion of equal values in the signatures of two sets is an
+    estimate of their Jaccard similarity.
+    """
+
+    def __init__(self, nb_hashes: int = 64, seed: int = 0):
+        self.nb_hashes = nb_hashes
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MINHASH_PRIME, size=(nb_hashes, 1), dtype=np.uint64)
+        self.b = rng.integers(0, MINHASH_PRIME, size=(nb_hashes, 1), dtype=np.uint64)
+
+    def get_signature(self, shingles: np.ndarray) -> np.ndarray:
+        """
+        Returns the signature of a set of shingle hashes, None for an empty set
+        """
+        if len(shingles) == 0:
+            return None
+        return ((self.a * (shingles % MINHASH_PRIME) + self.b) % MINHASH_PRIME).min(axis=1)
+
+def get_signature_similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """
+    Returns the estimated Jaccard similarity of two signatures, 0 if one of them is None
+    """
+    if signature_a is None or signature_b is None:
+        return 0.0
+    return float(np.count_nonzero(signature_a == signature_b)) / len(signature_a)
+
+class PageMatcher():
+    """
+    Index of the pages of a witness by MinHash signature, used to find the page of the witness
+    corresponding to a page of another witness when their image references don't match
+    (shifted, missing or renamed images).
+
+    The signatures are cut into bands of rows_per_band values, pages with the same values in one
+    band are candidates (locality-sensitive hashing), so a page is only compared to a few pages
+    of the witness. The candidates are then compared on their whole signature and the pages with
+    a similarity below threshold are not matched.
+    """
+
+    def __init__(self, minhasher: MinHasher = None, rows_per_band: int = 2, shingle_size: int = 3, threshold: float = 0.3):
+        """
+        minhasher: the same minhasher must be used for all the pages compared, rows_per_band must divide
+                   its number of hashes
+        rows_per_band: less rows per band find pages with a lower similarity but give more candidates
+        threshold: minimal estimated Jaccard similarity of the shingles of two pages to match them
+        """
+        self.minhasher = minhasher if minhasher is not None else MinHasher()
+        self.rows_per_band = rows_per_band
+        self.nb_bands = self.minhasher.nb_hashes // rows_per_band
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        # one dict per band, from the values of the band to the keys of the pages
+        self.buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(self.nb_bands)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def get_signature(self, text: str) -> np.ndarray:
+        return self.minhasher.get_signature(get_syllable_shingles(text, self.shingle_size))
+
+    def get_page_signature(self, key: Hashable) -> np.ndarray:
+        return self.signatures.get(key)
+
+    def get_band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows_per_band = self.rows_per_band
+        return [signature[band_i*rows_per_band:(band_i+1)*rows_per_band].tobytes() for band_i in range(self.nb_bands)]
+
+    def add_page(self, key: Hashable, text: str):
+        """
+        Indexes a page, key identifies the page (ex: its span in the base)
+        """
+        signature = self.get_signature(text)
+        self.signatures[key] = signature
+        if signature is None:
+            return
+        for bucket, band_key in zip(self.buckets, self.get_band_keys(signature)):
+            bucket.setdefault(band_key, []).append(key)
+
+    def get_candidates(self, signature: np.ndarray) -> List[Hashable]:
+        """
+        Returns the keys of the pages sharing at least one band with a signature, in the order
+        they were added
+        """
+        if signature is None:
+            return []
+        candidates = {}
+        for bucket, band_key in zip(self.buckets, self.get_band_keys(signature)):
+            for key in bucket.get(band_key, ()):
+                candidates[key] = True
+        return list(candidates)
+
+    def find_match(self, signature: np.ndarray) -> Tuple[Hashable, float]:
+        """
+        Returns the key of the most similar page to a signature and their similarity, or
+        (None, similarity of the best candidate) if no page reaches the threshold
+        """
+        best_key = None
+        best_similarity = 0.0
+        for key in self.get_candidates(signature):
+            similarity = get_signature_similarity(signature, self.signatures[key])
+            if similarity > best_similarity:
+                best_key = key
+                best_similarity = similarity
+        if best_similarity < self.threshold:
+            return None, best_similarity
+        return best_key, best_similarity
+
+    def match_page(self, signature: np.ndarray, key: Hashable = None) -> Tuple[Hashable, float]:
+        """
+        Returns the page matching a signature: the page key if it is indexed and similar enough
+        (typically the page with the same image reference), else the result of find_match()
+        """
+        if key is not None and key in self.signatures:
+            similarity = get_signature_similarity(signature, self.signatures[key])
+            if similarity >= self.threshold:
+                return key, similarity
+        return self.find_match(signature)
@@ -0,0 +1,44 @@
+from typing import Dict, List
+
+class PaginationIndex():
+    """
+    Index of the annotations of a pagination layer by image reference and by image number,
+    built once per base so that the page of a witness corresponding to a page of another
+    witness is found in constant time.
+
+    Annotations are the dicts of layer.annotations (with span, reference and imgnum). When
+    several annotations have the same reference or imgnum, the first one is kept.
+    """
+
+    def __init__(self, pagination_layer = None):
+        self.annotations: List[Dict] = []
+        self.reference_to_annotation: Dict[str, Dict] = {}
+        self.imgnum_to_annotation: Dict[int, Dict] = {}
+        if pagination_layer is None:
+            return
+        for ann in pagination_layer.annotations.values():
+            self.annotations.append(ann)
+            reference = ann.get("reference")
+            if reference is not None:
+                self.reference_to_annotation.setdefault(reference, ann)
+            imgnum = ann.get("imgnum")
+            if imgnum is not None:
+                self.imgnum_to_annotation.setdefault(imgnum, ann)
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def get_annotation_of_reference(self, reference: str) -> Dict:
+        return self.reference_to_annotation.get(reference)
+
+    def get_annotation_of_imgnum(self, imgnum: int) -> Dict:
+        return self.imgnum_to_annotation.get(imgnum)
+
+    def get_span_of_reference(self, reference: str):
+        """
+        Returns the (start, end) of the page of an image reference, or None
+        """
+        ann = self.reference_to_annotation.get(reference)
+        if ann is None:
+            return None
+        return ann["span"]["start"], ann["span"]["end"]
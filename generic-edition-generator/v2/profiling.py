@@ -0,0 +1,163 @@
+import csv
+import json
+import logging
+import time
+from typing import Dict, List
+
+logger = logging.getLogger('Profiler')
+
+class StageTimer():
+    """
+    Context manager adding the time spent in a stage to the current page of a profiler
+    """
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.add(self.name + "_time", time.perf_counter() - self.start)
+        return False
+
+class Profiler():
+    """
+    Collects timers and counters for each page of a vulgate:
+    - stage timers (in seconds, with a _time suffix), see stage()
+    - counters (number of tokens, matrix dimensions, cache hits, etc.), see add()
+
+    A summary of each base is logged at the end of the base and, if report_path is set, the
+    report of all the pages is saved as JSON (or CSV if report_path ends with .csv), see end_base().
+
+    NullProfiler has the same interface and does nothing, code that computes values only for
+    the profiler can test the enabled attribute.
+    """
+
+    enabled = True
+
+    def __init__(self, report_path: str = None):
+        self.report_path = report_path
+        self.pages: List[Dict] = []
+        # the values of the page being profiled
+        self.current: Dict = {}
+
+    def start_page(self, base_id: str, reference: str):
+        self.current = {"base_id": base_id, "reference": reference}
+
+    def end_page(self, keep: bool = True) -> Dict:
+        """
+        Ends the current page and returns its values, they are added to the report if keep is True.
+        Values added outside of a page are ignored.
+        """
+        page = self.current
+        if keep:
+            self.pages.append(page)
+        self.current = {}
+        return page
+
+    def merge(self, page: Dict):
+        """
+        Adds the values of a page collected by another profiler (ex: in a worker process) to the current page
+        """
+        if not page:
+            return
+        for name, value in page.items():
+            if name not in ("base_id", "reference"):
+                self.add(name, value)
+
+    def stage(self, name: str) -> StageTimer:
+        return StageTimer(self, name)
+
+    def add(self, name: str, value: float = 1):
+        self.current[name] = self.current.get(name, 0) + value
+
+    def get_totals(self, base_id: str = None) -> Dict[str, float]:
+        """
+        Returns the sum of each value over the pages of a base (or all the pages), with the
+        number of pages and the hit rate of the caches
+        """
+        totals = {"pages": 0}
+        for page in self.pages:
+            if base_id is not None and page["base_id"] != base_id:
+                continue
+            totals["pages"] += 1
+            for name, value in page.items():
+                if name not in ("base_id", "reference"):
+                    totals[name] = totals.get(name, 0) + value
+        for cache in ("token_cache", "manifest"):
+            hits = totals.get(cache + "_hits", 0)
+            misses = totals.get(cache + "_misses", 0)
+            if hits + misses > 0:
+                totals[cache + "_hit_rate"] = hits / (hits + misses)
+        return totals
+
+    def get_report(self) -> Dict:
+        return {"totals": self.get_totals(), "pages": self.pages}
+
+    def end_base(self, base_id: str):
+        totals = self.get_totals(base_id)
+        logger.info("base %s: %s", base_id, ", ".join("%s=%s" % (name, round(value, 3)) for name, value in sorted(totals.items())))
+        if self.report_path is not None:
+            if str(self.report_path).endswith(".csv"):
+                self.save_csv(self.report_path)
+            else:
+                self.save_json(self.report_path)
+
+    def save_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.get_report(), f, ensure_ascii=False, indent=1)
+
+    def save_csv(self, path):
+        """
+        Saves one row per page
+        """
+        columns = ["base_id", "reference"]
+        for page in self.pages:
+            for name in page:
+                if name not in columns:
+                    columns.append(name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(self.pages)
+
+class NullStageTimer():
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_STAGE_TIMER = NullStageTimer()
+
+class NullProfiler():
+    """
+    Profiler doing nothing, used when profiling is disabled
+    """
+
+    enabled = False
+
+    def start_page(self, base_id: str, reference: str):
+        pass
+
+    def end_page(self, keep: bool = True) -> Dict:
+        return None
+
+    def merge(self, page: Dict):
+        pass
+
+    def stage(self, name: str) -> NullStageTimer:
+        return NULL_STAGE_TIMER
+
+    def add(self, name: str, value: float = 1):
+        pass
+
+    def end_base(self, base_id: str):
+        pass
+
+NULL_PROFILER = NullProfiler()
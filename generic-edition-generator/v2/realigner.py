@@ -0,0 +1,272 @@
+import numpy as np
+from bisect import bisect_left
+from itertools import accumulate
+from typing import List, Tuple
+from tokenizer import TokenList
+from differ import Diff
+from differ_array import DiffBuilder, get_code_array
+from anchors import get_token_offsets
+
+# score of the cells outside of the band
+OUTSIDE_BAND = -10**9
+
+def get_code_matrix(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the code points of the strings in a matrix padded with -1 (one row per string)
+    and the lengths of the strings
+    """
+    # the strings are typically tokens appearing in several pairs, each one is converted once
+    unique_indexes = {}
+    indexes = [unique_indexes.setdefault(s, len(unique_indexes)) for s in strings]
+    unique_lengths = np.array([len(s) for s in unique_indexes], dtype=np.int64)
+    unique_codes = np.full((len(unique_indexes), max(unique_lengths.max(initial=0), 1)), -1, dtype=np.int32)
+    for i, s in enumerate(unique_indexes):
+        unique_codes[i, :len(s)] = get_code_array(s)
+    indexes = np.array(indexes, dtype=np.int64)
+    return unique_codes[indexes], unique_lengths[indexes]
+
+def get_edit_similarities(a_strings: List[str], b_strings: List[str]) -> np.ndarray:
+    """
+    Returns the normalized edit similarity (1 - Levenshtein distance / length of the longest string)
+    of each pair (a_strings[i], b_strings[i]), as a percentage.
+
+    The distances of all the pairs are computed at once, row by row of the Levenshtein matrix,
+    the insertions in a row being computed with a cumulative minimum.
+    """
+    a_codes, a_lengths = get_code_matrix(a_strings)
+    b_codes, b_lengths = get_code_matrix(b_strings)
+    b_positions = np.arange(b_codes.shape[1] + 1, dtype=np.int32)
+    pair_indexes = np.arange(len(a_strings))
+    # row i of the Levenshtein matrix of each pair: the distances between the first i characters
+    # of a and the first j characters of b
+    row = np.tile(b_positions, (len(a_strings), 1))
+    distances = row[pair_indexes, b_lengths]
+    for i in range(1, a_codes.shape[1] + 1):
+        costs = a_codes[:, i-1, None] != b_codes
+        # deletions and substitutions, then insertions
+        next_row = np.empty_like(row)
+        next_row[:, 0] = i
+        next_row[:, 1:] = np.minimum(row[:, 1:] + 1, row[:, :-1] + costs)
+        row = np.minimum.accumulate(next_row - b_positions, axis=1) + b_positions
+        ending = a_lengths == i
+        distances[ending] = row[pair_indexes[ending], b_lengths[ending]]
+    return np.trunc((1 - distances / np.maximum(np.maximum(a_lengths, b_lengths), 1)) * 100).astype(np.int64)
+
+class BandedRealigner():
+    """
+    Re-aligns the replace hunks of diffs (changes with both deletions and insertions between two
+    equalities). get_next_fdmp_diff_info() pairs the tokens of such hunks by position, the realigner
+    pairs them with a Needleman-Wunsch alignment scoring the edit similarity of the token strings,
+    so that a missing or extra token doesn't shift the following tokens of the hunk.
+
+    The alignment is limited to a band of band_width cells around the diagonal of the hunk (widened by
+    the difference of length of the two sides) and hunks with more than max_hunk_size tokens on one
+    side are left as they are, so that the cost stays proportional to the size of the hunks.
+
+    Only hunks where all the tokens have an increment of 1 are re-aligned. The pairs of tokens are
+    returned as '=' diffs, the same way get_next_fdmp_diff_info() combines overlapping '-' and '+'.
+    """
+
+    def __init__(self, band_width: int = 4, gap_score: int = -40, max_hunk_size: int = 64):
+        """
+        band_width: maximal shift between the tokens of the two sides, in addition to their difference of length
+        gap_score: score of a token aligned with a gap, the score of two aligned tokens is their edit
+                   similarity (from 0 to 100)
+        max_hunk_size: hunks with more tokens on one side are not re-aligned
+        """
+        self.band_width = band_width
+        self.gap_score = gap_score
+        self.max_hunk_size = max_hunk_size
+
+    def get_band(self, nb_base_tokens: int, nb_other_tokens: int) -> Tuple[int, int]:
+        """
+        Returns the minimal and maximal values of j - i for the cells (i, j) of the band
+        """
+        length_difference = nb_other_tokens - nb_base_tokens
+        return min(0, length_difference) - self.band_width, max(0, length_difference) + self.band_width
+
+    def get_band_pairs(self, nb_base_tokens: int, nb_other_tokens: int, base_start: int = 0, other_start: int = 0) -> Tuple[List[int], List[int]]:
+        """
+        Returns the indexes (base_start+i, other_start+j) of the pairs of tokens in the band
+        """
+        band_min, band_max = self.get_band(nb_base_tokens, nb_other_tokens)
+        pairs_i = []
+        pairs_j = []
+        # the hunks are small, lists are faster than numpy here
+        for i in range(nb_base_tokens):
+            j_start = max(0, i + band_min)
+            j_end = min(nb_other_tokens, i + band_max + 1)
+            pairs_i += [base_start + i] * (j_end - j_start)
+            pairs_j += range(other_start + j_start, other_start + j_end)
+        return pairs_i, pairs_j
+
+    def align_tokens(self, base_tokens: TokenList, other_tokens: TokenList) -> List[str]:
+        """
+        Returns the banded Needleman-Wunsch alignment of two token lists, see align()
+        """
+        pairs_i, pairs_j = self.get_band_pairs(len(base_tokens), len(other_tokens))
+        similarities = np.zeros((len(base_tokens), len(other_tokens)), dtype=np.int64)
+        similarities[pairs_i, pairs_j] = get_edit_similarities([base_tokens[i][3] for i in pairs_i], [other_tokens[j][3] for j in pairs_j])
+        return self.align(similarities)
+
+    def align(self, similarities: np.ndarray) -> List[str]:
+        """
+        Returns the banded Needleman-Wunsch alignment of two token lists given the similarities of their
+        pairs of tokens in the band, as a list of operations: '=' for two aligned tokens, '-' for a base
+        token aligned with a gap, '+' for a token of the other witness aligned with a gap
+        """
+        nb_base_tokens, nb_other_tokens = similarities.shape
+        if nb_base_tokens == 1:
+            # the band covers the whole row, the token is aligned with the most similar one
+            # (the last one in case of a tie, like the traceback below)
+            j = nb_other_tokens - 1 - int(similarities[0, ::-1].argmax())
+            return ['+'] * j + ['='] + ['+'] * (nb_other_tokens - j - 1)
+        if nb_other_tokens == 1:
+            i = nb_base_tokens - 1 - int(similarities[::-1, 0].argmax())
+            return ['-'] * i + ['='] + ['-'] * (nb_base_tokens - i - 1)
+        band_min, band_max = self.get_band(nb_base_tokens, nb_other_tokens)
+        gap_score = self.gap_score
+        scores = np.full((nb_base_tokens + 1, nb_other_tokens + 1), OUTSIDE_BAND, dtype=np.int64)
+        # 0: pair, 1: base token with a gap, 2: other token with a gap
+        moves = np.zeros((nb_base_tokens + 1, nb_other_tokens + 1), dtype=np.int8)
+        first_row_end = min(nb_other_tokens, band_max) + 1
+        scores[0, :first_row_end] = np.arange(first_row_end) * gap_score
+        moves[0, 1:] = 2
+        moves[1:, 0] = 1
+        for i in range(1, nb_base_tokens + 1):
+            if i + band_min <= 0:
+                scores[i, 0] = i * gap_score
+            j_start = max(1, i + band_min)
+            j_end = min(nb_other_tokens, i + band_max) + 1
+            if j_start >= j_end:
+                continue
+            js = np.arange(j_start, j_end)
+            pair_scores = scores[i-1, j_start-1:j_end-1] + similarities[i-1, j_start-1:j_end-1]
+            gap_base_scores = scores[i-1, j_start:j_end] + gap_score
+            best = np.maximum(pair_scores, gap_base_scores)
+            # gaps in the base: cumulative maximum, starting from the cell on the left of the band
+            candidates = np.concatenate(([scores[i, j_start-1] - gap_score * (j_start - 1)], best - gap_score * js))
+            row_scores = np.maximum.accumulate(candidates)[1:] + gap_score * js
+            scores[i, j_start:j_end] = row_scores
+            moves[i, j_start:j_end] = np.where(row_scores == pair_scores, 0, np.where(row_scores == gap_base_scores, 1, 2))
+        operations = []
+        i = nb_base_tokens
+        j = nb_other_tokens
+        while i > 0 or j > 0:
+            move = moves[i, j]
+            if move == 0:
+                operations.append('=')
+                i -= 1
+                j -= 1
+            elif move == 1:
+                operations.append('-')
+                i -= 1
+            else:
+                operations.append('+')
+                j -= 1
+        operations.reverse()
+        return operations
+
+    def realign(self, diffs: List[Diff], base_tokens: TokenList, other_tokens: TokenList) -> List[Diff]:
+        """
+        Returns the diffs between the token strings of two token lists with the replace hunks re-aligned.
+        The similarities of the pairs of tokens of all the hunks are computed at once.
+        """
+        base_offsets = get_token_offsets(base_tokens)
+        other_offsets = get_token_offsets(other_tokens)
+        base_unit_counts = get_unit_counts(base_tokens)
+        other_unit_counts = get_unit_counts(other_tokens)
+        # the changes between equalities, with the token ranges of the replace hunks
+        changes = []
+        pairs_i = []
+        pairs_j = []
+        base_pos = 0
+        other_pos = 0
+        diff_i = 0
+        nb_diffs = len(diffs)
+        while diff_i < nb_diffs:
+            op, length = diffs[diff_i]
+            if op == '=':
+                changes.append((length, 0, 0, None, None, 0))
+                base_pos += length
+                other_pos += length
+                diff_i += 1
+                continue
+            minus_c = 0
+            plus_c = 0
+            while diff_i < nb_diffs and diffs[diff_i][0] != '=':
+                if diffs[diff_i][0] == '-':
+                    minus_c += diffs[diff_i][1]
+                else:
+                    plus_c += diffs[diff_i][1]
+                diff_i += 1
+            base_range, other_range = self.get_hunk_token_ranges(base_offsets, base_unit_counts, other_offsets, other_unit_counts, base_pos, minus_c, other_pos, plus_c)
+            nb_pairs = 0
+            if base_range is not None:
+                hunk_pairs_i, hunk_pairs_j = self.get_band_pairs(base_range[1] - base_range[0], other_range[1] - other_range[0], base_range[0], other_range[0])
+                pairs_i += hunk_pairs_i
+                pairs_j += hunk_pairs_j
+                nb_pairs = len(hunk_pairs_i)
+            changes.append((0, minus_c, plus_c, base_range, other_range, nb_pairs))
+            base_pos += minus_c
+            other_pos += plus_c
+        if not pairs_i:
+            return diffs
+        pair_similarities = get_edit_similarities([base_tokens[i][3] for i in pairs_i], [other_tokens[j][3] for j in pairs_j])
+        pairs_i = np.array(pairs_i, dtype=np.int64)
+        pairs_j = np.array(pairs_j, dtype=np.int64)
+        pair_i = 0
+        builder = DiffBuilder()
+        for equal_c, minus_c, plus_c, base_range, other_range, nb_pairs in changes:
+            if base_range is None:
+                builder.add('=', equal_c)
+                builder.add('-', minus_c)
+                builder.add('+', plus_c)
+                continue
+            nb_base_tokens = base_range[1] - base_range[0]
+            nb_other_tokens = other_range[1] - other_range[0]
+            similarities = np.zeros((nb_base_tokens, nb_other_tokens), dtype=np.int64)
+            similarities[pairs_i[pair_i:pair_i+nb_pairs] - base_range[0], pairs_j[pair_i:pair_i+nb_pairs] - other_range[0]] = pair_similarities[pair_i:pair_i+nb_pairs]
+            pair_i += nb_pairs
+            for operation in self.align(similarities):
+                builder.add(operation, 1)
+        return [tuple(diff) for diff in builder.diffs]
+
+    def get_hunk_token_ranges(self, base_offsets: List[int], base_unit_counts: List[int], other_offsets: List[int], other_unit_counts: List[int],
+            base_pos: int, minus_c: int, other_pos: int, plus_c: int):
+        """
+        Returns the ranges of the base tokens and other tokens of a change, (None, None) if the change
+        is not a replace hunk that can be re-aligned
+        """
+        if minus_c == 0 or plus_c == 0 or (minus_c == 1 and plus_c == 1) or max(minus_c, plus_c) > self.max_hunk_size:
+            return None, None
+        base_range = get_token_range(base_offsets, base_unit_counts, base_pos, minus_c)
+        other_range = get_token_range(other_offsets, other_unit_counts, other_pos, plus_c)
+        if base_range is None or other_range is None:
+            return None, None
+        return base_range, other_range
+
+def get_unit_counts(tokens: TokenList) -> List[int]:
+    """
+    Returns the number of tokens with an increment of 1 before each token, with a final
+    element for the whole list
+    """
+    return [0] + list(accumulate(1 if t[2] == 1 else 0 for t in tokens))
+
+def get_token_range(offsets: List[int], unit_counts: List[int], pos: int, length: int) -> Tuple[int, int]:
+    """
+    Returns the indexes of the first and last+1 tokens covering the characters from pos to pos+length
+    of a token string if all these tokens have an increment of 1 and the next token doesn't have an
+    increment of 0, None otherwise. offsets are the offsets of the tokens (see get_token_offsets())
+    and unit_counts the result of get_unit_counts().
+    """
+    start = bisect_left(offsets, pos)
+    end = start + length
+    if end >= len(offsets) or offsets[start] != pos or offsets[end] != pos + length:
+        return None
+    # a token with an increment of 0 before the range has the offset pos, so it would be the first token
+    if unit_counts[end] - unit_counts[start] != length:
+        return None
+    if end + 1 < len(offsets) and offsets[end+1] == offsets[end]:
+        return None
+    return start, end
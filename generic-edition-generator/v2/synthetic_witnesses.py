@@ -0,0 +1,99 @@
+import random
+from typing import List
+from vocabulary import Vocabulary
+from normalizer_bo_compiled import CompiledTibetanNormalizer
+from tokenizer_bo import TibetanTokenizer
+
+# frequent syllables, used to generate seed texts
+SYLLABLES = ["བཀྲ", "ཤིས", "བདེ", "ལེགས", "ཆོས", "ཐམས", "ཅད", "ནམ", "མཁའི", "དཀྱིལ", "ལྟ", "བུར",
+    "རང", "གི", "ཡེ", "ཤེས", "ཀྱིས", "སྦྱངས", "ནས", "སངས", "རྒྱས", "བྱང", "ཆུབ", "སེམས", "དཔའ",
+    "རྒྱལ", "པོ", "འི", "དང", "བ", "པ", "ལ", "སོགས", "མ", "ཡིན", "ཞེས", "བྱ", "སྟོང", "ཉིད",
+    "སྙིང", "རྗེ", "ཐེག", "ཆེན", "དགེ", "སློང", "བླ", "ཡོན", "ཏན", "འདུས", "བྱས", "རྟག"]
+
+# characters often confused by OCR engines, and what they are read as
+OCR_CONFUSIONS = {"ང": ["ད"], "ད": ["ང", "ཏ", "ར"], "ཏ": ["ད"], "ར": ["ད"]}
+
+TSHEG = "་"
+
+def get_seed_text(nb_syllables: int, seed: int = 0) -> str:
+    """
+    Returns a text of nb_syllables syllables separated by tshegs, with a shad every 4 to 12 syllables
+    """
+    rng = random.Random(seed)
+    res = []
+    next_shad = rng.randint(4, 12)
+    for i in range(nb_syllables):
+        res.append(rng.choice(SYLLABLES))
+        if i + 1 == next_shad:
+            res.append("། ")
+            next_shad += rng.randint(4, 12)
+        else:
+            res.append(TSHEG)
+    return "".join(res)
+
+class OCRNoise():
+    """
+    Probabilities of the different OCR errors, per character (confusions, tshegs) or per syllable
+    """
+
+    def __init__(self, confusion: float = 0.02, dropped_tsheg: float = 0.02, line_break: float = 0.01,
+            missing_syllable: float = 0.005, extra_syllable: float = 0.005):
+        self.confusion = confusion
+        self.dropped_tsheg = dropped_tsheg
+        self.line_break = line_break
+        self.missing_syllable = missing_syllable
+        self.extra_syllable = extra_syllable
+
+def add_ocr_noise(text: str, noise: OCRNoise, rng: random.Random) -> str:
+    """
+    Returns the text with random OCR errors:
+    - characters confused with similar ones (see OCR_CONFUSIONS)
+    - dropped tshegs
+    - line breaks inserted after a tsheg
+    - missing syllables and extra syllables
+    """
+    res = []
+    syllables = text.split(TSHEG)
+    for i, syllable in enumerate(syllables):
+        if syllable and rng.random() < noise.missing_syllable:
+            continue
+        if rng.random() < noise.extra_syllable:
+            res.append(rng.choice(SYLLABLES))
+            res.append(TSHEG)
+        for c in syllable:
+            if c in OCR_CONFUSIONS and rng.random() < noise.confusion:
+                c = rng.choice(OCR_CONFUSIONS[c])
+            res.append(c)
+        if i == len(syllables) - 1:
+            break
+        if rng.random() >= noise.dropped_tsheg:
+            res.append(TSHEG)
+        if rng.random() < noise.line_break:
+            res.append("\n")
+    return "".join(res)
+
+def get_synthetic_witnesses(text: str, nb_witnesses: int, noise: OCRNoise = None, seed: int = 0) -> List[str]:
+    """
+    Returns nb_witnesses noisy versions of a text, as different OCRs of the same page would be
+    """
+    noise = noise if noise is not None else OCRNoise()
+    rng = random.Random(seed)
+    return [add_ocr_noise(text, noise, rng) for _ in range(nb_witnesses)]
+
+def get_tokenizer() -> TibetanTokenizer:
+    """
+    Returns a tokenizer for synthetic witnesses, with a new vocabulary and no stop words
+    """
+    return TibetanTokenizer(Vocabulary(), CompiledTibetanNormalizer(), stop_words=[])
+
+def tokenize_witnesses(tokenizer: TibetanTokenizer, witnesses: List[str]):
+    """
+    Returns the token strings and the token lists of the witnesses, as taken by the vulgaligners
+    """
+    token_strings = []
+    token_lists = []
+    for witness in witnesses:
+        token_list, token_string = tokenizer.tokenize(witness)
+        token_strings.append(token_string)
+        token_lists.append(token_list)
+    return token_strings, token_lists
@@ -0,0 +1,34 @@
+from anchors import get_token_offsets, find_anchors, get_windows, longest_increasing_subsequence
+from vulgaligner_fdmp import FDMPVulgaligner
+
+def get_tokens(token_string):
+    return [(i, i+1, 1, c) for i, c in enumerate(token_string)]
+
+def test_lis():
+    assert(longest_increasing_subsequence([]) == [])
+    assert(longest_increasing_subsequence([3, 1, 2, 5, 4]) == [1, 2, 4])
+
+def test_anchors():
+    token_strings = ["ABCDEFGH", "ABXDEFGH", "BCDAEFGH"]
+    token_lists = [get_tokens(ts) for ts in token_strings]
+    offsets_list = [get_token_offsets(tokens) for tokens in token_lists]
+    # A is not in the same order in the third witness, C is not in the second
+    anchors = find_anchors(token_strings, token_lists, offsets_list)
+    assert(anchors == [[1, 1, 0], [3, 3, 2], [4, 4, 4], [5, 5, 5], [6, 6, 6], [7, 7, 7]])
+    windows = get_windows(token_lists, anchors, 4)
+    assert(windows == [[(0, 4), (0, 4), (0, 4)], [(4, 8), (4, 8), (4, 8)]])
+
+def test_streaming_alignment():
+    token_strings = ["ABCDEFGHIJ", "ABXDEFGHJ", "ABCDEYFGHIJ"]
+    token_lists = [get_tokens(ts) for ts in token_strings]
+    aligner = FDMPVulgaligner(window_size=3, anchor_ngram_size=1)
+    matrices = list(aligner.iter_alignment_matrices(list(token_strings), list(token_lists)))
+    assert(len(matrices) > 1)
+    rows = [row for matrix in matrices for row in matrix]
+    expected_rows = FDMPVulgaligner().get_alignment_matrix(list(token_strings), list(token_lists))
+    assert(rows == expected_rows)
+
+if __name__ == "__main__":
+    test_lis()
+    test_anchors()
+    test_streaming_alignment()
@@ -0,0 +1,42 @@
+import random
+from base_selector import BaseSelector, MedoidBaseSelector
+from vulgaligner_fdmp import FDMPVulgaligner
+from consensus_run import get_alignment_rows
+from synthetic_witnesses import OCRNoise, get_seed_text, get_synthetic_witnesses, add_ocr_noise, get_tokenizer, tokenize_witnesses
+
+class FixedBaseSelector(BaseSelector):
+
+    def __init__(self, base_i):
+        self.base_i = base_i
+
+    def get_base_index(self, token_strings, token_lists):
+        return self.base_i
+
+def test_medoid():
+    selector = MedoidBaseSelector()
+    assert(selector.get_base_index(["abcd", "abce", "xyzt"], []) == 0)
+    assert(selector.get_base_index(["xyzt", "abcd", "abcde"], []) == 1)
+    distances = selector.get_distance_matrix(["abcd", "abce", ""])
+    assert((distances == distances.T).all())
+    assert(distances[0, 0] == 0 and distances[0, 1] == 2 and distances[0, 2] == 2)
+    # a first witness much noisier than the others is not chosen
+    seed_text = get_seed_text(300)
+    noisy_witness = add_ocr_noise(seed_text, OCRNoise(0.1, 0.1, 0.02, 0.03, 0.03), random.Random(0))
+    token_strings, token_lists = tokenize_witnesses(get_tokenizer(), [noisy_witness] + get_synthetic_witnesses(seed_text, 3))
+    assert(selector.get_base_index(token_strings, token_lists) != 0)
+
+def test_column_order():
+    token_strings, token_lists = tokenize_witnesses(get_tokenizer(), get_synthetic_witnesses(get_seed_text(300), 4))
+    expected_rows = FDMPVulgaligner(array_matrix=True).get_alignment_matrix(list(token_strings), list(token_lists)).to_rows()
+    for base_i in range(4):
+        aligner = FDMPVulgaligner(array_matrix=True, verify=True, base_selector=FixedBaseSelector(base_i), min_consensus_run_size=2)
+        # verify checks that each column has the tokens of the witness at the same index
+        rows = aligner.get_alignment_matrix(list(token_strings), list(token_lists)).to_rows()
+        token_matrix, consensus_runs = aligner.get_compressed_alignment(token_strings, token_lists)
+        assert(get_alignment_rows(token_matrix, consensus_runs) == rows)
+        if base_i == 0:
+            assert(rows == expected_rows)
+
+if __name__ == "__main__":
+    test_medoid()
+    test_column_order()
@@ -0,0 +1,36 @@
+import random
+import numpy as np
+from types import SimpleNamespace
+from confidence_index import RangeMinTable, SegmentConfidence, NO_CONFIDENCE
+
+def get_annotation(start, end, confidence):
+    return SimpleNamespace(span=SimpleNamespace(start=start, end=end), confidence=confidence)
+
+def test_range_min_table():
+    rng = np.random.default_rng(0)
+    for n in [1, 2, 3, 7, 8, 33]:
+        values = rng.integers(0, 100, n).astype(np.int8)
+        table = RangeMinTable(values)
+        starts = []
+        ends = []
+        for start in range(n):
+            for end in range(start+1, n+1):
+                assert(table.get_min(start, end) == values[start:end].min())
+                starts.append(start)
+                ends.append(end)
+        expected = [values[s:e].min() for s, e in zip(starts, ends)]
+        assert(table.get_mins(np.array(starts), np.array(ends)).tolist() == expected)
+
+def test_segment_confidence():
+    # overlapping annotations, the second one starts before the segment
+    annotations = [get_annotation(10, 14, 0.9), get_annotation(5, 12, 0.5), get_annotation(16, 20, None), get_annotation(18, 30, 0.755)]
+    confidence = SegmentConfidence(10, 25, annotations)
+    assert(confidence.get_lowest_confidence(10, 12) == 50)
+    assert(confidence.get_lowest_confidence(12, 14) == 90)
+    assert(confidence.get_lowest_confidence(14, 18) is None)
+    assert(confidence.get_lowest_confidence(14, 19) == 75)
+    assert(confidence.get_lowest_confidences(np.array([10, 12, 14]), np.array([12, 14, 18])).tolist() == [50, 90, NO_CONFIDENCE])
+
+if __name__ == "__main__":
+    test_range_min_table()
+    test_segment_confidence()
@@ -0,0 +1,57 @@
+import random
+from differ_array import ArrayDiffer, DiffBuilder, get_code_array
+from differ_fdmp import FDMPDiffer
+from vulgaligner_fdmp import FDMPVulgaligner
+from test_vulgaligner_fdmp import get_matrix, TOKEN_STRINGS
+
+def assert_valid_diffs(a, b, diffs):
+    a_i = 0
+    b_i = 0
+    for op, n in diffs:
+        assert(n > 0)
+        if op == '=':
+            assert(a[a_i:a_i+n] == b[b_i:b_i+n])
+            a_i += n
+            b_i += n
+        elif op == '-':
+            a_i += n
+        else:
+            b_i += n
+    assert(a_i == len(a) and b_i == len(b))
+
+def get_lcs_len(a, b):
+    lengths = [[0] * (len(b)+1) for _ in range(len(a)+1)]
+    for i in range(len(a)):
+        for j in range(len(b)):
+            lengths[i+1][j+1] = lengths[i][j] + 1 if a[i] == b[j] else max(lengths[i][j+1], lengths[i+1][j])
+    return lengths[-1][-1]
+
+def test_array_differ():
+    differ = ArrayDiffer()
+    assert(differ.diff("ABC", "ADC") == [('=', 1), ('-', 1), ('+', 1), ('=', 1)])
+    assert(differ.diff("", "AB") == [('+', 2)])
+    assert(differ.diff([1, 2, 3], [1, 2, 3]) == [('=', 3)])
+    # codes that are not valid characters for fdmp
+    assert(differ.diff(chr(70000) + chr(0xd800), chr(70000) + "A") == [('=', 1), ('-', 1), ('+', 1)])
+    assert(get_code_array(chr(70000)).tolist() == [70000])
+    rng = random.Random(0)
+    for _ in range(1000):
+        a = "".join(rng.choice("ABCD") for _ in range(rng.randint(0, 15)))
+        b = "".join(rng.choice("ABCD") for _ in range(rng.randint(0, 15)))
+        assert_valid_diffs(a, b, differ.diff(a, b))
+        # the Myers diff alone is minimal
+        builder = DiffBuilder()
+        differ.myers([ord(c) for c in a], [ord(c) for c in b], builder)
+        diffs = builder.get_diffs()
+        assert_valid_diffs(a, b, diffs)
+        assert(sum(n for op, n in diffs if op == '=') == get_lcs_len(a, b))
+
+def test_array_differ_alignment():
+    # the diffs are the same as fdmp's on simple cases
+    for token_string in TOKEN_STRINGS[1:]:
+        assert(ArrayDiffer().diff(TOKEN_STRINGS[0], token_string) == FDMPDiffer().diff(TOKEN_STRINGS[0], token_string))
+    assert(get_matrix(FDMPVulgaligner(differ=ArrayDiffer())) == get_matrix(FDMPVulgaligner()))
+
+if __name__ == "__main__":
+    test_array_differ()
+    test_array_differ_alignment()
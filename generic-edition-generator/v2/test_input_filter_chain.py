@@ -1,6 +1,9 @@
 from input_filter import InputFilter
 from input_filter_position import PositionInputFilter
 from input_filter_pattern import PatternInputFilter
+from tokenizer_gen import GenericTokenizer
+from normalizer_gen import GenericNormalizer
+from vocabulary import Vocabulary
 import re
 import bisect
 
@@ -68,11 +71,33 @@ def test_regex_chained():
     assert(filtered.correct_position(1) == 1) # b|efghc -> b|bbcc
     assert(filtered.correct_position(0) == 0) # |befghc -> |bbbcc
 
+def test_position_map():
+    input_str = "abbbccbcdd"
+    def get_chain():
+        filtered = PositionInputFilter(input_str, 1, 9)
+        filtered = PatternInputFilter(filtered, re.compile("[ab]c"), "d")
+        filtered = PatternInputFilter(filtered, re.compile("bd"), "efgh")
+        return PatternInputFilter(filtered, re.compile("c+"), "")
+    filtered = get_chain()
+    s = filtered.get_string()
+    position_map = filtered.get_position_map(len(s))
+    reference = get_chain()
+    reference.get_string()
+    assert(position_map.tolist() == [reference.correct_position(i) for i in range(len(s)+1)])
+
+def test_tokenize_filtered():
+    input_str = "The  quick brown  fox jumped"
+    tokenizer = GenericTokenizer(Vocabulary(), GenericNormalizer())
+    tokens, _ = tokenizer.tokenize(PatternInputFilter(PositionInputFilter(input_str, 5), re.compile(" +"), " "))
+    assert([input_str[t[0]:t[1]] for t in tokens] == ["quick ", "brown  ", "fox ", "jumped"])
+
 def test():
     test_position_simple()
     test_position_combined()
     test_regex_simple()
     test_bisect()
     test_regex_chained()
+    test_position_map()
+    test_tokenize_filtered()
 
 test()
\ No newline at end of file
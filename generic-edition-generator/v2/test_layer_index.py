@@ -0,0 +1,29 @@
+import random
+from layer_index import LayerIntervalIndex
+
+def test_layer_index():
+    rng = random.Random(0)
+    for _ in range(200):
+        starts = []
+        ends = []
+        for _ in range(rng.randint(0, 30)):
+            start = rng.randint(0, 100)
+            starts.append(start)
+            ends.append(start + rng.randint(0, 15))
+        annotations = list(range(len(starts)))
+        index = LayerIntervalIndex(starts, ends, annotations)
+        for _ in range(20):
+            start = rng.randint(0, 110)
+            end = start + rng.randint(0, 10)
+            expected = sorted((a for a in annotations if starts[a] <= end and ends[a] >= start), key=lambda a: (starts[a], a))
+            assert(index.get_annotations_in_range(start, end) == expected)
+
+def test_layer_index_overlap():
+    index = LayerIntervalIndex([10, 0, 5], [15, 100, 6], ["b", "a", "c"])
+    assert(index.get_annotations_in_range(7, 8) == ["a"])
+    assert(index.get_annotations_in_range(6, 10) == ["a", "c", "b"])
+    assert(LayerIntervalIndex([], [], []).get_annotations_in_range(0, 10) == [])
+
+if __name__ == "__main__":
+    test_layer_index()
+    test_layer_index_overlap()
@@ -0,0 +1,56 @@
+import random
+from normalizer_bo import TibetanNormalizer, apply_substitutions
+from normalizer_bo_compiled import CompiledTibetanNormalizer, compile_substitutions, apply_plan
+
+# the strings of the assert_conv() cases in normalizer_bo.py
+UNICODE_TEST_STRINGS = ["ཷ", "ཀཾཱོུ", "མུྰྃ",
+    "དྷུྰ", "སོྱ", "་ཾ", "ཥྙེེ",
+    "༁ྃ"]
+
+TOKEN_TEST_STRINGS = ["བཀྲ་", "ཤིས་", "རྒྱལ་པོའི་", "ཊཱི་ཀཱ", "རྦྦ", "༄༅། །", "། \n", "ཀ\nའ", " \r\n ",
+    "༑ ", "༌༎", "ཱླ", "ྰ", "གཅལྟོ", "དྲངསྟེ", "གགྀ་", "བསྩག", "མཀར་", "abc"]
+
+def get_random_strings(nb_strings, seed=0):
+    rng = random.Random(seed)
+    alphabet = [chr(c) for c in range(0x0f00, 0x0fd9)] + [" ", "\n", "\r", "a"]
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8))) for _ in range(nb_strings)]
+
+def assert_same_normalization(s, normalizer, compiled_normalizer):
+    assert(normalizer.normalize_always(s) == compiled_normalizer.normalize_always(s))
+    assert(normalizer.normalize_pre_token_diff(s) == compiled_normalizer.normalize_pre_token_diff(s))
+    assert(normalizer.normalize_pre_token_comparison(s) == compiled_normalizer.normalize_pre_token_comparison(s))
+
+def test_compiled_normalizer():
+    test_strings = UNICODE_TEST_STRINGS + TOKEN_TEST_STRINGS + get_random_strings(2000)
+    for keep_eol in [True, False]:
+        for normalize_old_tib in [True, False]:
+            for normalize_semantic in [True, False]:
+                normalizer = TibetanNormalizer(keep_eol, normalize_old_tib, normalize_semantic)
+                compiled_normalizer = CompiledTibetanNormalizer(keep_eol, normalize_old_tib, normalize_semantic)
+                for s in test_strings:
+                    assert_same_normalization(s, normalizer, compiled_normalizer)
+
+def test_compile_substitutions():
+    # on a small alphabet, patterns and replacements often overlap
+    rng = random.Random(0)
+    def random_string(min_len, max_len):
+        return "".join(rng.choice("abc") for _ in range(rng.randint(min_len, max_len)))
+    for _ in range(2000):
+        substitutions = [(random_string(1, 3), random_string(0, 3)) for _ in range(rng.randint(1, 6))]
+        plan = compile_substitutions(substitutions)
+        for _ in range(10):
+            s = random_string(0, 10)
+            assert(apply_plan(s, plan) == apply_substitutions(s, substitutions))
+
+def test_compile_substitutions_merge():
+    substitutions = [("a", "x"), ("b", "z"), ("cd", "y"), ("e", "")]
+    plan = compile_substitutions(substitutions)
+    assert(len(plan) == 2)
+    assert(apply_plan("abcde", plan) == "xzy")
+    # "ab" can match the output of the first substitution
+    assert(len(compile_substitutions([("c", "a"), ("ab", "x")])) == 2)
+
+if __name__ == "__main__":
+    test_compiled_normalizer()
+    test_compile_substitutions()
+    test_compile_substitutions_merge()
@@ -1,6 +1,11 @@
 from vulgatizer_op_ocr import VulgatizerOPTibOCR
+from vocabulary_persistent import PersistentVocabulary
 from openpecha.core.pecha import OpenPechaFS
+from pathlib import Path
+import json
 import logging
+import multiprocessing
+import tempfile
 
 # change logging with:
 #logging.basicConfig(level=logging.DEBUG)
@@ -20,4 +25,66 @@ def test_merger():
 	vulgatizer.add_op_witness(OpenPechaFS("../test/opfs/I003/I003.opf"))
 	vulgatizer.create_vulgate()
 
-test_merger()
\ No newline at end of file
+
+def get_nb_manifest_pages(manifest_path):
+	with open(manifest_path, encoding="utf-8") as f:
+		return sum(len(base["pages"]) for base in json.load(f)["bases"].values())
+
+def test_failed_page_not_cached():
+	with tempfile.TemporaryDirectory() as dir_path:
+		manifest_path = str(Path(dir_path) / "manifest.json")
+		def run(fail_once):
+			vulgatizer = VulgatizerOPTibOCR(OpenPechaFS(str(Path(dir_path) / "ITEST.opf")), manifest_path=manifest_path)
+			vulgatizer.add_op_witness(OpenPechaFS("../test/opfs/I001/I001.opf"))
+			vulgatizer.add_op_witness(OpenPechaFS("../test/opfs/I002/I002.opf"))
+			if fail_once:
+				# the alignment of the first page raises, the next ones succeed
+				iter_compressed_alignments = vulgatizer.aligner.iter_compressed_alignments
+				calls = []
+				def fail_first_call(token_strings, token_lists):
+					calls.append(True)
+					if len(calls) == 1:
+						raise ValueError("alignment failure")
+					return iter_compressed_alignments(token_strings, token_lists)
+				vulgatizer.aligner.iter_compressed_alignments = fail_first_call
+			vulgatizer.create_vulgate()
+			return get_nb_manifest_pages(manifest_path)
+		nb_pages = run(True)
+		# the failed page was not cached and is aligned again
+		assert(run(False) == nb_pages + 1)
+
+
+def test_manifest_rerun():
+	with tempfile.TemporaryDirectory() as dir_path:
+		output_path = str(Path(dir_path) / "ITEST.opf")
+		manifest_path = str(Path(dir_path) / "manifest.json")
+		def run():
+			vulgatizer = VulgatizerOPTibOCR(OpenPechaFS(output_path), manifest_path=manifest_path)
+			vulgatizer.add_op_witness(OpenPechaFS("../test/opfs/I001/I001.opf"))
+			vulgatizer.add_op_witness(OpenPechaFS("../test/opfs/I002/I002.opf"))
+			vulgatizer.create_vulgate()
+			output = OpenPechaFS(output_path)
+			return {base_id: output.get_base(base_id) for base_id in output.meta.bases}
+		vulgates = run()
+		# the pages are read from the vulgate of the first run, the base is not appended twice
+		assert(run() == vulgates)
+
+
+def test_parallel_spawn():
+	with tempfile.TemporaryDirectory() as dir_path:
+		vocabulary_path = Path(dir_path) / "vocabulary"
+		PersistentVocabulary().save(vocabulary_path)
+		# the witnesses and the memory-mapped vocabulary are pickled to be sent to the page workers
+		vulgatizer = VulgatizerOPTibOCR(OpenPechaFS(str(Path(dir_path) / "ITEST.opf")), vocabulary=PersistentVocabulary.load(vocabulary_path),
+			nb_page_workers=2, mp_context=multiprocessing.get_context("spawn"))
+		vulgatizer.add_op_witness(OpenPechaFS("../test/opfs/I001/I001.opf"))
+		vulgatizer.add_op_witness(OpenPechaFS("../test/opfs/I002/I002.opf"))
+		vulgatizer.create_vulgate()
+
+# with the spawn start method, the page workers import the main module again, the tests
+# must not run when it is imported
+if __name__ == "__main__":
+	test_merger()
+	test_failed_page_not_cached()
+	test_manifest_rerun()
+	test_parallel_spawn()
@@ -0,0 +1,37 @@
+from page_matcher import PageMatcher, MinHasher, get_syllable_shingles, get_signature_similarity
+from synthetic_witnesses import get_seed_text, get_synthetic_witnesses
+
+def test_syllable_shingles():
+    assert(len(get_syllable_shingles("ཀ་ཁ་ག་ང།", 3)) == 2)
+    assert(len(get_syllable_shingles("ཀ་ཁ", 3)) == 1)
+    assert(len(get_syllable_shingles("། ", 3)) == 0)
+    assert(set(get_syllable_shingles("ཀ་ཁ་ག").tolist()) == set(get_syllable_shingles("ཀ ཁ\nག།").tolist()))
+
+def test_signature_similarity():
+    minhasher = MinHasher()
+    signature = minhasher.get_signature(get_syllable_shingles(get_seed_text(200)))
+    assert(get_signature_similarity(signature, signature) == 1.0)
+    assert(get_signature_similarity(signature, minhasher.get_signature(get_syllable_shingles(""))) == 0.0)
+    assert(get_signature_similarity(signature, minhasher.get_signature(get_syllable_shingles(get_seed_text(200, 1)))) < 0.2)
+
+def test_page_matcher():
+    pages = [get_seed_text(300, seed) for seed in range(50)]
+    page_matcher = PageMatcher()
+    # the pages of the witness are renamed (shifted by one) and the last one is missing
+    for i, page in enumerate(pages[:-1]):
+        page_matcher.add_page("I%d.jpg" % (i + 1), get_synthetic_witnesses(page, 1, seed=i)[0])
+    assert(len(page_matcher) == 49)
+    for i, page in enumerate(pages):
+        signature = page_matcher.get_signature(get_synthetic_witnesses(page, 1, seed=100+i)[0])
+        key, similarity = page_matcher.match_page(signature, "I%d.jpg" % i)
+        if i == 49:
+            assert(key is None)
+            assert(similarity < page_matcher.threshold)
+        else:
+            assert(key == "I%d.jpg" % (i + 1))
+            assert(similarity >= page_matcher.threshold)
+
+if __name__ == "__main__":
+    test_syllable_shingles()
+    test_signature_similarity()
+    test_page_matcher()
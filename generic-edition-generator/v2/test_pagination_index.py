@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+from pagination_index import PaginationIndex
+
+def get_page(start, end, imgnum, reference):
+    return {"span": {"start": start, "end": end}, "imgnum": imgnum, "reference": reference}
+
+def test_pagination_index():
+    layer = SimpleNamespace(annotations={
+        "a": get_page(0, 887, 1, "I1.jpg"),
+        "b": get_page(893, 2285, 3, "I3.jpg"),
+        "c": get_page(2291, 2300, 3, "I3.jpg")})
+    index = PaginationIndex(layer)
+    assert(len(index) == 3)
+    assert(index.get_span_of_reference("I3.jpg") == (893, 2285))
+    assert(index.get_span_of_reference("I2.jpg") is None)
+    assert(index.get_annotation_of_imgnum(1)["reference"] == "I1.jpg")
+    assert(index.get_annotation_of_imgnum(3) is layer.annotations["b"])
+    assert(len(PaginationIndex(None)) == 0)
+
+if __name__ == "__main__":
+    test_pagination_index()
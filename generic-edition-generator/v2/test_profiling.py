@@ -0,0 +1,48 @@
+import csv
+import json
+import tempfile
+from pathlib import Path
+from profiling import Profiler, NULL_PROFILER
+from vulgaligner_fdmp import FDMPVulgaligner
+from test_vulgaligner_fdmp import get_matrix, TOKEN_STRINGS
+
+def test_profiler():
+    profiler = Profiler()
+    expected = get_matrix(FDMPVulgaligner())
+    aligner = FDMPVulgaligner(profiler=profiler)
+    for reference in ["I1.jpg", "I2.jpg"]:
+        profiler.start_page("B1", reference)
+        assert(get_matrix(aligner) == expected)
+        profiler.end_page()
+    totals = profiler.get_totals("B1")
+    assert(totals["pages"] == 2)
+    assert(totals["matrices"] == 2)
+    assert(totals["matrix_rows"] == 2 * len(expected))
+    assert(totals["matrix_cells"] == 2 * len(expected) * len(TOKEN_STRINGS))
+    assert(all(totals[stage + "_time"] > 0 for stage in ["diff", "cells", "fill"]))
+    # values from a worker
+    profiler.start_page("B2", "I1.jpg")
+    profiler.merge({"base_id": "B2", "reference": "I1.jpg", "token_cache_hits": 3, "token_cache_misses": 1})
+    profiler.end_page()
+    assert(profiler.get_totals("B2")["token_cache_hit_rate"] == 0.75)
+    with tempfile.TemporaryDirectory() as dir_path:
+        profiler.report_path = Path(dir_path) / "report.json"
+        profiler.end_base("B2")
+        with open(profiler.report_path, encoding="utf-8") as f:
+            assert(json.load(f)["totals"]["pages"] == 3)
+        profiler.report_path = Path(dir_path) / "report.csv"
+        profiler.end_base("B2")
+        with open(profiler.report_path, encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert([row["reference"] for row in rows] == ["I1.jpg", "I2.jpg", "I1.jpg"])
+
+def test_null_profiler():
+    expected = get_matrix(FDMPVulgaligner())
+    assert(get_matrix(FDMPVulgaligner(profiler=NULL_PROFILER)) == expected)
+    with NULL_PROFILER.stage("diff"):
+        NULL_PROFILER.add("tokens", 2)
+    assert(NULL_PROFILER.end_page() is None)
+
+if __name__ == "__main__":
+    test_profiler()
+    test_null_profiler()
@@ -0,0 +1,56 @@
+from realigner import BandedRealigner, get_edit_similarities
+from vulgaligner_fdmp import FDMPVulgaligner
+from consensus_run import get_alignment_rows
+
+def get_tokens(strings):
+    res = []
+    start = 0
+    for s in strings:
+        res.append((start, start + len(s), 1, s))
+        start += len(s) + 1
+    return res
+
+def test_edit_similarities():
+    assert(get_edit_similarities(["abc", "kitten", "", "a", "ab"], ["abd", "sitting", "x", "", "ab"]).tolist() == [66, 57, 0, 0, 100])
+
+def test_align_tokens():
+    realigner = BandedRealigner()
+    base_tokens = get_tokens("aa bb cc dd ee".split())
+    other_tokens = get_tokens("aa xx yy bb cc dd ee".split())
+    assert(realigner.align_tokens(base_tokens, other_tokens) == ['=', '+', '+', '=', '=', '=', '='])
+    assert(realigner.align_tokens(other_tokens, base_tokens) == ['=', '-', '-', '=', '=', '=', '='])
+
+def test_realign():
+    realigner = BandedRealigner()
+    base_tokens = get_tokens("aa bb cc zz".split())
+    other_tokens = get_tokens("ab xx bb cd zz".split())
+    # a replace hunk of 3 tokens against 4, aligned by position by get_next_fdmp_diff_info()
+    diffs = [('-', 3), ('+', 4), ('=', 1)]
+    assert(realigner.realign(diffs, base_tokens, other_tokens) == [('=', 1), ('+', 1), ('=', 3)])
+    # the hunks with only deletions or insertions are left as they are
+    diffs = [('=', 1), ('+', 1), ('=', 3)]
+    assert(realigner.realign(diffs, base_tokens, other_tokens) == diffs)
+
+def test_realigned_alignment_ocr():
+    from vocabulary import Vocabulary
+    from normalizer_bo_compiled import CompiledTibetanNormalizer
+    from tokenizer_bo import TibetanTokenizer
+    from synthetic_witnesses import get_seed_text, get_synthetic_witnesses
+    tokenizer = TibetanTokenizer(Vocabulary(), CompiledTibetanNormalizer(), stop_words=[])
+    for seed in range(10):
+        token_strings = []
+        token_lists = []
+        for witness in get_synthetic_witnesses(get_seed_text(300, seed), 4, seed=seed):
+            token_list, token_string = tokenizer.tokenize(witness)
+            token_strings.append(token_string)
+            token_lists.append(token_list)
+        aligner = FDMPVulgaligner(array_matrix=True, verify=True, min_consensus_run_size=2, realigner=BandedRealigner())
+        token_matrix, consensus_runs = aligner.get_compressed_alignment(token_strings, token_lists)
+        assert(get_alignment_rows(token_matrix, consensus_runs) == aligner.get_alignment_matrix(token_strings, token_lists).to_rows())
+        tokenizer.reset()
+
+if __name__ == "__main__":
+    test_edit_similarities()
+    test_align_tokens()
+    test_realign()
+    test_realigned_alignment_ocr()
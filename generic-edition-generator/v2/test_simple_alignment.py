@@ -7,7 +7,7 @@ import logging
 
 #logging.basicConfig(level=logging.DEBUG)
 
-def test_cmp_to_rows(strings, stop_words = []):
+def get_aligned_rows(strings, stop_words = []):
     normalizer = GenericNormalizer()
     vocabulary = Vocabulary()
     tokenizer = GenericTokenizer(vocabulary, normalizer, stop_words)
@@ -22,8 +22,8 @@ def test_cmp_to_rows(strings, stop_words = []):
     matrix = aligner.get_alignment_matrix(token_strings, token_lists)
     return column_matrix_to_row_matrix(matrix)
 
-def test_rows(strings, expected_rows, stop_words = []):
-    rows = test_cmp_to_rows(strings, stop_words)
+def assert_rows(strings, expected_rows, stop_words = []):
+    rows = get_aligned_rows(strings, stop_words)
     for i, row in enumerate(rows):
         text_row = token_row_to_text_row(row, strings[i])
         assert(text_row == expected_rows[i])
@@ -36,7 +36,7 @@ def test_simple():
         ['The ', 'quick ', 'brown ', 'fox ', 'jumped ', 'over ', 'the ', '-', 'lazy ', 'dog', '.'],
         ['The ', '-', 'brown ', 'fox ', 'jumped ', 'over ', 'the ', 'very ', 'lazy ', 'dog', '.']
     ]
-    test_rows(strings, expected)
+    assert_rows(strings, expected)
     strings = []
     strings.append("quick brown fox jumped over the lazy dog.")
     strings.append("The quick brown fox jumped over the very lazy dog.")
@@ -44,7 +44,7 @@ def test_simple():
         ['-', 'quick ', 'brown ', 'fox ', 'jumped ', 'over ', 'the ', '-', 'lazy ', 'dog', '.'],
         ['The ', 'quick ', 'brown ', 'fox ', 'jumped ', 'over ', 'the ', 'very ', 'lazy ', 'dog', '.']
     ]
-    test_rows(strings, expected)
+    assert_rows(strings, expected)
     strings = []
     strings.append("the fast")
     strings.append("the quick")
@@ -52,7 +52,7 @@ def test_simple():
         ['the ', 'fast'],
         ['the ', 'quick']
     ]
-    test_rows(strings, expected)
+    assert_rows(strings, expected)
     strings = []
     strings.append("the")
     strings.append("the quick")
@@ -60,7 +60,7 @@ def test_simple():
         ['the', '-'],
         ['the ', 'quick']
     ]
-    test_rows(strings, expected)
+    assert_rows(strings, expected)
     strings = []
     strings.append("and")
     strings.append("and the quick")
@@ -68,7 +68,7 @@ def test_simple():
         ['and', '-', '-'],
         ['and ', 'the ', 'quick']
     ]
-    test_rows(strings, expected, ["the"])
+    assert_rows(strings, expected, ["the"])
     # test zero-increment tokens aligned in the middle
     strings = []
     strings.append("over the lazy")
@@ -77,7 +77,7 @@ def test_simple():
         ['over ', 'the ', 'lazy'],
         ['over ', 'the ', 'lazy']
     ]
-    test_rows(strings, expected, ["the"])
+    assert_rows(strings, expected, ["the"])
     # test zero-increment token at the end of the first string
     strings = []
     strings.append("over lazy the")
@@ -86,7 +86,7 @@ def test_simple():
         ['over ', '-', 'lazy ', 'the'],
         ['over ', 'the ', 'lazy', '-']
     ]
-    test_rows(strings, expected, ["the"])
+    assert_rows(strings, expected, ["the"])
     # test zero-increment token at the end of the second string
     strings = []
     strings.append("over the lazy")
@@ -95,7 +95,7 @@ def test_simple():
         ['over ', 'the ', 'lazy', '-'],
         ['over ', '-', 'lazy ', 'the']
     ]
-    test_rows(strings, expected, ["the"])
+    assert_rows(strings, expected, ["the"])
 
 def test_complex():
     aligner = FDMPVulgaligner()
@@ -113,5 +113,5 @@ def test_complex():
     assert(row_matrix == expected_row_matrix)
 
 test_simple()
-#test_complex()
+test_complex()
 
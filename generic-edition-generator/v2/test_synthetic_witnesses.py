@@ -0,0 +1,15 @@
+from synthetic_witnesses import get_seed_text, get_synthetic_witnesses, OCRNoise, TSHEG
+
+def test_synthetic_witnesses():
+    text = get_seed_text(200)
+    assert(text == get_seed_text(200))
+    assert(text.count(TSHEG) + text.count("།") == 200)
+    witnesses = get_synthetic_witnesses(text, 3, seed=1)
+    assert(witnesses == get_synthetic_witnesses(text, 3, seed=1))
+    assert(len(set(witnesses)) == 3 and text not in witnesses)
+    assert(get_synthetic_witnesses(text, 1, OCRNoise(0, 0, 0, 0, 0)) == [text])
+    noisy = get_synthetic_witnesses(text, 1, OCRNoise(confusion=0, dropped_tsheg=1, line_break=0, missing_syllable=0, extra_syllable=0))[0]
+    assert(TSHEG not in noisy)
+
+if __name__ == "__main__":
+    test_synthetic_witnesses()
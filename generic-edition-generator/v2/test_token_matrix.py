@@ -0,0 +1,32 @@
+from token_matrix import ArrayTokenMatrix
+from vulgaligner_fdmp import FDMPVulgaligner
+from utils import column_matrix_to_row_matrix
+
+def test_array_matrix():
+    rows = [
+        [(0, 2, 1, "ab"), None, (0, 2, 1, "ab")],
+        [None, (3, 4, 0, "c"), (2, 3, 1, "d")]
+    ]
+    matrix = ArrayTokenMatrix.from_rows(rows)
+    assert(len(matrix) == 2)
+    assert(matrix.nb_columns == 3)
+    assert(matrix[1] == rows[1])
+    assert(matrix.to_rows() == rows)
+    assert(list(matrix) == rows)
+    assert(matrix.get_string(0, 1) is None)
+    assert(matrix.codes[0, 0] == matrix.codes[0, 2])
+    assert(column_matrix_to_row_matrix(matrix) == column_matrix_to_row_matrix(rows))
+
+def test_array_alignment():
+    token_strings = ["ABCDE", "XABDYE", "ABCCDE"]
+    token_lists = [[(i, i+1, 1, c) for i, c in enumerate(ts)] for ts in token_strings]
+    # zero-increment token
+    token_lists[1].insert(3, (10, 11, 0, "z"))
+    list_matrix = FDMPVulgaligner().get_alignment_matrix(list(token_strings), list(token_lists))
+    array_matrix = FDMPVulgaligner(array_matrix=True).get_alignment_matrix(list(token_strings), list(token_lists))
+    assert(isinstance(array_matrix, ArrayTokenMatrix))
+    assert(array_matrix.to_rows() == list_matrix)
+
+if __name__ == "__main__":
+    test_array_matrix()
+    test_array_alignment()
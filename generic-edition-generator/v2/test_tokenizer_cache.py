@@ -0,0 +1,29 @@
+from tokenizer_bo import TibetanTokenizer
+from normalizer_bo import TibetanNormalizer
+from vocabulary import Vocabulary
+
+TEST_STRING = "ཡེ་ཤེས་ཀྱིས་སྦྱངས་ནས། ཆོས་ཐམས་ཅད་ནམ་མཁའི་དཀྱིལ་ལྟ་བུར་ིརང་གི་ཡེ་ཤེས་"
+
+def test_token_cache():
+    tokenizer = TibetanTokenizer(Vocabulary(), TibetanNormalizer())
+    uncached_tokenizer = TibetanTokenizer(Vocabulary(), TibetanNormalizer(), cache_size=0)
+    assert(uncached_tokenizer.get_cache_stats() is None)
+    for _ in range(3):
+        assert(tokenizer.tokenize(TEST_STRING) == uncached_tokenizer.tokenize(TEST_STRING))
+        # the cache stays valid when the vocabulary is reset
+        tokenizer.reset()
+        uncached_tokenizer.reset()
+        # different order of the tokens in the vocabulary
+        assert(tokenizer.tokenize(TEST_STRING[12:]) == uncached_tokenizer.tokenize(TEST_STRING[12:]))
+    stats = tokenizer.get_cache_stats()
+    assert(stats["hits"] > stats["misses"])
+    assert(0 < stats["hit_rate"] < 1)
+
+def test_token_cache_size():
+    tokenizer = TibetanTokenizer(Vocabulary(), TibetanNormalizer(), cache_size=2)
+    tokenizer.tokenize(TEST_STRING)
+    assert(tokenizer.get_cache_stats()["size"] == 2)
+
+if __name__ == "__main__":
+    test_token_cache()
+    test_token_cache_size()
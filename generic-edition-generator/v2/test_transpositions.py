@@ -0,0 +1,54 @@
+import random
+import numpy as np
+from transpositions import get_suffix_array, get_lcp_array, find_common_blocks, TranspositionDetector
+from vulgaligner_fdmp import FDMPVulgaligner
+from consensus_run import get_alignment_rows
+from synthetic_witnesses import get_seed_text, get_synthetic_witnesses, get_tokenizer, tokenize_witnesses, TSHEG
+
+def test_suffix_array():
+    rng = random.Random(0)
+    for _ in range(100):
+        codes = [rng.randint(0, 3) for _ in range(rng.randint(1, 40))]
+        suffix_array = get_suffix_array(np.array(codes)).tolist()
+        assert(suffix_array == sorted(range(len(codes)), key=lambda i: codes[i:]))
+        lcps = get_lcp_array(codes, suffix_array)
+        for i, lcp in enumerate(lcps):
+            a = codes[suffix_array[i]:]
+            b = codes[suffix_array[i+1]:]
+            assert(a[:lcp] == b[:lcp] and (lcp == min(len(a), len(b)) or a[lcp] != b[lcp]))
+
+def test_common_blocks():
+    a = np.array([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+    b = np.array([5, 6, 7, 9, 0, 1, 2, 3, 8])
+    assert(find_common_blocks(a, b, 3) == [(0, 4, 4), (5, 0, 3)])
+    assert(find_common_blocks(a, b, 5) == [])
+
+def test_move_blocks():
+    detector = TranspositionDetector(min_block_size=3, min_moved_size=4)
+    tokens = [(i, i+1, 1, c) for i, c in enumerate("efghabcdij")]
+    token_string, moved_tokens, moved_blocks = detector.move_blocks("abcdefghij", "efghabcdij", tokens)
+    assert(token_string == "abcdefghij")
+    assert(moved_blocks == [(0, 4, 4)] or moved_blocks == [(4, 0, 4)])
+    assert(sorted(moved_tokens) == tokens)
+    assert("".join(t[3] for t in moved_tokens) == "abcdefghij")
+    assert(detector.move_blocks("abcdefghij", "abcdxfghij", tokens)[2] == [])
+
+def test_transposed_alignment():
+    syllables = get_seed_text(300).split(TSHEG)
+    # a block of 60 syllables is moved 100 syllables further in the second witness
+    moved_text = TSHEG.join(syllables[:50] + syllables[110:210] + syllables[50:110] + syllables[210:])
+    witnesses = [get_synthetic_witnesses(TSHEG.join(syllables), 1)[0], get_synthetic_witnesses(moved_text, 1, seed=1)[0], get_synthetic_witnesses(TSHEG.join(syllables), 1, seed=2)[0]]
+    token_strings, token_lists = tokenize_witnesses(get_tokenizer(), witnesses)
+    nb_rows = len(FDMPVulgaligner(array_matrix=True).get_alignment_matrix(list(token_strings), list(token_lists)))
+    aligner = FDMPVulgaligner(array_matrix=True, verify=True, min_consensus_run_size=2, transposition_detector=TranspositionDetector())
+    rows = aligner.get_alignment_matrix(list(token_strings), list(token_lists)).to_rows()
+    # the moved block is aligned instead of being deleted and inserted
+    assert(len(rows) < nb_rows - 40)
+    token_matrix, consensus_runs = aligner.get_compressed_alignment(token_strings, token_lists)
+    assert(get_alignment_rows(token_matrix, consensus_runs) == rows)
+
+if __name__ == "__main__":
+    test_suffix_array()
+    test_common_blocks()
+    test_move_blocks()
+    test_transposed_alignment()
@@ -0,0 +1,56 @@
+import random
+import re
+from normalizer_bo import Cats, charcat, unicode_reorder, unicode_reorder_page, BASE_OR_COMBINING_CHARS
+
+def unicode_reorder_reference(txt):
+    """
+    The original character by character implementation of unicode_reorder()
+    """
+    txt = re.sub(r"^([ཱ-྄ྍ-ྼ]+)([ཀ-ཬ])", r"\2\1", txt)
+    charcats = [charcat(c) for c in txt]
+    i = 0
+    res = []
+    valid = True
+    while i < len(charcats):
+        c = charcats[i]
+        if c != Cats.Base:
+            if c.value > Cats.Base.value:
+                valid = False
+            res.append(txt[i])
+            i += 1
+            continue
+        j = i + 1
+        while j < len(charcats) and charcats[j].value > Cats.Base.value:
+            j += 1
+        newindices = sorted(range(i, j), key=lambda e:(charcats[e].value, e))
+        res.append("".join(txt[n] for n in newindices))
+        i = j
+    return "".join(res), valid
+
+def get_random_strings(nb_strings, seed=0):
+    rng = random.Random(seed)
+    alphabet = [chr(c) for c in range(0x0f00, 0x0fc0)] + [" ", "a"]
+    diacritics = [chr(c) for c in range(0x0f71, 0x0f88)] + [chr(c) for c in range(0x0f8d, 0x0fbd)]
+    res = []
+    for _ in range(nb_strings):
+        res.append("".join(rng.choice(alphabet if rng.random() < 0.5 else diacritics) for _ in range(rng.randint(0, 10))))
+    return res
+
+def test_unicode_reorder():
+    assert(unicode_reorder("ཀཾཱོུ") == ("ཀཱོུཾ", True))
+    assert(unicode_reorder("་ཾ") == ("་ཾ", False))
+    assert(unicode_reorder("ིཀ") == ("ཀི", True))
+    for s in get_random_strings(5000):
+        assert(unicode_reorder(s) == unicode_reorder_reference(s))
+
+def test_unicode_reorder_page():
+    page = "ིཀ་ིཀཾོུ ་ཾ"
+    assert(unicode_reorder_page(page) == ("ཀི་ཀིོུཾ ་ཾ", False))
+    for s in get_random_strings(5000, seed=1):
+        parts = re.split("(?<!" + BASE_OR_COMBINING_CHARS + ")(?=.)", s)
+        results = [unicode_reorder_reference(part) for part in parts]
+        assert(unicode_reorder_page(s) == ("".join(r[0] for r in results), all(r[1] for r in results)))
+
+if __name__ == "__main__":
+    test_unicode_reorder()
+    test_unicode_reorder_page()
@@ -0,0 +1,106 @@
+import multiprocessing
+import pickle
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from vocabulary import Vocabulary
+from vocabulary_persistent import PersistentVocabulary, SURROGATES_START, SURROGATES_END
+from tokenizer_bo import TibetanTokenizer
+from normalizer_bo import TibetanNormalizer
+
+TEST_STRING = "ཡེ་ཤེས་ཀྱིས་སྦྱངས་ནས། ཆོས་ཐམས་ཅད་ནམ་མཁའི་དཀྱིལ་ལྟ་བུར་ིརང་གི་ཡེ་ཤེས་"
+
+def test_persistent_vocabulary():
+    vocabulary = PersistentVocabulary(["ཀ", "ཁ"], track_frequencies=True)
+    code_ka = vocabulary.encode("ཀ")
+    code_ga = vocabulary.encode("ག")
+    assert(vocabulary.encode("ཁ") == code_ka + 1)
+    assert(code_ga == code_ka + 2)
+    vocabulary.reset()
+    assert(vocabulary.encode("ག") == code_ga)
+    assert(vocabulary.decode(code_ga) == "ག")
+    assert(vocabulary.decode(code_ka) == "ཀ")
+    assert(vocabulary.get_element_frequency("ག") == 2)
+    assert(vocabulary.get_code_frequency(code_ka) == 1)
+    assert(vocabulary.get_element_frequency("ང") == 0)
+    with tempfile.TemporaryDirectory() as dir_path:
+        vocabulary.save(dir_path)
+        loaded = PersistentVocabulary.load(dir_path)
+        assert(loaded.elements() == vocabulary.elements())
+        assert(loaded.encode("ག") == code_ga)
+        assert(loaded.get_element_frequency("ག") == 3)
+        # new elements go in the overflow
+        assert(loaded.encode("ང") == code_ga + 1)
+        assert(loaded.decode(code_ga + 1) == "ང")
+
+def test_persistent_vocabulary_pickle():
+    vocabulary = PersistentVocabulary(["ཀ", "ཁ"])
+    code_ga = vocabulary.encode("ག")
+    unpickled = pickle.loads(pickle.dumps(vocabulary))
+    assert(unpickled.elements() == vocabulary.elements())
+    assert(unpickled.encode("ག") == code_ga)
+    with tempfile.TemporaryDirectory() as dir_path:
+        vocabulary.save(dir_path)
+        loaded = PersistentVocabulary.load(dir_path)
+        code_nga = loaded.encode("ང")
+        unpickled = pickle.loads(pickle.dumps(loaded))
+        # the base is memory-mapped again, the overflow is in the pickle
+        assert(isinstance(unpickled.blob, np.memmap))
+        assert(unpickled.elements() == loaded.elements())
+        assert(unpickled.decode(code_nga) == "ང")
+        assert(unpickled.encode("ག") == code_ga)
+
+def decode_in_worker(vocabulary, code):
+    return vocabulary.decode(code)
+
+def test_persistent_vocabulary_spawn():
+    with tempfile.TemporaryDirectory() as dir_path:
+        vocabulary = PersistentVocabulary(["ཀ", "ཁ"])
+        vocabulary.save(dir_path)
+        loaded = PersistentVocabulary.load(dir_path)
+        code_kha = loaded.encode("ཁ")
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            assert(executor.submit(decode_in_worker, loaded, code_kha).result() == "ཁ")
+
+def test_persistent_vocabulary_surrogates():
+    vocabulary = PersistentVocabulary([str(i) for i in range(SURROGATES_START)])
+    codes = [vocabulary.encode(str(i)) for i in range(SURROGATES_START+10)]
+    assert(len(set(codes)) == len(codes))
+    assert(not any(SURROGATES_START <= code < SURROGATES_END for code in codes))
+    assert(all(vocabulary.decode(code) == str(i) for i, code in enumerate(codes)))
+    # the surrogates are not codes
+    for code in (SURROGATES_START, SURROGATES_START+5, SURROGATES_END-1):
+        try:
+            vocabulary.decode(code)
+            assert(False)
+        except KeyError:
+            pass
+
+def test_persistent_vocabulary_codes():
+    # the codes are the same as the ones of Vocabulary (below the surrogates)
+    elements = ["ཀ", "ཁ", "ག"]
+    vocabulary = Vocabulary(allow_decode=True)
+    persistent_vocabulary = PersistentVocabulary(elements[:1])
+    for element in elements:
+        assert(persistent_vocabulary.encode(element) == vocabulary.encode(element))
+    assert(persistent_vocabulary.allow_decode)
+    assert(persistent_vocabulary.last == vocabulary.last)
+
+def test_persistent_vocabulary_tokenizer():
+    tokenizer = TibetanTokenizer(Vocabulary(), TibetanNormalizer())
+    persistent_tokenizer = TibetanTokenizer(PersistentVocabulary(), TibetanNormalizer())
+    tokens, token_string = tokenizer.tokenize(TEST_STRING)
+    persistent_tokens, persistent_token_string = persistent_tokenizer.tokenize(TEST_STRING)
+    assert(tokens == persistent_tokens)
+    assert(token_string == persistent_token_string)
+    # the codes are kept after a reset (the third token is a stop word, not in the token string)
+    persistent_tokenizer.reset()
+    assert(persistent_tokenizer.tokenize(TEST_STRING[12:])[1] == persistent_token_string[2:])
+
+if __name__ == "__main__":
+    test_persistent_vocabulary()
+    test_persistent_vocabulary_pickle()
+    test_persistent_vocabulary_spawn()
+    test_persistent_vocabulary_surrogates()
+    test_persistent_vocabulary_codes()
+    test_persistent_vocabulary_tokenizer()
@@ -0,0 +1,100 @@
+from vulgaligner_fdmp import FDMPVulgaligner
+from consensus_run import get_alignment_rows
+from transpositions import TranspositionDetector
+
+def get_tokens(token_string):
+    return [(i, i+1, 1, c) for i, c in enumerate(token_string)]
+
+TOKEN_STRINGS = ["ABCDEFGHIJ", "XABDEFGHJ", "ABCDEYFGHIJZ", "ABCCDEFGIJ", "BCDEFGHIJ"]
+
+def get_matrix(aligner, token_strings=TOKEN_STRINGS):
+    token_lists = [get_tokens(ts) for ts in token_strings]
+    return aligner.get_alignment_matrix(list(token_strings), token_lists)
+
+def test_parallel_diffs():
+    expected = get_matrix(FDMPVulgaligner())
+    for pool_type in ["thread", "process"]:
+        aligner = FDMPVulgaligner(nb_workers=3, pool_type=pool_type)
+        assert(get_matrix(aligner) == expected)
+        aligner.close()
+
+def test_verify():
+    expected = get_matrix(FDMPVulgaligner())
+    assert(get_matrix(FDMPVulgaligner(verify=True)) == expected)
+    assert(get_matrix(FDMPVulgaligner(verify=True, array_matrix=True)).to_rows() == expected)
+    # the increments of the tokens don't match the token string
+    token_lists = [get_tokens(ts) for ts in TOKEN_STRINGS]
+    token_lists[1][0] = (0, 1, 2, "X")
+    try:
+        FDMPVulgaligner(verify=True).get_alignment_matrix(list(TOKEN_STRINGS), token_lists)
+        assert(False)
+    except AssertionError as e:
+        assert("increments" in str(e))
+
+def test_arguments_not_modified():
+    for transposition_detector in [None, TranspositionDetector()]:
+        token_strings = list(TOKEN_STRINGS)
+        token_lists = [get_tokens(ts) for ts in TOKEN_STRINGS]
+        FDMPVulgaligner(transposition_detector=transposition_detector).get_alignment_matrix(token_strings, token_lists)
+        assert(token_strings == TOKEN_STRINGS)
+        assert(token_lists == [get_tokens(ts) for ts in TOKEN_STRINGS])
+
+def test_multi_character_tokens():
+    # "AB" is a single token with an increment of 2
+    base_tokens = [(0, 2, 2, "AB"), (2, 3, 1, "C")]
+    matrix = FDMPVulgaligner().get_alignment_matrix(["ABC", "XABC"], [base_tokens, [(0, 1, 1, "X"), (1, 3, 2, "AB"), (3, 4, 1, "C")]])
+    assert(matrix == [[None, (0, 1, 1, "X")], [(0, 2, 2, "AB"), (1, 3, 2, "AB")], [(2, 3, 1, "C"), (3, 4, 1, "C")]])
+    # the diffs split the token "AB" of the base, the equality "A" goes in the change, which is cut
+    other_tokens = [(0, 1, 1, "A"), (1, 2, 1, "C")]
+    assert(FDMPVulgaligner.snap_diffs_to_tokens(base_tokens, other_tokens, [('=', 1), ('-', 1), ('=', 1)]) == [('-', 2), ('=', 0), ('+', 1), ('=', 1)])
+    matrix = FDMPVulgaligner(verify=True).get_alignment_matrix(["ABC", "AC"], [base_tokens, other_tokens])
+    assert(matrix == [[(0, 2, 2, "AB"), (0, 1, 1, "A")], [(2, 3, 1, "C"), (1, 2, 1, "C")]])
+    # pairing "XY" with "Z" by position would split "XY", the change is cut by an empty equality
+    base_tokens = [(0, 1, 1, "A"), (1, 3, 2, "XY"), (3, 4, 1, "C")]
+    other_tokens = [(0, 1, 1, "A"), (1, 2, 1, "Z"), (2, 3, 1, "C")]
+    assert(FDMPVulgaligner.snap_diffs_to_tokens(base_tokens, other_tokens, [('=', 1), ('-', 2), ('+', 1), ('=', 1)]) == [('=', 1), ('-', 2), ('=', 0), ('+', 1), ('=', 1)])
+    matrix = FDMPVulgaligner(verify=True).get_alignment_matrix(["AXYC", "AZC"], [base_tokens, other_tokens])
+    assert(matrix == [[(0, 1, 1, "A"), (0, 1, 1, "A")], [(1, 3, 2, "XY"), (1, 2, 1, "Z")], [(3, 4, 1, "C"), (2, 3, 1, "C")]])
+
+def test_compressed_alignment():
+    token_strings = ["ABCDEFGHIJKLMNOP", "ABCDEFGHIJKLMNOP", "ABCDEFGXIJKLMNOP"]
+    token_lists = [get_tokens(ts) for ts in token_strings]
+    token_matrix, consensus_runs = FDMPVulgaligner(min_consensus_run_size=3).get_compressed_alignment(token_strings, token_lists)
+    # the last token of the first run is in the matrix, so that the diffs of the variant region start with an equality
+    assert(token_matrix == [[(6, 7, 1, "G")]*3, [(7, 8, 1, "H"), (7, 8, 1, "H"), (7, 8, 1, "X")]])
+    assert([(run.row_i, run.nb_rows) for run in consensus_runs] == [(0, 6), (2, 8)])
+    assert(consensus_runs[1].get_strings() == list("IJKLMNOP"))
+    assert(get_alignment_rows(token_matrix, consensus_runs) == get_matrix(FDMPVulgaligner(), token_strings))
+    # runs shorter than min_consensus_run_size stay in the matrix
+    expected = get_matrix(FDMPVulgaligner(array_matrix=True)).to_rows()
+    for min_consensus_run_size in [1, 2, 100]:
+        aligner = FDMPVulgaligner(array_matrix=True, verify=True, min_consensus_run_size=min_consensus_run_size)
+        token_matrix, consensus_runs = aligner.get_compressed_alignment(list(TOKEN_STRINGS), [get_tokens(ts) for ts in TOKEN_STRINGS])
+        assert(get_alignment_rows(token_matrix, consensus_runs) == expected)
+
+def test_compressed_alignment_ocr():
+    from vocabulary import Vocabulary
+    from normalizer_bo_compiled import CompiledTibetanNormalizer
+    from tokenizer_bo import TibetanTokenizer
+    from synthetic_witnesses import get_seed_text, get_synthetic_witnesses
+    tokenizer = TibetanTokenizer(Vocabulary(), CompiledTibetanNormalizer(), stop_words=[])
+    for seed in range(10):
+        token_strings = []
+        token_lists = []
+        for witness in get_synthetic_witnesses(get_seed_text(300, seed), 4, seed=seed):
+            token_list, token_string = tokenizer.tokenize(witness)
+            token_strings.append(token_string)
+            token_lists.append(token_list)
+        aligner = FDMPVulgaligner(array_matrix=True, min_consensus_run_size=2)
+        token_matrix, consensus_runs = aligner.get_compressed_alignment(token_strings, token_lists)
+        assert(len(consensus_runs) > 0)
+        assert(get_alignment_rows(token_matrix, consensus_runs) == aligner.get_alignment_matrix(token_strings, token_lists).to_rows())
+        tokenizer.reset()
+
+if __name__ == "__main__":
+    test_parallel_diffs()
+    test_verify()
+    test_arguments_not_modified()
+    test_multi_character_tokens()
+    test_compressed_alignment()
+    test_compressed_alignment_ocr()
@@ -0,0 +1,46 @@
+import numpy as np
+from vulgaligner_progressive import ProgressiveVulgaligner, get_row_string
+from vulgaligner_fdmp import FDMPVulgaligner
+from synthetic_witnesses import get_seed_text, get_synthetic_witnesses, get_tokenizer, tokenize_witnesses
+
+def test_guide_tree():
+    distances = np.array([
+        [0, 9, 2, 8],
+        [9, 0, 9, 3],
+        [2, 9, 0, 8],
+        [8, 3, 8, 0]])
+    assert(ProgressiveVulgaligner.get_guide_tree(distances) == [(0, 2), (1, 3), (4, 5)])
+
+def test_row_string():
+    assert(get_row_string(np.array([0, 1, 0xD800], dtype=np.int64)) == "Āā" + chr(0xD900 + 0x800))
+
+def test_row_pairs():
+    aligner = ProgressiveVulgaligner()
+    a_rows, b_rows = aligner.get_row_pairs([('=', 1), ('-', 2), ('+', 1), ('=', 1), ('+', 1)], 4, 4)
+    assert(a_rows.tolist() == [0, 1, 2, 3, -1])
+    assert(b_rows.tolist() == [0, 1, -1, 2, 3])
+
+def test_alignment_matrix():
+    token_strings, token_lists = tokenize_witnesses(get_tokenizer(), ["ཀ་ཁ་ག་ང", "ཀ་ཁ་ག་ང", "ཀ་ག་ང་ཅ"])
+    matrix = ProgressiveVulgaligner().get_alignment_matrix(token_strings, token_lists)
+    assert([[t[3] if t is not None else None for t in row] for row in matrix] == [
+        ["ཀ་", "ཀ་", "ཀ་"],
+        ["ཁ་", "ཁ་", None],
+        ["ག་", "ག་", "ག་"],
+        ["ང", "ང", "ང་"],
+        [None, None, "ཅ"]])
+
+def test_alignment_matrix_ocr():
+    for nb_witnesses in (1, 2, 5):
+        token_strings, token_lists = tokenize_witnesses(get_tokenizer(), get_synthetic_witnesses(get_seed_text(300), nb_witnesses))
+        for array_matrix in (False, True):
+            matrix = ProgressiveVulgaligner(array_matrix=array_matrix).get_alignment_matrix(token_strings, token_lists)
+            # each column contains the tokens of its witness, in the order of the arguments
+            FDMPVulgaligner.verify_alignment_matrix(matrix, token_lists, [len(matrix)])
+
+if __name__ == "__main__":
+    test_guide_tree()
+    test_row_string()
+    test_row_pairs()
+    test_alignment_matrix()
+    test_alignment_matrix_ocr()
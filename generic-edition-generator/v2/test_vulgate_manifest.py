@@ -0,0 +1,48 @@
+import tempfile
+from pathlib import Path
+from vulgate_manifest import VulgateManifest, get_config_fingerprint, get_object_config, get_vulgate_strings
+from differ_array import ArrayDiffer
+
+def test_vulgate_manifest():
+    fingerprint = get_config_fingerprint({"differ": get_object_config(ArrayDiffer())})
+    assert(fingerprint != get_config_fingerprint({"differ": get_object_config(ArrayDiffer(max_myers_cost=10))}))
+    vulgate = "ཀ་ཁ\n\nག\n\n"
+    with tempfile.TemporaryDirectory() as dir_path:
+        path = Path(dir_path) / "manifest.json"
+        manifest = VulgateManifest.load(path, fingerprint)
+        assert(not manifest.check_previous_vulgate("B1", vulgate))
+        assert(manifest.get_page_span("B1", (0, 10), "h1") is None)
+        # two pages with the same reference have different spans in the base
+        manifest.set_page_span("B1", (0, 10), "h1", 0, 3)
+        manifest.set_page_span("B1", (10, 20), "h2", 5, 6)
+        manifest.end_base("B1", vulgate)
+        manifest.set_page_span("B2", (0, 10), "h3", 0, 1)
+        manifest.save(path)
+        manifest = VulgateManifest.load(path, fingerprint)
+        assert(manifest.check_previous_vulgate("B1", vulgate))
+        assert(manifest.get_page_span("B1", (0, 10), "h1") == (0, 3))
+        assert(manifest.get_page_span("B1", (10, 20), "h2") == (5, 6))
+        assert(manifest.get_page_span("B1", (0, 10), "h2") is None)
+        # B2 was not finished
+        assert(manifest.get_page_span("B2", (0, 10), "h3") is None)
+        # the pages of the unfinished bases are kept
+        manifest.save(path)
+        assert(VulgateManifest.load(path, fingerprint).get_page_span("B1", (0, 10), "h1") is not None)
+        assert(not VulgateManifest.load(path, "other").check_previous_vulgate("B1", vulgate))
+        # the pages are forgotten if the vulgate changed since the manifest was saved
+        manifest = VulgateManifest.load(path, fingerprint)
+        assert(not manifest.check_previous_vulgate("B1", "ཀ\n\n"))
+        assert(manifest.get_page_span("B1", (0, 10), "h1") is None)
+
+def test_vulgate_strings():
+    vulgate = "ཀ་ཁ\n\nག\n\n"
+    confidence_runs = [(0, 2, 90), (5, 6, 50)]
+    assert(get_vulgate_strings(vulgate, confidence_runs, 0, 3) == [("ཀ་", 90), ("ཁ", None)])
+    assert(get_vulgate_strings(vulgate, confidence_runs, 1, 3) == [("་", 90), ("ཁ", None)])
+    assert(get_vulgate_strings(vulgate, confidence_runs, 5, 6) == [("ག", 50)])
+    assert(get_vulgate_strings(vulgate, [], 0, 3) == [("ཀ་ཁ", None)])
+    assert(get_vulgate_strings(vulgate, confidence_runs, 3, 3) == [])
+
+if __name__ == "__main__":
+    test_vulgate_manifest()
+    test_vulgate_strings()
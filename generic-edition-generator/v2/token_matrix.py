@@ -0,0 +1,132 @@
+import numpy as np
+from typing import List, Dict
+from tokenizer import Token, TokenList
+
+class ArrayTokenMatrix():
+    """
+    A token matrix (one row per aligned position, one column per witness) stored
+    as a structure of NumPy arrays instead of a list of lists of tuples:
+    - starts, ends and increments contain the first three elements of the tokens
+    - codes contains the code of the token string in the strings table of the matrix
+    - gaps is True where the matrix has no token
+
+    Token strings are only looked up when tokens are accessed.
+
+    For compatibility with code using lists, the matrix can be used as a list of rows:
+    len(matrix), matrix[row_i] and iterating over the matrix return rows of tokens
+    (tuples or None for gaps), built when they are accessed. The matrix cannot be
+    modified this way though, set_token() or set_column() must be used instead.
+    """
+
+    def __init__(self, nb_rows: int, nb_columns: int):
+        shape = (nb_rows, nb_columns)
+        self.starts = np.zeros(shape, dtype=np.int32)
+        self.ends = np.zeros(shape, dtype=np.int32)
+        self.increments = np.zeros(shape, dtype=np.int32)
+        self.codes = np.zeros(shape, dtype=np.int32)
+        self.gaps = np.ones(shape, dtype=bool)
+        # code 0 is the empty string, also used for gaps
+        self.strings: List[str] = [""]
+        self.string_to_code: Dict[str,int] = {"": 0}
+
+    @property
+    def nb_rows(self) -> int:
+        return self.gaps.shape[0]
+
+    @property
+    def nb_columns(self) -> int:
+        return self.gaps.shape[1]
+
+    def encode_string(self, s: str) -> int:
+        code = self.string_to_code.get(s)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(s)
+            self.string_to_code[s] = code
+        return code
+
+    def set_token(self, row_i: int, column_i: int, token: Token):
+        if token is None:
+            self.gaps[row_i, column_i] = True
+            return
+        self.starts[row_i, column_i] = token[0]
+        self.ends[row_i, column_i] = token[1]
+        self.increments[row_i, column_i] = token[2]
+        self.codes[row_i, column_i] = self.encode_string(token[3])
+        self.gaps[row_i, column_i] = False
+
+    def set_column(self, column_i: int, row_indexes: List[int], tokens: TokenList):
+        """
+        Sets the tokens in a column, tokens[i] is set in row row_indexes[i]
+        """
+        if not tokens:
+            return
+        row_indexes = np.asarray(row_indexes, dtype=np.intp)
+        self.starts[row_indexes, column_i] = [t[0] for t in tokens]
+        self.ends[row_indexes, column_i] = [t[1] for t in tokens]
+        self.increments[row_indexes, column_i] = [t[2] for t in tokens]
+        self.codes[row_indexes, column_i] = [self.encode_string(t[3]) for t in tokens]
+        self.gaps[row_indexes, column_i] = False
+
+    def get_token(self, row_i: int, column_i: int) -> Token:
+        if self.gaps[row_i, column_i]:
+            return None
+        return (int(self.starts[row_i, column_i]), int(self.ends[row_i, column_i]),
+            int(self.increments[row_i, column_i]), self.strings[self.codes[row_i, column_i]])
+
+    def get_string(self, row_i: int, column_i: int) -> str:
+        """
+        Returns the string of a token, or None for a gap
+        """
+        if self.gaps[row_i, column_i]:
+            return None
+        return self.strings[self.codes[row_i, column_i]]
+
+    def get_row(self, row_i: int) -> TokenList:
+        return [self.get_token(row_i, column_i) for column_i in range(self.nb_columns)]
+
+    def to_rows(self) -> List[TokenList]:
+        return [self.get_row(row_i) for row_i in range(self.nb_rows)]
+
+    @staticmethod
+    def from_rows(rows: List[TokenList]) -> 'ArrayTokenMatrix':
+        nb_columns = len(rows[0]) if rows else 0
+        matrix = ArrayTokenMatrix(len(rows), nb_columns)
+        for row_i, row in enumerate(rows):
+            for column_i, token in enumerate(row):
+                if token is not None:
+                    matrix.set_token(row_i, column_i, token)
+        return matrix
+
+    def __len__(self) -> int:
+        return self.nb_rows
+
+    def __getitem__(self, row_i: int) -> TokenList:
+        if row_i < 0:
+            row_i += self.nb_rows
+        if row_i < 0 or row_i >= self.nb_rows:
+            raise IndexError('token matrix row index out of range')
+        return self.get_row(row_i)
+
+    def __iter__(self):
+        for row_i in range(self.nb_rows):
+            yield self.get_row(row_i)
+
+def get_empty_token_matrix(nb_rows: int, nb_columns: int, array_matrix: bool = False):
+    """
+    Returns an empty token matrix, either a list of lists or an ArrayTokenMatrix
+    """
+    if array_matrix:
+        return ArrayTokenMatrix(nb_rows, nb_columns)
+    return [[None for _ in range(nb_columns)] for _ in range(nb_rows)]
+
+def set_token_matrix_column(matrix, column_i: int, row_indexes: List[int], tokens: TokenList):
+    """
+    Sets the tokens in a column of a matrix (list of lists or ArrayTokenMatrix),
+    tokens[i] is set in row row_indexes[i]
+    """
+    if isinstance(matrix, ArrayTokenMatrix):
+        matrix.set_column(column_i, row_indexes, tokens)
+        return
+    for row_i, token in zip(row_indexes, tokens):
+        matrix[row_i][column_i] = token
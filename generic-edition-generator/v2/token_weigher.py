@@ -1,5 +1,7 @@
+import numpy as np
 from typing import List
 from tokenizer import Token
+from token_matrix import ArrayTokenMatrix
 
 class TokenWeigher():
     """
@@ -19,4 +21,19 @@ class TokenWeigher():
         not very efficient. It could be better to have different types of weighers since
         most work at the token level, not at the column level.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def weigh_matrix(self, token_matrix: ArrayTokenMatrix) -> np.ndarray:
+        """
+        Weighs a whole token matrix at once, returns an array of floats with the
+        same dimensions as the matrix, with NaN where the weight is None.
+
+        The default implementation calls weigh() on each row, subclasses should
+        implement a faster version operating on the arrays of the matrix.
+        """
+        weights = np.full(token_matrix.gaps.shape, np.nan)
+        for row_i in range(token_matrix.nb_rows):
+            for column_i, weight in enumerate(self.weigh(token_matrix.get_row(row_i))):
+                if weight is not None:
+                    weights[row_i, column_i] = weight
+        return weights
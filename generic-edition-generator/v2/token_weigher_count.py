@@ -1,4 +1,6 @@
+import numpy as np
 from token_weigher import TokenWeigher
+from token_matrix import ArrayTokenMatrix
 from tokenizer import Token
 from typing import List
 
@@ -22,9 +24,16 @@ class TokenCountWeigher(TokenWeigher):
             weights.append(weight)
         return weights
 
+    def weigh_matrix(self, token_matrix: ArrayTokenMatrix) -> np.ndarray:
+        # gaps are counted as empty strings, which have the code 0
+        codes = np.where(token_matrix.gaps, 0, token_matrix.codes)
+        counts = (codes[:, :, None] == codes[:, None, :]).sum(axis=2)
+        # same operations as in weigh() so that the results are identical
+        return np.trunc((counts / token_matrix.nb_columns) * 100)
+
 def test_count_weigher():
     cw = CountWeigher()
     assert(cw.weigh(["a", "b", None, "b", "c", None, "a", "b"]) == [25, 37, 25, 37, 12, 25, 25, 37])
 
 if __name__ == "__main__":
-    test_count_weigher()
\ No newline at end of file
+    test_count_weigher()
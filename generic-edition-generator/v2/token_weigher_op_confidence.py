@@ -1,33 +1,56 @@
-from opf_utils import OPSegment, OPFragmentLayerAccessor
+from opf_utils import OPFragmentLayerAccessor
 from typing import List
 from openpecha.core.layer import Layer, LayerEnum, PechaMetadata
 from openpecha.core.annotations import OCRConfidence, BaseAnnotation
-from bisect import bisect
 from token_weigher import TokenWeigher
+from token_matrix import ArrayTokenMatrix
+import numpy as np
 from tokenizer import Token
+from confidence_index import SegmentConfidence, NO_CONFIDENCE
 
 class OPConfidenceTokenWeigher(TokenWeigher):
 	"""
 	Returns the OCR confidence index as an integer between 0 and 100 for
 	a token.
+
+	The confidences of the last weighed matrix are kept so that they can be reused
+	(see get_confidence_matrix()).
 	"""
 
 	def __init__(self, layer_accessors: List[OPFragmentLayerAccessor], value_for_gap: int = None, relative = True):
+		"""
+		layer_accessors: the OCR confidence layer of each witness, the confidences of each one are
+		indexed once in a SegmentConfidence (see also from_segment_confidences())
+		"""
 		super().__init__(relative)
 		self.value_for_gap = value_for_gap
-		self.layer_accessors = layer_accessors
+		segment_confidences = []
+		for layer_accessor in layer_accessors:
+			if not isinstance(layer_accessor, OPFragmentLayerAccessor):
+				raise TypeError("expected an OPFragmentLayerAccessor, use from_segment_confidences() for SegmentConfidence objects")
+			segment_confidences.append(SegmentConfidence(layer_accessor.start, layer_accessor.end,
+				layer_accessor.get_annotations_in_range(layer_accessor.start, layer_accessor.end)))
+		self.segment_confidences = segment_confidences
+		self.last_token_matrix = None
+		self.last_confidence_matrix = None
+
+	@classmethod
+	def from_segment_confidences(cls, segment_confidences: List[SegmentConfidence], value_for_gap: int = None, relative = True) -> 'OPConfidenceTokenWeigher':
+		"""
+		Returns a weigher using the confidences of each witness already indexed in a SegmentConfidence
+		"""
+		weigher = cls([], value_for_gap, relative)
+		weigher.segment_confidences = segment_confidences
+		return weigher
 
 	@staticmethod
 	def get_lowest_confidence(layer_accessor: OPFragmentLayerAccessor, start: int, end: int) -> int:
+		"""
+		Returns the lowest confidence of the characters of a token, None if no character has a
+		confidence. To weigh many tokens of a segment, build its SegmentConfidence once instead.
+		"""
 		annotations = layer_accessor.get_annotations_in_range(start, end)
-		res = None
-		for annotation in annotations:
-			c = annotation.confidence
-			if c is not None:
-				c_i = int(c * 100)
-				if res is None or c_i < res:
-					res = c_i
-		return res
+		return SegmentConfidence(start, end, annotations).get_lowest_confidence(start, end)
 
 	def weigh(self, column: List[Token]) -> List[int]:
 		weights = []
@@ -35,8 +58,31 @@ class OPConfidenceTokenWeigher(TokenWeigher):
 			if t is None:
 				weights.append(self.value_for_gap)
 				continue
-			c = OPConfidenceTokenWeigher.get_lowest_confidence(self.layer_accessors[i], t[0], t[1])
+			c = self.segment_confidences[i].get_lowest_confidence(t[0], t[1])
 			if c is None:
 				c = 100
 			weights.append(c)
 		return weights
+
+	def get_confidence_matrix(self, token_matrix: ArrayTokenMatrix) -> np.ndarray:
+		"""
+		Returns an int8 matrix with the confidence of each token of the matrix, NO_CONFIDENCE
+		for the gaps and the tokens with no confidence
+		"""
+		if token_matrix is self.last_token_matrix:
+			return self.last_confidence_matrix
+		confidences = np.full(token_matrix.gaps.shape, NO_CONFIDENCE, dtype=np.int8)
+		for column_i in range(token_matrix.nb_columns):
+			row_indexes = np.flatnonzero(~token_matrix.gaps[:, column_i])
+			starts = token_matrix.starts[row_indexes, column_i]
+			ends = token_matrix.ends[row_indexes, column_i]
+			confidences[row_indexes, column_i] = self.segment_confidences[column_i].get_lowest_confidences(starts, ends)
+		self.last_token_matrix = token_matrix
+		self.last_confidence_matrix = confidences
+		return confidences
+
+	def weigh_matrix(self, token_matrix: ArrayTokenMatrix) -> np.ndarray:
+		confidences = self.get_confidence_matrix(token_matrix)
+		weights = np.where(confidences == NO_CONFIDENCE, 100, confidences).astype(float)
+		weights[token_matrix.gaps] = np.nan if self.value_for_gap is None else self.value_for_gap
+		return weights
@@ -1,4 +1,6 @@
+import numpy as np
 from token_weigher import TokenWeigher
+from token_matrix import ArrayTokenMatrix
 import re
 from typing import List
 from tokenizer import Token
@@ -48,23 +50,31 @@ class ValidBoTokenWeigher(TokenWeigher):
 		self.weight_nontibetan = weight_nontibetan
 		self.weight_gap = weight_gap
 
+	def weigh_string(self, s: str) -> int:
+		if not HAS_TIB_LETTERS.search(s):
+			#logging.debug("%s is not Tibetan", s)
+			return self.weight_nontibetan
+		if VAL_BO_RE.fullmatch(re.sub(r"[\s\u0f0b\u0fd2]", "", s)) is not None:
+			# ignore following punctuation
+			#logging.debug("%s is valid Tibetan", s)
+			return 100
+		#logging.debug("%s is invalid Tibetan", s)
+		return self.weight_invalid
+
 	def weigh(self, column: List[Token]) -> List[int]:
 		weights = []
 		for t in column:
 			if t is None:
 				weights.append(self.weight_gap)
 				continue
-			s = t[3]
-			if not HAS_TIB_LETTERS.search(s):
-				#logging.debug("%s is not Tibetan", s)
-				weights.append(self.weight_nontibetan)
-			elif VAL_BO_RE.fullmatch(re.sub(r"[\s\u0f0b\u0fd2]", "", s)) is not None:
-				# ignore following punctuation
-				#logging.debug("%s is valid Tibetan", s)
-				weights.append(100)
-			else:
-				#logging.debug("%s is invalid Tibetan", s)
-				weights.append(self.weight_invalid)
+			weights.append(self.weigh_string(t[3]))
+		return weights
+
+	def weigh_matrix(self, token_matrix: ArrayTokenMatrix) -> np.ndarray:
+		# each distinct string of the matrix is only weighed once
+		string_weights = np.array([self.weigh_string(s) for s in token_matrix.strings], dtype=float)
+		weights = string_weights[token_matrix.codes]
+		weights[token_matrix.gaps] = np.nan if self.weight_gap is None else self.weight_gap
 		return weights
 
 def test_well_formed_bo():
@@ -1,35 +1,135 @@
 from vocabulary import Vocabulary
-from typing import Tuple, List
+from typing import Tuple, List, Dict
+from collections import OrderedDict
 from normalizer import Normalizer
 from input_filter import InputFilter
 
 Token = Tuple[int, int, int, str]
 TokenList = List[Token]
 
+# normalized token string, comparison string, string for the diff,
+# encoded string, position increment, vocabulary generation of the encoded string
+TokenCacheEntry = Tuple[str, str, str, str, int, int]
+
+class TokenCache():
+    """
+    Bounded LRU cache of the normalization and encoding of tokens, keyed by the
+    raw token string. Texts are very repetitive at the token level, so most tokens
+    are found in the cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: Dict[str, TokenCacheEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> TokenCacheEntry:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: TokenCacheEntry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get_hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0
+
+    def get_stats(self) -> Dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.get_hit_rate(), "size": len(self.entries)}
+
+    def clear(self):
+        self.entries.clear()
+
 class Tokenizer():
     """
     Tokenizer class used in Vulgalizer.
     """
 
-    def __init__(self, vocabulary: Vocabulary, normalizer: Normalizer):
+    def __init__(self, vocabulary: Vocabulary, normalizer: Normalizer, cache_size: int = 0):
+        """
+        cache_size: maximum number of tokens in the token cache (0 to disable the cache)
+        """
         self.vocabulary = vocabulary
         self.normalizer = normalizer
         self.tokens = []
+        self.stop_words = []
+        self.cache = TokenCache(cache_size) if cache_size > 0 else None
 
     def reset(self):
+        # the cache does not need to be cleared, entries encoded with a previous
+        # version of the vocabulary are encoded again
         self.vocabulary.reset()
 
+    def get_cache_stats(self) -> Dict[str, float]:
+        if self.cache is None:
+            return None
+        return self.cache.get_stats()
+
+    def encode_token(self, token_str: str) -> Tuple[str, str, int]:
+        """
+        Normalizes and encodes the raw string of a token, returns:
+        - the normalized token string
+        - the encoded string for the token string (empty for stop words)
+        - the position increment
+        """
+        cache = self.cache
+        entry = None
+        if cache is not None:
+            entry = cache.get(token_str)
+        if entry is None:
+            token_s = self.normalizer.normalize_always(token_str)
+            compare_s = self.normalizer.normalize_pre_token_comparison(token_s)
+            if token_s == "" or compare_s in self.stop_words:
+                entry = (token_s, compare_s, None, "", 0, None)
+            else:
+                token_s_for_diff = self.normalizer.normalize_pre_token_diff(token_s)
+                code_str, code_str_len = self.vocabulary.encode_str(token_s_for_diff)
+                entry = (token_s, compare_s, token_s_for_diff, code_str, code_str_len, self.vocabulary.generation)
+            if cache is not None:
+                cache.set(token_str, entry)
+        elif entry[2] is not None and (entry[5] != self.vocabulary.generation or self.vocabulary.track_frequencies):
+            # the vocabulary has been reset since the token was cached (or it counts the occurrences)
+            code_str, code_str_len = self.vocabulary.encode_str(entry[2])
+            entry = (entry[0], entry[1], entry[2], code_str, code_str_len, self.vocabulary.generation)
+            cache.set(token_str, entry)
+        return entry[0], entry[3], entry[4]
+
     def get_input(self, arg):
         """
         returns the input data from the argument, which can be a string or an InputFilter
 
         returns:
            - the string to be tokenized
-           - the function to correct the positions to get those of the original string
+           - the position map giving the position in the original string of each position
+             of the string to be tokenized (see InputFilter.get_position_map()), None
+             if the argument is a string
+        """
+        if isinstance(arg, InputFilter):
+            string = arg.get_string()
+            return string, arg.get_position_map(len(string))
+        return arg, None
+
+    @staticmethod
+    def get_match_positions(matches, position_map) -> Tuple[List[int], List[int]]:
+        """
+        returns the start and end positions of the regex matches in the original string,
+        corrected in one vectorized lookup in the position map (see get_input())
         """
-        if instanceof(arg, InputFilter):
-            return arg.get_string(), arg.correct_position
-        return arg, lambda x: x
+        starts = [m.start() for m in matches]
+        ends = [m.end() for m in matches]
+        if position_map is not None and matches:
+            starts = position_map[starts].tolist()
+            ends = position_map[ends].tolist()
+        return starts, ends
 
     def tokenize(self, arg) -> Tuple[str, TokenList]:
         """
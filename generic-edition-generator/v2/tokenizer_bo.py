@@ -15,29 +15,20 @@ class TibetanTokenizer(Tokenizer):
         "ཀྱིན", "གྱིན", "ཅིང", "ཅིག", "ཅེས", "ཞེས", "པ", "པར", "པས",
         "བ", "བར", "བས", "པོ", "པོར", "པོས", "བོ", "བོར", "བོས"]
 
-    def __init__(self, vocabulary: Vocabulary, normalizer: Normalizer, stop_words = default_stop_words):
-        super().__init__(vocabulary, normalizer)
+    def __init__(self, vocabulary: Vocabulary, normalizer: Normalizer, stop_words = default_stop_words, cache_size: int = 65536):
+        super().__init__(vocabulary, normalizer, cache_size)
         self.stop_words = stop_words
 
     def tokenize(self, arg) -> Tuple[str, TokenList]:
         tokens = []
         tokenstr = ""
-        if end is None:
-            end = len(s)
-        string, correct_position = self.get_input()
-        for m in TibetanTokenizer.token_pattern.finditer(string):
-            token_s = self.normalizer.normalize_always(m.group(0))
-            compare_s = self.normalizer.normalize_pre_token_comparison(token_s)
-            start = correct_position(m.start())
-            end = correct_position(m.end())
-            if token_s == "" or compare_s in self.stop_words:
-                t = (start, end, 0, token_s)
-                tokens.append(t)
-                continue
-            token_s_for_diff = self.normalizer.normalize_pre_token_diff(token_s)
-            code_str, code_str_len = self.vocabulary.encode_str(token_s_for_diff)
+        string, position_map = self.get_input(arg)
+        matches = list(TibetanTokenizer.token_pattern.finditer(string))
+        starts, ends = self.get_match_positions(matches, position_map)
+        for i, m in enumerate(matches):
+            token_s, code_str, code_str_len = self.encode_token(m.group(0))
             tokenstr += code_str
-            t = (start, end, code_str_len, token_s)
+            t = (starts[i], ends[i], code_str_len, token_s)
             tokens.append(t)
         return tokens, tokenstr
 
@@ -46,5 +37,5 @@ if __name__ == "__main__":
     vocabulary = Vocabulary()
     normalizer = TibetanNormalizer()
     tokenizer = TibetanTokenizer(vocabulary=vocabulary, normalizer=normalizer)
-    tokens, tokenstr = tokenizer.tokenize(test_string, start=0, end=61)
+    tokens, tokenstr = tokenizer.tokenize(test_string)
     print(tokens)
\ No newline at end of file
@@ -12,28 +12,19 @@ class GenericTokenizer(Tokenizer):
 
     word_punctuation_pattern = regex.compile(r"(?u)\w+\s*|\W+")
 
-    def __init__(self, vocabulary: Vocabulary, normalizer: Normalizer, stop_words: List[str] = []):
-        super().__init__(vocabulary, normalizer)
+    def __init__(self, vocabulary: Vocabulary, normalizer: Normalizer, stop_words: List[str] = [], cache_size: int = 0):
+        super().__init__(vocabulary, normalizer, cache_size)
         self.stop_words = stop_words
 
     def tokenize(self, arg) -> Tuple[str, TokenList]:
         tokens = []
         tokenstr = ""
-        if end is None:
-            end = len(s)
-        string, correct_position = self.get_input(arg)
-        for m in GenericTokenizer.word_punctuation_pattern.finditer(s):
-            token_s = self.normalizer.normalize_always(m.group(0))
-            compare_s = self.normalizer.normalize_pre_token_comparison(token_s)
-            start = correct_position(m.start())
-            end = correct_position(m.end())
-            if token_s == "" or compare_s in self.stop_words:
-                t: Token = (start, end, 0, token_s)
-                tokens.append(t)
-                continue
-            token_s_for_diff = self.normalizer.normalize_pre_token_diff(token_s)
-            code_str, code_str_len = self.vocabulary.encode_str(token_s_for_diff)
+        string, position_map = self.get_input(arg)
+        matches = list(GenericTokenizer.word_punctuation_pattern.finditer(string))
+        starts, ends = self.get_match_positions(matches, position_map)
+        for i, m in enumerate(matches):
+            token_s, code_str, code_str_len = self.encode_token(m.group(0))
             tokenstr += code_str
-            t = (start, end, code_str_len, token_s)
+            t: Token = (starts[i], ends[i], code_str_len, token_s)
             tokens.append(t)
         return tokens, tokenstr
@@ -0,0 +1,176 @@
+import numpy as np
+from bisect import bisect_left
+from typing import List, Tuple
+from tokenizer import TokenList
+from differ_array import get_code_array
+from anchors import get_token_offsets, longest_increasing_subsequence
+
+# a block of the base token string at the same time in the other token string: (base start, other start, length)
+Block = Tuple[int, int, int]
+
+def get_suffix_array(codes: np.ndarray) -> np.ndarray:
+    """
+    Returns the start positions of the suffixes of codes in lexicographic order (prefix doubling,
+    each step sorts the suffixes on the ranks of their first 2k codes)
+    """
+    nb_codes = len(codes)
+    rank = np.unique(codes, return_inverse=True)[1].astype(np.int64).reshape(-1)
+    suffix_array = np.argsort(rank, kind="stable")
+    k = 1
+    while k < nb_codes:
+        second_rank = np.full(nb_codes, -1, dtype=np.int64)
+        second_rank[:nb_codes-k] = rank[k:]
+        suffix_array = np.lexsort((second_rank, rank))
+        sorted_rank = rank[suffix_array]
+        sorted_second_rank = second_rank[suffix_array]
+        new_group = (sorted_rank[1:] != sorted_rank[:-1]) | (sorted_second_rank[1:] != sorted_second_rank[:-1])
+        rank = np.empty(nb_codes, dtype=np.int64)
+        rank[suffix_array] = np.concatenate(([0], np.cumsum(new_group)))
+        if rank[suffix_array[-1]] == nb_codes - 1:
+            break
+        k *= 2
+    return suffix_array
+
+def get_lcp_array(codes: List[int], suffix_array: List[int]) -> List[int]:
+    """
+    Returns the length of the longest common prefix of each suffix of the suffix array and the next one
+    (Kasai's algorithm, linear time)
+    """
+    nb_codes = len(codes)
+    rank = [0] * nb_codes
+    for i, suffix in enumerate(suffix_array):
+        rank[suffix] = i
+    res = [0] * max(nb_codes - 1, 0)
+    h = 0
+    for i in range(nb_codes):
+        r = rank[i]
+        if r + 1 == nb_codes:
+            h = 0
+            continue
+        j = suffix_array[r+1]
+        while i + h < nb_codes and j + h < nb_codes and codes[i+h] == codes[j+h]:
+            h += 1
+        res[r] = h
+        if h > 0:
+            h -= 1
+    return res
+
+def find_common_blocks(a: np.ndarray, b: np.ndarray, min_block_size: int) -> List[Block]:
+    """
+    Returns blocks of at least min_block_size codes appearing in a and b, not overlapping in a nor in b,
+    sorted by position in a. The blocks are found on the suffix array of a and b concatenated: two
+    adjacent suffixes, one from a and one from b, start a common block as long as their common prefix.
+    Longer blocks are kept first.
+    """
+    # a separator that doesn't appear in the codes, so that common prefixes stop at the end of a
+    codes = np.concatenate((a.astype(np.int64), [-1], b.astype(np.int64)))
+    suffix_array = get_suffix_array(codes)
+    lcps = np.array(get_lcp_array(codes.tolist(), suffix_array.tolist()), dtype=np.int64)
+    a_length = len(a)
+    # the adjacent suffixes with a long common prefix, one in a and the other in b
+    first = suffix_array[:-1]
+    second = suffix_array[1:]
+    selected = (lcps >= min_block_size) & ((first < a_length) != (second < a_length))
+    first = first[selected]
+    second = second[selected]
+    lengths = lcps[selected]
+    a_starts = np.where(first < a_length, first, second)
+    b_starts = np.where(first < a_length, second, first) - a_length - 1
+    # only the blocks that cannot be extended on the left
+    left_maximal = (a_starts == 0) | (b_starts == 0) | (codes[np.maximum(a_starts - 1, 0)] != codes[np.maximum(b_starts + a_length, 0)])
+    candidates = list(zip(a_starts[left_maximal].tolist(), b_starts[left_maximal].tolist(), lengths[left_maximal].tolist()))
+    candidates.sort(key=lambda block: (-block[2], block[0], block[1]))
+    a_used = np.zeros(a_length, dtype=bool)
+    b_used = np.zeros(len(b), dtype=bool)
+    res = []
+    for a_start, b_start, length in candidates:
+        if a_used[a_start:a_start+length].any() or b_used[b_start:b_start+length].any():
+            continue
+        a_used[a_start:a_start+length] = True
+        b_used[b_start:b_start+length] = True
+        res.append((a_start, b_start, length))
+    res.sort()
+    return res
+
+class TranspositionDetector():
+    """
+    Detects the blocks of text that are at a different place in a witness and in the base
+    (transpositions, ex: a paragraph moved on another page), and moves them back to the place
+    they have in the base before the witness is diffed, so that they are aligned with the base
+    instead of appearing as a long deletion and a long insertion.
+
+    The common blocks of the base and the witness are found on a suffix array (see find_common_blocks()),
+    the longest sequence of blocks in the same order in both is the skeleton of the alignment and the other
+    blocks are moved. Consecutive moved blocks (OCR errors cut a moved paragraph in several blocks) are moved
+    together when they are separated by less than min_block_size characters in both texts, and only groups of
+    at least min_moved_size matched characters are moved, so that a short phrase repeated in the text is not
+    taken for a transposition.
+
+    The tokens of the witness keep their positions in the original text, only their order changes.
+    """
+
+    def __init__(self, min_block_size: int = 8, min_moved_size: int = 32):
+        self.min_block_size = min_block_size
+        self.min_moved_size = min_moved_size
+
+    def get_moved_blocks(self, blocks: List[Block]) -> Tuple[List[Block], List[Block]]:
+        """
+        Returns the common blocks that are in the same order in both texts and the moved blocks, given the
+        common blocks sorted by position in the base. Each moved block is a group of consecutive blocks, its
+        length is its length in the other token string.
+        """
+        kept_indexes = longest_increasing_subsequence([b_start for _, b_start, _ in blocks])
+        kept = set(kept_indexes)
+        groups = []
+        for block_i, (a_start, b_start, length) in enumerate(blocks):
+            if block_i in kept:
+                continue
+            if groups and groups[-1][-1] == block_i - 1:
+                previous_a_start, previous_b_start, previous_length = blocks[block_i-1]
+                a_gap = a_start - previous_a_start - previous_length
+                b_gap = b_start - previous_b_start - previous_length
+                if 0 <= a_gap < self.min_block_size and 0 <= b_gap < self.min_block_size:
+                    groups[-1].append(block_i)
+                    continue
+            groups.append([block_i])
+        moved_blocks = []
+        for group in groups:
+            if sum(blocks[block_i][2] for block_i in group) < self.min_moved_size:
+                continue
+            a_start, b_start, _ = blocks[group[0]]
+            _, last_b_start, last_length = blocks[group[-1]]
+            moved_blocks.append((a_start, b_start, last_b_start + last_length - b_start))
+        return [blocks[block_i] for block_i in kept_indexes], moved_blocks
+
+    def move_blocks(self, base_token_string: str, other_token_string: str, other_tokens: TokenList) -> Tuple[str, TokenList, List[Block]]:
+        """
+        Returns the token string and the tokens of the other witness with the moved blocks at their place
+        in the base, and the moved blocks (see get_moved_blocks()). A block is moved after the tokens of the
+        other witness that precede its place in the base: the end of the previous block that is in the same
+        order in both texts.
+        """
+        blocks = find_common_blocks(get_code_array(base_token_string), get_code_array(other_token_string), self.min_block_size)
+        kept_blocks, moved_blocks = self.get_moved_blocks(blocks)
+        if not moved_blocks:
+            return other_token_string, other_tokens, []
+        offsets = get_token_offsets(other_tokens)
+        kept_base_ends = [a_start + length for a_start, _, length in kept_blocks]
+        # the tokens of each moved block, by index of the token before which it is inserted
+        insertions = {}
+        moved = [False] * len(other_tokens)
+        for a_start, b_start, length in moved_blocks:
+            kept_i = bisect_left(kept_base_ends, a_start + 1) - 1
+            insertion_pos = kept_blocks[kept_i][1] + kept_blocks[kept_i][2] if kept_i >= 0 else 0
+            first_token_i = bisect_left(offsets, b_start)
+            end_token_i = bisect_left(offsets, b_start + length)
+            insertions.setdefault(bisect_left(offsets, insertion_pos), []).append((first_token_i, end_token_i))
+            moved[first_token_i:end_token_i] = [True] * (end_token_i - first_token_i)
+        token_order = []
+        for token_i in range(len(other_tokens) + 1):
+            for first_token_i, end_token_i in insertions.get(token_i, ()):
+                token_order += range(first_token_i, end_token_i)
+            if token_i < len(other_tokens) and not moved[token_i]:
+                token_order.append(token_i)
+        tokens = [other_tokens[token_i] for token_i in token_order]
+        token_string = "".join([other_token_string[offsets[token_i]:offsets[token_i+1]] for token_i in token_order])
+        return token_string, tokens, moved_blocks
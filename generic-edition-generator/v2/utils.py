@@ -1,5 +1,6 @@
 from typing import List
 from vulgaligner import TokenMatrix
+from token_matrix import ArrayTokenMatrix
 from tokenizer import Token
 from vocabulary import Vocabulary
 import logging
@@ -23,6 +24,8 @@ def token_row_to_token_str_rows(token_row: List[Token], text_for_gap: str = "-")
     return text_row
 
 def column_matrix_to_row_matrix(column_matrix):
+    if isinstance(column_matrix, ArrayTokenMatrix):
+        return [[column_matrix.get_token(row_i, column_i) for row_i in range(column_matrix.nb_rows)] for column_i in range(column_matrix.nb_columns)]
     nb_columns_transformed = len(column_matrix)
     nb_rows_transformed = len(column_matrix[0])
     row_matrix = [[None for _ in range(nb_columns_transformed)] for _ in range(nb_rows_transformed)]
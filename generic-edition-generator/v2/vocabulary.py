@@ -1,7 +1,23 @@
+import numpy as np
 from typing import List, Dict, Tuple
 
 GAP_ELEMENT = ''
 
+def get_empty_frequencies(size: int) -> np.ndarray:
+    return np.zeros(max(size, 1024), dtype=np.int64)
+
+def add_frequency(frequencies: np.ndarray, code: int) -> np.ndarray:
+    """
+    Increments the frequency of code, growing the array if necessary. Returns the array
+    (that can be a new one).
+    """
+    if code >= len(frequencies):
+        grown = np.zeros(max(code+1, 2*len(frequencies)), dtype=np.int64)
+        grown[:len(frequencies)] = frequencies
+        frequencies = grown
+    frequencies[code] += 1
+    return frequencies
+
 class Vocabulary(object):
     """
     Simple vocabulary class. A vocabulary just assigns integers to tokens (in our case strings).
@@ -24,11 +40,13 @@ class Vocabulary(object):
         if allow_decode:
             self.codeToElement: List[str] = [None for _ in range(shift+10)]
             self.codeToElement.append(GAP_ELEMENT)
-        if track_frequencies:
-            self.codeToFrequency: List[str] = [None for _ in range(shift+10)]
-            self.codeToFrequency.append(0)
         self.last: int = shift+10
+        if track_frequencies:
+            self.codeToFrequency: np.ndarray = get_empty_frequencies(self.last+1)
         self.allow_decode = allow_decode
+        self.track_frequencies = track_frequencies
+        # incremented at each reset so that users can know if a code is still valid
+        self.generation = 0
         self.shift = shift
         self.split_code_for_2_bytes = split_code_for_2_bytes
 
@@ -47,7 +65,7 @@ class Vocabulary(object):
             if self.allow_decode:
                 self.codeToElement.append(element)
             if self.track_frequencies:
-                self.codeToFrequency.append(1)
+                self.codeToFrequency = add_frequency(self.codeToFrequency, code)
         elif self.track_frequencies:
             self.codeToFrequency[code] += 1
         # if self.last >= 65536, things can be complicated on Windows
@@ -86,11 +104,10 @@ class Vocabulary(object):
     def get_code_frequency(self, code: int) -> int:
         if not self.track_frequencies:
             raise KeyError('vocabulary does not track frequency')
-        try:
-            return self.codeToFrequency[code]
-        except KeyError:
+        if code > self.last:
             raise KeyError(
                 'there is no elements in the vocabulary encoded as %d' % code)
+        return int(self.codeToFrequency[code])
 
     def get_element_frequency(self, element: str) -> int:
         if not self.track_frequencies:
@@ -98,11 +115,7 @@ class Vocabulary(object):
         code = self.elementToCode.get(element)
         if code is None:
             return 0
-        try:
-            return self.codeToFrequency[code]
-        except KeyError:
-            raise KeyError(
-                'code %d has no associated frequency, this is not normal' % code)
+        return int(self.codeToFrequency[code])
 
     def elements(self):
         return [self.decode(c) for c in sorted(self.codeToElement)]
@@ -111,11 +124,11 @@ class Vocabulary(object):
         return self.last + 1
 
     def reset(self):
+        self.generation += 1
         self.elementToCode: Dict[str,int] = {GAP_ELEMENT: self.shift+10}
         if self.allow_decode:
             self.codeToElement: List[str] = [None for _ in range(self.shift+10)]
             self.codeToElement.append(GAP_ELEMENT)
+        self.last: int = self.shift+10
         if self.track_frequencies:
-            self.codeToFrequency: List[str] = [None for _ in range(self.shift+10)]
-            self.codeToFrequency.append(0)
-        self.last: int = self.shift+10
\ No newline at end of file
+            self.codeToFrequency: np.ndarray = get_empty_frequencies(self.last+1)
\ No newline at end of file
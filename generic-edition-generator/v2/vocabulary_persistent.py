@@ -0,0 +1,238 @@
+import json
+import zlib
+import numpy as np
+from pathlib import Path
+from typing import List, Dict
+from vocabulary import Vocabulary, GAP_ELEMENT, get_empty_frequencies, add_frequency
+
+# code points that cannot be used to encode a code as a character
+SURROGATES_START = 0xD800
+SURROGATES_END = 0xE000
+
+def element_hash(element_bytes: bytes) -> int:
+    # the hash must be the same in all processes, which is not the case of hash()
+    return zlib.crc32(element_bytes)
+
+class PersistentVocabulary(Vocabulary):
+    """
+    A vocabulary that is not reset between pages, so that the same elements keep the same code
+    for a whole volume (or more).
+
+    The vocabulary has two parts:
+    - a read-only base, stored in NumPy arrays: the UTF-8 encoded elements concatenated in one
+      array with the offset of each element, and an open addressing hash table giving the index
+      of each element. The base can be saved and memory-mapped, so that worker processes
+      share the same pages of memory.
+    - an append-only overflow for the elements that are not in the base, in a dict and a list
+
+    The elements of the base have consecutive codes, the codes of the overflow come after. The codes
+    start at the code of the gap element in Vocabulary (shift+10) so they are the same as the ones of a
+    Vocabulary encoding the same elements in the same order, except that the surrogates code points
+    (SURROGATES_START to SURROGATES_END) are skipped: the codes above SURROGATES_START are shifted by
+    the size of the range. Frequencies are counted in a NumPy array when track_frequencies is True.
+
+    Note that the overflow is local to a process, two processes can give different codes to
+    an element that is not in the base.
+
+    The vocabulary can be pickled (ex: to be sent to the processes of a ProcessPoolExecutor with
+    the spawn start method). A base memory-mapped by load() is not copied in the pickle, it is
+    memory-mapped again from the same directory when unpickled.
+    """
+
+    def __init__(self, elements: List[str] = None, track_frequencies = False, shift=32, split_code_for_2_bytes=False):
+        """
+        elements: the elements of the base (in code order), the gap element is always the first one
+        """
+        # the elements are always kept in the base or the overflow, so decoding is always possible
+        super().__init__(allow_decode=True, track_frequencies=track_frequencies, shift=shift, split_code_for_2_bytes=split_code_for_2_bytes)
+        # the code of the first element of the base (the gap element)
+        self.first_code = self.last
+        # replaced by the base and the overflow
+        del self.elementToCode, self.codeToElement
+        if not elements or elements[0] != GAP_ELEMENT:
+            elements = [GAP_ELEMENT] + (elements or [])
+        self.set_base_arrays(*PersistentVocabulary.build_base_arrays(elements))
+
+    @staticmethod
+    def build_base_arrays(elements: List[str]):
+        encoded = [e.encode("utf-8") for e in elements]
+        offsets = np.zeros(len(encoded)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        table_size = 1
+        while table_size < 2 * len(encoded):
+            table_size *= 2
+        table = np.full(table_size, -1, dtype=np.int32)
+        mask = table_size - 1
+        for i, b in enumerate(encoded):
+            slot = element_hash(b) & mask
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = i
+        return blob, offsets, table
+
+    def set_base_arrays(self, blob: np.ndarray, offsets: np.ndarray, table: np.ndarray, frequencies: np.ndarray = None):
+        # the directory the base is memory-mapped from, see load()
+        self.base_path = None
+        self.set_blob(blob)
+        self.offsets = offsets
+        self.table = table
+        self.table_mask = len(table) - 1
+        self.base_size = len(offsets) - 1
+        self.overflow_elementToCode: Dict[str,int] = {}
+        self.overflow_codeToElement: List[str] = []
+        self.last = self.index_to_code(self.base_size - 1)
+        if self.track_frequencies:
+            self.codeToFrequency = get_empty_frequencies(self.last+1)
+            if frequencies is not None:
+                self.codeToFrequency[:len(frequencies)] = frequencies
+
+    def set_blob(self, blob: np.ndarray):
+        self.blob = blob
+        # the blob as bytes, slicing a memoryview doesn't copy the data
+        self.blob_view = memoryview(blob).cast("B") if len(blob) else memoryview(b"")
+
+    def __getstate__(self):
+        # memoryviews cannot be pickled, the view is rebuilt by __setstate__()
+        state = dict(self.__dict__)
+        del state["blob_view"]
+        if self.base_path is not None:
+            del state["blob"], state["offsets"], state["table"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.base_path is not None:
+            self.offsets = np.load(self.base_path / "offsets.npy", mmap_mode="r")
+            self.table = np.load(self.base_path / "table.npy", mmap_mode="r")
+            self.set_blob(np.load(self.base_path / "blob.npy", mmap_mode="r"))
+        else:
+            self.set_blob(self.blob)
+
+    def index_to_code(self, i: int) -> int:
+        code = self.first_code + i
+        if code >= SURROGATES_START:
+            code += SURROGATES_END - SURROGATES_START
+        return code
+
+    def code_to_index(self, code: int) -> int:
+        if SURROGATES_START <= code < SURROGATES_END:
+            raise KeyError(
+                'there is no elements in the vocabulary encoded as %d' % code)
+        if code >= SURROGATES_END:
+            code -= SURROGATES_END - SURROGATES_START
+        return code - self.first_code
+
+    def get_base_element(self, i: int) -> str:
+        return str(self.blob_view[self.offsets[i]:self.offsets[i+1]], "utf-8")
+
+    def get_base_index(self, element: str) -> int:
+        """
+        Returns the index of element in the base, or -1
+        """
+        b = element.encode("utf-8")
+        slot = element_hash(b) & self.table_mask
+        while True:
+            i = self.table[slot]
+            if i < 0:
+                return -1
+            if self.blob_view[self.offsets[i]:self.offsets[i+1]] == b:
+                return int(i)
+            slot = (slot + 1) & self.table_mask
+
+    def get_code(self, element: str) -> int:
+        code = self.overflow_elementToCode.get(element)
+        if code is not None:
+            return code
+        i = self.get_base_index(element)
+        if i < 0:
+            return None
+        return self.index_to_code(i)
+
+    def has(self, element: str) -> bool:
+        return self.get_code(element) is not None
+
+    def encode(self, element: str) -> int:
+        code = self.get_code(element)
+        if code is None:
+            code = self.index_to_code(self.base_size + len(self.overflow_codeToElement))
+            self.last = code
+            self.overflow_elementToCode[element] = code
+            self.overflow_codeToElement.append(element)
+        if self.track_frequencies:
+            self.codeToFrequency = add_frequency(self.codeToFrequency, code)
+        return code
+
+    def decode(self, code: int) -> str:
+        i = self.code_to_index(code)
+        if i < 0 or code > self.last:
+            raise KeyError(
+                'there is no elements in the vocabulary encoded as %d' % code)
+        if i < self.base_size:
+            return self.get_base_element(i)
+        return self.overflow_codeToElement[i - self.base_size]
+
+    def get_element_frequency(self, element: str) -> int:
+        if not self.track_frequencies:
+            raise KeyError('vocabulary does not track frequency')
+        code = self.get_code(element)
+        if code is None:
+            return 0
+        return int(self.codeToFrequency[code])
+
+    def elements(self):
+        return [self.get_base_element(i) for i in range(self.base_size)] + self.overflow_codeToElement
+
+    def len(self):
+        return self.base_size + len(self.overflow_codeToElement)
+
+    def reset(self):
+        # codes stay valid, see the class description
+        pass
+
+    def freeze(self):
+        """
+        Moves the overflow into the base. Codes stay the same.
+        """
+        if not self.overflow_codeToElement:
+            return
+        frequencies = self.codeToFrequency[:self.last+1] if self.track_frequencies else None
+        self.set_base_arrays(*PersistentVocabulary.build_base_arrays(self.elements()), frequencies)
+
+    def save(self, dir_path):
+        """
+        Saves the vocabulary (base and overflow) in a directory, see load()
+        """
+        self.freeze()
+        dir_path = Path(dir_path)
+        dir_path.mkdir(parents=True, exist_ok=True)
+        np.save(dir_path / "blob.npy", self.blob)
+        np.save(dir_path / "offsets.npy", self.offsets)
+        np.save(dir_path / "table.npy", self.table)
+        if self.track_frequencies:
+            np.save(dir_path / "frequencies.npy", self.codeToFrequency[:self.last+1])
+        with open(dir_path / "vocabulary.json", "w", encoding="utf-8") as f:
+            json.dump({"shift": self.shift, "split_code_for_2_bytes": self.split_code_for_2_bytes,
+                "track_frequencies": self.track_frequencies}, f)
+
+    @staticmethod
+    def load(dir_path, mmap = True) -> 'PersistentVocabulary':
+        """
+        Loads a vocabulary saved with save(). If mmap is True the base is memory-mapped
+        read-only, so processes loading the same vocabulary share its memory.
+        """
+        dir_path = Path(dir_path)
+        with open(dir_path / "vocabulary.json", encoding="utf-8") as f:
+            config = json.load(f)
+        mmap_mode = "r" if mmap else None
+        vocabulary = PersistentVocabulary(track_frequencies=config["track_frequencies"], shift=config["shift"],
+            split_code_for_2_bytes=config["split_code_for_2_bytes"])
+        frequencies = None
+        if config["track_frequencies"]:
+            frequencies = np.load(dir_path / "frequencies.npy")
+        vocabulary.set_base_arrays(np.load(dir_path / "blob.npy", mmap_mode=mmap_mode),
+            np.load(dir_path / "offsets.npy", mmap_mode=mmap_mode),
+            np.load(dir_path / "table.npy", mmap_mode=mmap_mode), frequencies)
+        if mmap:
+            vocabulary.base_path = dir_path
+        return vocabulary
@@ -1,7 +1,9 @@
 from tokenizer import TokenList
-from typing import List
+from token_matrix import ArrayTokenMatrix
+from typing import List, Iterator, Union
 
-TokenMatrix = List[TokenList]
+# a token matrix is either a list of rows or an ArrayTokenMatrix
+TokenMatrix = Union[List[TokenList], ArrayTokenMatrix]
 
 class Vulgaligner():
     """
@@ -19,4 +21,14 @@ class Vulgaligner():
         It returns an alignment matrix in the form of a matrix of tokens, one column per witness.
         Gaps in the matrix have the value None.
         """
-        return None
\ No newline at end of file
+        return None
+
+    def iter_alignment_matrices(self, token_strings: List[str], token_lists: List[TokenList]) -> Iterator[TokenMatrix]:
+        """
+        Same arguments as get_alignment_matrix(), but yields the alignment matrix in
+        successive parts that can be processed one after the other. Implementations
+        can use this to bound the size of the matrices on long texts.
+
+        The default implementation yields the result of get_alignment_matrix().
+        """
+        yield self.get_alignment_matrix(token_strings, token_lists)
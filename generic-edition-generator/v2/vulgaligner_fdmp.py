@@ -1,23 +1,101 @@
 import logging
-from fast_diff_match_patch import diff
-from vulgaligner import TokenMatrix
+from vulgaligner import Vulgaligner, TokenMatrix
 from tokenizer import Token, TokenList
-from typing import Tuple, List
-from numpy import array
+from typing import Tuple, List, Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from anchors import get_token_offsets, find_anchors, get_windows
+from token_matrix import ArrayTokenMatrix, get_empty_token_matrix, set_token_matrix_column
+from consensus_run import ConsensusRun
+from differ import Differ, Diff
+from differ_fdmp import FDMPDiffer
+from realigner import BandedRealigner
+from base_selector import BaseSelector
+from transpositions import TranspositionDetector
+from profiling import Profiler, NULL_PROFILER
+import numpy as np
 from utils import *
 
-# a diff returned by fdmp is a tuple with two values:
-# - a character: '=', '-' or '+' with self-evident signification
-# - an integer representing the number of characters
-FDMPDiff = Tuple[str,int]
+# a diff returned by fdmp (or another differ), see differ.py
+FDMPDiff = Diff
 
 logger = logging.getLogger('FDMPVulgaligner')
 
-class FDMPVulgaligner():
+class FDMPVulgaligner(Vulgaligner):
     """
-    Aligner using the fast_diff_match_patch (fdmp) library
+    Aligner using the fast_diff_match_patch (fdmp) library, or another differ giving diffs in the same format
     """
 
+    def __init__(self, window_size: int = None, anchor_ngram_size: int = 3, array_matrix: bool = False, nb_workers: int = 1, pool_type: str = "process", differ: Differ = None, verify: bool = False, profiler: Profiler = None, min_consensus_run_size: int = 8, realigner: BandedRealigner = None, base_selector: BaseSelector = None, transposition_detector: TranspositionDetector = None):
+        """
+        window_size: if set, iter_alignment_matrices() cuts the texts on anchors (sequences of
+        anchor_ngram_size tokens that appear once in every witness) into windows of at least
+        window_size base tokens and aligns them independently. This bounds the diff time and
+        the size of the matrices on long texts (ex: full volumes).
+
+        array_matrix: if True, the alignment matrices are ArrayTokenMatrix objects instead of
+        lists of lists of tokens, which is much more compact.
+
+        nb_workers: if more than 1, the diffs of the witnesses against the base are computed in parallel
+        in a pool of nb_workers workers. pool_type can be "process" or "thread". Note that fdmp does not
+        release the GIL so only "process" actually uses multiple cores. The pool is created on first use
+        and kept until close() is called. The results are identical to the serial computation.
+
+        differ: computes the diffs between the base and the other witnesses, FDMPDiffer by default.
+        ArrayDiffer (see differ_array.py) works on code arrays and doesn't need codes to be valid
+        characters for fdmp, so it can be used with vocabularies without split_code_for_2_bytes.
+
+        verify: if True, the token lists, the diffs and the resulting matrix are checked once per
+        alignment (in linear time), raising AssertionError if something is inconsistent. The filling
+        loops themselves do no validation or logging.
+
+        profiler: if set, the time spent in the diffs, the computation of the cells and the filling
+        of the matrix is added to the current page of the profiler, with the dimensions of the matrices
+        (see profiling.py).
+
+        min_consensus_run_size: minimal number of tokens of the consensus runs returned by
+        get_compressed_alignment(), shorter runs stay in the matrix of the variant regions.
+
+        realigner: if set, the replace hunks of the diffs (changes with deletions and insertions) are
+        re-aligned token by token on the similarity of the tokens (see realigner.py) instead of being
+        aligned by position (see get_next_fdmp_diff_info()).
+
+        base_selector: chooses the witness used as the base of each alignment (see base_selector.py), the
+        first witness by default. The columns of the matrices stay in the order of the witnesses given.
+
+        transposition_detector: if set, the blocks of text of a witness that are at another place in the base
+        (transpositions) are moved to their place in the base before the diffs (see transpositions.py), the
+        tokens of the witness are then in the order of the base in the matrices.
+        """
+        self.window_size = window_size
+        self.anchor_ngram_size = anchor_ngram_size
+        self.array_matrix = array_matrix
+        self.nb_workers = nb_workers
+        self.pool_type = pool_type
+        self.executor: Executor = None
+        self.differ = differ if differ is not None else FDMPDiffer()
+        self.verify = verify
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.min_consensus_run_size = min_consensus_run_size
+        self.realigner = realigner
+        self.base_selector = base_selector if base_selector is not None else BaseSelector()
+        self.transposition_detector = transposition_detector
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.pool_type == "thread":
+                self.executor = ThreadPoolExecutor(max_workers=self.nb_workers)
+            else:
+                self.executor = ProcessPoolExecutor(max_workers=self.nb_workers)
+        return self.executor
+
+    def close(self):
+        """
+        Shuts down the pool of workers, if any
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
     @staticmethod
     def get_next_fdmp_diff_info(diffs: List[FDMPDiff], diff_i: int) -> Tuple[int, int, int, int]:
         """
@@ -95,10 +173,12 @@ class FDMPVulgaligner():
             minus_c = 0
         return minus_c, equal_c, plus_c, diff_i
 
+    # The verify_* functions check the invariants of the alignment in linear time, they are
+    # called once per alignment when verify is True. They raise AssertionError even when
+    # Python runs with -O.
+
     @staticmethod
-    def assert_diffs_correction(base_ts, other_ts, diffs):
-        if not __debug__:
-            return
+    def verify_diffs(base_ts, other_ts, diffs: List[FDMPDiff]):
         total_minus = 0
         total_equal = 0
         total_plus = 0
@@ -109,43 +189,32 @@ class FDMPVulgaligner():
                 total_minus += d[1]
             else:
                 total_plus += d[1]
-        assert(total_equal + total_minus == len(base_ts))
-        assert(total_equal + total_plus == len(other_ts))
+        if total_equal + total_minus != len(base_ts) or total_equal + total_plus != len(other_ts):
+            raise AssertionError("diffs cover %d and %d characters for token strings of length %d and %d" % (total_equal + total_minus, total_equal + total_plus, len(base_ts), len(other_ts)))
 
     @staticmethod
-    def assert_tokens_correction(ts, tokens):
-        if not __debug__:
-            return
+    def verify_tokens(ts, tokens: TokenList):
         total_inc_t = 0
         for t in tokens:
             total_inc_t += t[2]
-        assert(total_inc_t == len(ts))
+        if total_inc_t != len(ts):
+            raise AssertionError("the increments of the tokens sum to %d for a token string of length %d" % (total_inc_t, len(ts)))
 
     @staticmethod
-    def assert_loop(diffs, diff_i, base_tokens, base_token_i, other_tokens, other_token_i):
-        if not __debug__:
-            return
-        total_minus = 0
-        total_equal = 0
-        total_plus = 0
-        for d in diffs[diff_i:]:
-            if d[0] == '=':
-                total_equal += d[1]
-            elif d[0] == '-':
-                total_minus += d[1]
+    def verify_alignment_matrix(matrix: TokenMatrix, token_lists: List[TokenList], cells_per_base_tokens: List[int]):
+        """
+        Checks that the matrix has the expected number of rows and that each column contains
+        all the tokens of its witness, in order. token_lists includes the base.
+        """
+        if len(matrix) != sum(cells_per_base_tokens):
+            raise AssertionError("the matrix has %d rows instead of %d" % (len(matrix), sum(cells_per_base_tokens)))
+        for column_i, tokens in enumerate(token_lists):
+            if isinstance(matrix, ArrayTokenMatrix):
+                column_tokens = [matrix.get_token(row_i, column_i) for row_i in np.flatnonzero(~matrix.gaps[:, column_i])]
             else:
-                total_plus += d[1]
-        remaining_base_ts_len = total_equal + total_minus
-        remaining_other_ts_len = total_equal + total_plus
-        total_inc_base_t = 0
-        for t in base_tokens[base_token_i:]:
-            total_inc_base_t += t[2]
-        total_inc_other_t = 0
-        for t in other_tokens[other_token_i:]:
-            total_inc_other_t += t[2]
-        logger.debug("remaining_other_ts_len = %d, remaining_other_tokens=%d, total_inc_other_t=%d", remaining_other_ts_len, len(other_tokens)-other_token_i-1, total_inc_other_t)
-        assert(remaining_base_ts_len == total_inc_base_t)
-        assert(remaining_other_ts_len == total_inc_other_t)
+                column_tokens = [row[column_i] for row in matrix if row[column_i] is not None]
+            if column_tokens != list(tokens):
+                raise AssertionError("column %d of the matrix does not contain the %d tokens of the witness" % (column_i, len(tokens)))
 
     @staticmethod
     def fill_cells_per_base_tokens(base_tokens: TokenList, other_tokens: TokenList, diffs: List[FDMPDiff], cells_per_base_tokens: List[int]) -> None:
@@ -184,48 +253,44 @@ class FDMPVulgaligner():
         len_other_tokens = len(other_tokens)
         len_base_tokens = len(base_tokens)
         last_equal_nb_other_tokens = 0
-        logger.debug(diffs)
-        logger.debug("fill_cells_per_base_tokens for nb_base_tokens=%d, nb_other_tokens=%d", len_base_tokens, len_other_tokens)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("fill_cells_per_base_tokens for nb_base_tokens=%d, nb_other_tokens=%d, diffs=%s", len_base_tokens, len_other_tokens, diffs)
         diff_i = 0
         while diff_i < len(diffs):
-            #FDMPVulgaligner.assert_loop(diffs, diff_i, base_tokens, base_token_i, other_tokens, other_token_i)
             minus_c, equal_c, plus_c, next_diff_i = FDMPVulgaligner.get_next_fdmp_diff_info(diffs, diff_i)
-            logger.debug("new iteration with (%d -, %d =, %d +)", minus_c, equal_c, plus_c)
             if minus_c > 0:
                 nb_base_ts_c = 0
                 while base_token_i < len_base_tokens and nb_base_ts_c + base_tokens[base_token_i][2] <= minus_c:
                     nb_base_ts_c += base_tokens[base_token_i][2]
                     base_token_i += 1
-                assert(nb_base_ts_c == minus_c)
+                if nb_base_ts_c != minus_c:
+                    raise AssertionError("the deletion of %d characters at diff %d covers %d characters of base tokens" % (minus_c, diff_i, nb_base_ts_c))
             if equal_c > 0:
                 nb_base_ts_c = 0
                 nb_other_ts_c = 0
                 while nb_base_ts_c < equal_c and base_token_i < len_base_tokens:
                     nb_base_tokens = 1
                     nb_other_tokens = 0
-                    logger.debug("  new iteration: nb_base_ts_c = %d, nb_base_tokens = %d", nb_base_ts_c, nb_base_tokens)
                     # TODO: this won't work well for cases where one token has more than
                     # 1 characters in the string and the diff overlaps
                     nb_base_ts_c += base_tokens[base_token_i][2]
                     # add all tokens with 0 increment:
                     while base_token_i+nb_base_tokens < len_base_tokens and base_tokens[base_token_i+nb_base_tokens][2] < 1:
                         nb_base_tokens += 1
-                    logger.debug("  nb_base_ts_c=%d, nb_base_tokens=%d, nb_other_ts_c=%d, other_tokens[other_token_i+nb_other_tokens][2]=%d, other_token_i+nb_other_tokens=%d/%d", nb_base_ts_c, nb_base_tokens, nb_other_ts_c, other_tokens[other_token_i][2], other_token_i+nb_other_tokens, len_other_tokens)
                     while other_token_i+nb_other_tokens < len_other_tokens and nb_other_ts_c + other_tokens[other_token_i+nb_other_tokens][2] <= nb_base_ts_c:
-                        logger.debug("    new sub_iteration: nb_other_ts_c = %d, nb_other_tokens = %d, nb_other_ts_c += %d", nb_other_ts_c, nb_other_tokens, other_tokens[other_token_i+nb_other_tokens][2])
                         nb_other_ts_c += other_tokens[other_token_i+nb_other_tokens][2]
                         nb_other_tokens += 1
-                    logger.debug("  add %d base and %d others", nb_base_tokens, nb_other_tokens)
                     # if there's more other tokens than there are base tokens, the
                     # final base token should have 1 + the difference
                     if nb_other_tokens > nb_base_tokens:
-                        logger.debug("  set %d to max(%d)", base_token_i+nb_base_tokens, 1 + nb_other_tokens - nb_base_tokens)
                         cells_per_base_tokens[base_token_i+nb_base_tokens] = max(cells_per_base_tokens[base_token_i+nb_base_tokens], 1 + nb_other_tokens - nb_base_tokens)
                     base_token_i += nb_base_tokens
                     other_token_i += nb_other_tokens
                     last_equal_nb_other_tokens = nb_other_tokens
-                assert(nb_base_ts_c == equal_c)
-                assert(nb_other_ts_c == equal_c)
+                # a token with more than one character split by the boundary of a diff cannot be
+                # aligned, this also prevents fill_other_column() from looping on it
+                if nb_base_ts_c != equal_c or nb_other_ts_c != equal_c:
+                    raise AssertionError("the equality of %d characters at diff %d covers %d characters of base tokens and %d of other tokens" % (equal_c, diff_i, nb_base_ts_c, nb_other_ts_c))
             if plus_c > 0:
                 nb_other_ts_c = 0
                 nb_other_tokens = 0
@@ -237,30 +302,30 @@ class FDMPVulgaligner():
                 else:
                     # special case for the first cell of the list, which is 0 by default, not 1
                     cells_per_base_tokens[base_token_i] = max(cells_per_base_tokens[base_token_i], nb_other_tokens)
-                logging.debug("nb_other_ts_c = %d, nb_other_tokens = %d", nb_other_ts_c, nb_other_tokens)
                 other_token_i += nb_other_tokens
-                assert(nb_other_ts_c == plus_c)
+                if nb_other_ts_c != plus_c:
+                    raise AssertionError("the insertion of %d characters at diff %d covers %d characters of other tokens" % (plus_c, diff_i, nb_other_ts_c))
             if equal_c == 0:
                 last_equal_nb_other_tokens = 0
             diff_i = next_diff_i
         assert(other_token_i == len(other_tokens))
         assert(base_token_i == len(base_tokens))
-        logger.debug("fill_cells_per_base_tokens done with base_token_i = %d, other_token_i = %d", base_token_i, other_token_i)
-        logger.debug(cells_per_base_tokens)
 
 
     @staticmethod
-    def fill_base_column(matrix: TokenMatrix, base_tokens: TokenList, cells_per_base_tokens: List[int]) -> TokenList:
+    def fill_base_column(matrix: TokenMatrix, base_tokens: TokenList, cells_per_base_tokens: List[int], column_i: int = 0) -> TokenList:
         """
-        Returns the first row of the matrix.
+        Fills the column of the base witness in the matrix.
         - base_tokens is the list of tokens of the base witness
         - cells_per_base_tokens: see fill_cells_per_base_tokens
-        - total_sum is the length of the rows in the matrix (all have the same)
+        - column_i is the column of the base witness
         """
+        row_indexes = []
         matrix_row_i = cells_per_base_tokens[0]
         for i, t in enumerate(base_tokens):
-            matrix[matrix_row_i][0] = t
+            row_indexes.append(matrix_row_i)
             matrix_row_i += cells_per_base_tokens[i+1]
+        set_token_matrix_column(matrix, column_i, row_indexes, base_tokens)
 
     @staticmethod
     def fill_other_column(matrix: TokenMatrix, column_i: int, base_tokens: TokenList, other_tokens: TokenList, diffs: List[FDMPDiff], cells_per_base_tokens: List[int]) -> TokenList:
@@ -280,23 +345,19 @@ class FDMPVulgaligner():
         len_other_tokens = len(other_tokens)
         last_equal_nb_other_tokens = 0
         diff_i = 0
-        logger.debug("len_base_tokens=%d", len_base_tokens)
-        logger.debug(base_tokens)
-        logger.debug(other_tokens)
-        logger.debug(diffs)
-        logger.debug(cells_per_base_tokens)
+        # the tokens of the column and their row indexes, the column is set at the end
+        row_indexes = []
+        column_tokens = []
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("fill_other_column %d for nb_base_tokens=%d, nb_other_tokens=%d, diffs=%s", column_i, len_base_tokens, len_other_tokens, diffs)
         while diff_i < len(diffs):
-            debug_token_matrix(logger, matrix)
-            FDMPVulgaligner.assert_loop(diffs, diff_i, base_tokens, base_token_i, other_tokens, other_token_i)
             minus_c, equal_c, plus_c, next_diff_i = FDMPVulgaligner.get_next_fdmp_diff_info(diffs, diff_i)
-            logger.debug("iteration with (%d -, %d =, %d +), matrix_row_i = %d/%d, other_token_i = %d/%d", minus_c, equal_c, plus_c, matrix_row_i, len_matrix, other_token_i, len_other_tokens)
             # at any point in time, the number of columns left in the matrix should be (by design)
             # higher or equal to the number of tokens left:
             #assert(len_matrix - matrix_row_i >= len_other_tokens - other_token_i)
             if minus_c > 0:
                 nb_base_ts_c = 0
                 while base_token_i < len_base_tokens and nb_base_ts_c + base_tokens[base_token_i][2] <= minus_c:
-                    logger.debug("  other_row '-', matrix_row_i=%d/%d, base_token_i=%d, iteration because %d < %d", matrix_row_i, len_matrix, base_token_i, nb_base_ts_c, minus_c)
                     nb_base_ts_c += base_tokens[base_token_i][2]
                     matrix_row_i += cells_per_base_tokens[base_token_i+1]
                     base_token_i += 1
@@ -306,44 +367,35 @@ class FDMPVulgaligner():
                 while nb_base_ts_c < equal_c and base_token_i < len_base_tokens:
                     last_equal_nb_other_tokens = 0
                     #assert(len_matrix - matrix_row_i >= len_other_tokens - other_token_i)
-                    logger.debug("  other_row '=', matrix_row_i=%d/%d, base_token_i=%d, iteration because %d < %d", matrix_row_i, len_matrix, base_token_i, nb_base_ts_c, equal_c)
-                    debug_token_matrix(logger, matrix)
-                    # iterate on all tokens with 0 increment:
+                    # iterate on one token and all the tokens with 0 increment around it (the first token
+                    # is always taken, even if it has more than one character):
                     total_nb_base_ts_c_increment = 0
                     matrix_row_next_i = matrix_row_i
-                    while base_token_i < len_base_tokens and total_nb_base_ts_c_increment + base_tokens[base_token_i][2] < 2:
+                    while base_token_i < len_base_tokens and (total_nb_base_ts_c_increment == 0 or base_tokens[base_token_i][2] == 0):
                         total_nb_base_ts_c_increment += base_tokens[base_token_i][2]
                         base_token_i += 1
                         matrix_row_next_i += cells_per_base_tokens[base_token_i]
-                    #logger.debug("  total_nb_base_ts_c_increment=%d" % total_nb_base_ts_c_increment)
                     nb_base_ts_c += total_nb_base_ts_c_increment
-                    logger.debug("  matrix_row_next_i=%d, nb_other_ts_c=%d, nb_base_ts_c=%d", matrix_row_next_i, nb_other_ts_c, nb_base_ts_c)
                     while other_token_i < len_other_tokens and nb_other_ts_c + other_tokens[other_token_i][2] <= nb_base_ts_c:
-                        logger.debug("    sub-iteration because %d <= %d", nb_other_ts_c, nb_base_ts_c)
-                        debug_token_matrix(logger, matrix)
                         other_token = other_tokens[other_token_i]
                         nb_other_ts_c += other_token[2]
-                        logger.debug("    set matrix_row_i=%d/%d, column_i=%d, nb_other_ts_c=%d", matrix_row_i, len_matrix, column_i, nb_other_ts_c)
-                        matrix[matrix_row_i][column_i] = other_token
+                        row_indexes.append(matrix_row_i)
+                        column_tokens.append(other_token)
                         matrix_row_i += 1
                         other_token_i += 1
                         last_equal_nb_other_tokens += 1
-                    logger.debug("  set matrix_row_i to matrix_row_next_i=%d", matrix_row_next_i)
                     matrix_row_i = matrix_row_next_i
             if plus_c > 0:
                 if diff_i > 0:
                     # general case
                     matrix_row_next_i = matrix_row_i
-                    logger.debug("base_token_i=%d" % base_token_i)
                     matrix_row_i -= cells_per_base_tokens[base_token_i]-last_equal_nb_other_tokens
-                    logger.debug("  other_row '+', matrix_row_i = %d (%d) => %d/%d, other_token_i = %d", matrix_row_next_i, last_equal_nb_other_tokens, matrix_row_i, len_matrix, other_token_i)
                     nb_other_ts_c = 0
                     while other_token_i < len_other_tokens and nb_other_ts_c + other_tokens[other_token_i][2] <= plus_c:
                         other_token = other_tokens[other_token_i]
                         nb_other_ts_c += other_token[2]
-                        logger.debug("  set %d to other_token %s (len=%d)", matrix_row_i, other_token, len_matrix)
-                        matrix[matrix_row_i][column_i] = other_token
-                        #logger.debug(matrix)
+                        row_indexes.append(matrix_row_i)
+                        column_tokens.append(other_token)
                         matrix_row_i += 1
                         other_token_i += 1
                     matrix_row_i = matrix_row_next_i
@@ -360,14 +412,191 @@ class FDMPVulgaligner():
                         other_token_i += 1
                     tokenlist.reverse()
                     for t in tokenlist:
-                        matrix[matrix_row_i][column_i] = t
+                        row_indexes.append(matrix_row_i)
+                        column_tokens.append(t)
                         matrix_row_i -= 1
                     matrix_row_i = matrix_row_next_i
             if equal_c == 0:
                 last_equal_nb_other_tokens = 0
             diff_i = next_diff_i
         assert(matrix_row_i == len_matrix)
+        set_token_matrix_column(matrix, column_i, row_indexes, column_tokens)
+
+
+    @staticmethod
+    def snap_diffs_to_tokens(base_tokens: TokenList, other_tokens: TokenList, diffs: List[FDMPDiff]) -> List[FDMPDiff]:
+        """
+        Returns the diffs changed so that no equality and no pair of a change (see get_next_fdmp_diff_info())
+        splits a token with an increment of 2 or more (shorthands, see Tokenizer.tokenize()), which the
+        filling functions cannot align:
+        - the parts of an equality before its first and after its last position that is a token boundary
+          in both witnesses are moved to the changes around it
+        - a change that would be paired by position in the middle of a token is cut by an empty equality,
+          its '+' is then aligned like an insertion after its '-'
+
+        The diffs are returned as they are if all the tokens have an increment of 0 or 1.
+        """
+        if all(t[2] <= 1 for t in base_tokens) and all(t[2] <= 1 for t in other_tokens):
+            return diffs
+        base_offsets = get_token_offsets(base_tokens)
+        other_offsets = get_token_offsets(other_tokens)
+        base_boundaries = np.zeros(base_offsets[-1]+1, dtype=bool)
+        base_boundaries[base_offsets] = True
+        other_boundaries = np.zeros(other_offsets[-1]+1, dtype=bool)
+        other_boundaries[other_offsets] = True
+        res = []
+        # the current change starts at (base_pos, other_pos)
+        base_pos = 0
+        other_pos = 0
+        minus_c = 0
+        plus_c = 0
+        for op, length in diffs:
+            if op == '-':
+                minus_c += length
+                continue
+            if op == '+':
+                plus_c += length
+                continue
+            base_start = base_pos + minus_c
+            other_start = other_pos + plus_c
+            first = 0
+            while first < length and not (base_boundaries[base_start+first] and other_boundaries[other_start+first]):
+                first += 1
+            last = length
+            while last > first and not (base_boundaries[base_start+last] and other_boundaries[other_start+last]):
+                last -= 1
+            if last == first:
+                # no part of the equality can be kept
+                minus_c += length
+                plus_c += length
+                continue
+            FDMPVulgaligner.append_snapped_change(res, base_boundaries, other_boundaries, base_pos, other_pos, minus_c + first, plus_c + first)
+            res.append(('=', last - first))
+            base_pos = base_start + last
+            other_pos = other_start + last
+            minus_c = length - last
+            plus_c = length - last
+        FDMPVulgaligner.append_snapped_change(res, base_boundaries, other_boundaries, base_pos, other_pos, minus_c, plus_c)
+        return res
+
+    @staticmethod
+    def append_snapped_change(diffs: List[FDMPDiff], base_boundaries: np.ndarray, other_boundaries: np.ndarray, base_pos: int, other_pos: int, minus_c: int, plus_c: int):
+        """
+        Appends a change starting at (base_pos, other_pos) to diffs, see snap_diffs_to_tokens()
+        """
+        if minus_c > 0:
+            diffs.append(('-', minus_c))
+        # the paired characters are the last ones of the '-' or the first ones of the '+'
+        if minus_c > plus_c > 0 and not base_boundaries[base_pos + minus_c - plus_c]:
+            diffs.append(('=', 0))
+        elif plus_c > minus_c > 0 and not other_boundaries[other_pos + minus_c]:
+            diffs.append(('=', 0))
+        if plus_c > 0:
+            diffs.append(('+', plus_c))
+
+    @staticmethod
+    def get_initial_cells_per_base_tokens(base_tokens: TokenList) -> List[int]:
+        cells_per_base_tokens = [1] * (len(base_tokens)+1)
+        cells_per_base_tokens[0] = 0
+        return cells_per_base_tokens
+
+    @staticmethod
+    def get_witness_diffs(differ: Differ, base_token_string: str, base_tokens: TokenList, other_token_string: str, other_tokens: TokenList, cells_per_base_tokens: List[int], realigner: BandedRealigner = None) -> List[FDMPDiff]:
+        """
+        Returns the diffs between the base and one witness (re-aligned by the realigner if set) and
+        updates cells_per_base_tokens (see fill_cells_per_base_tokens)
+        """
+        diffs = differ.diff(base_token_string, other_token_string)
+        if realigner is not None:
+            diffs = realigner.realign(diffs, base_tokens, other_tokens)
+        diffs = FDMPVulgaligner.snap_diffs_to_tokens(base_tokens, other_tokens, diffs)
+        # update cells_per_base_tokens
+        FDMPVulgaligner.fill_cells_per_base_tokens(base_tokens, other_tokens, diffs, cells_per_base_tokens)
+        return diffs
+
+    @staticmethod
+    def get_witness_diffs_and_cells(differ: Differ, base_token_string: str, base_tokens: TokenList, other_token_string: str, other_tokens: TokenList, realigner: BandedRealigner = None) -> Tuple[List[FDMPDiff], List[int]]:
+        """
+        Returns the diffs between the base and one witness and the cells_per_base_tokens of this
+        witness alone, used in the workers of the parallel mode
+        """
+        cells_per_base_tokens = FDMPVulgaligner.get_initial_cells_per_base_tokens(base_tokens)
+        diffs = FDMPVulgaligner.get_witness_diffs(differ, base_token_string, base_tokens, other_token_string, other_tokens, cells_per_base_tokens, realigner)
+        return diffs, cells_per_base_tokens
 
+    def get_diffs_in_parallel(self, base_token_string: str, base_tokens: TokenList, token_strings: List[str], token_lists: List[TokenList], diff_lists: List[List[FDMPDiff]]) -> List[int]:
+        """
+        Computes the diffs between the base and the other witnesses in the pool of workers, appends them
+        to diff_lists and returns cells_per_base_tokens. Each worker computes the cells_per_base_tokens
+        of one witness, since fill_cells_per_base_tokens() only takes the max of the existing and new
+        values, merging them with max() in the witness order gives the same result as the serial computation.
+        """
+        executor = self.get_executor()
+        futures = []
+        for i, other_token_string in enumerate(token_strings):
+            futures.append(executor.submit(FDMPVulgaligner.get_witness_diffs_and_cells, self.differ, base_token_string, base_tokens, other_token_string, token_lists[i], self.realigner))
+        cells_per_base_tokens = FDMPVulgaligner.get_initial_cells_per_base_tokens(base_tokens)
+        for future in futures:
+            diffs, witness_cells_per_base_tokens = future.result()
+            diff_lists.append(diffs)
+            cells_per_base_tokens = list(map(max, cells_per_base_tokens, witness_cells_per_base_tokens))
+        return cells_per_base_tokens
+
+    def get_diffs_and_cells(self, base_token_string: str, base_tokens: TokenList, token_strings: List[str], token_lists: List[TokenList]) -> Tuple[List[List[FDMPDiff]], List[int]]:
+        """
+        Returns the diffs between the base and each other witness and cells_per_base_tokens
+        (see fill_cells_per_base_tokens)
+        """
+        if self.verify:
+            FDMPVulgaligner.verify_tokens(base_token_string, base_tokens)
+            for i, other_token_string in enumerate(token_strings):
+                FDMPVulgaligner.verify_tokens(other_token_string, token_lists[i])
+        profiler = self.profiler
+        # compute the diffs with fdmp
+        diff_lists = []
+        if self.nb_workers > 1 and len(token_strings) > 1:
+            # the workers compute the cells too
+            with profiler.stage("diff"):
+                cells_per_base_tokens = self.get_diffs_in_parallel(base_token_string, base_tokens, token_strings, token_lists, diff_lists)
+        else:
+            cells_per_base_tokens = FDMPVulgaligner.get_initial_cells_per_base_tokens(base_tokens)
+            for i, other_token_string in enumerate(token_strings):
+                with profiler.stage("diff"):
+                    diffs = self.differ.diff(base_token_string, other_token_string)
+                if self.realigner is not None:
+                    with profiler.stage("realign"):
+                        diffs = self.realigner.realign(diffs, base_tokens, token_lists[i])
+                with profiler.stage("cells"):
+                    diffs = FDMPVulgaligner.snap_diffs_to_tokens(base_tokens, token_lists[i], diffs)
+                    FDMPVulgaligner.fill_cells_per_base_tokens(base_tokens, token_lists[i], diffs, cells_per_base_tokens)
+                diff_lists.append(diffs)
+        if self.verify:
+            for i, diffs in enumerate(diff_lists):
+                FDMPVulgaligner.verify_diffs(base_token_string, token_strings[i], diffs)
+        return diff_lists, cells_per_base_tokens
+
+    def fill_alignment_matrix(self, base_tokens: TokenList, token_lists: List[TokenList], diff_lists: List[List[FDMPDiff]], cells_per_base_tokens: List[int], base_column_i: int = 0) -> TokenMatrix:
+        """
+        Returns the alignment matrix of the base and the other witnesses, given the diffs and cells_per_base_tokens.
+        The base is in the column base_column_i, the other witnesses in the other columns, in order.
+        """
+        profiler = self.profiler
+        nb_rows = sum(cells_per_base_tokens)
+        other_column_indexes = [column_i for column_i in range(len(token_lists)+1) if column_i != base_column_i]
+        with profiler.stage("fill"):
+            # initialize the matrix:
+            matrix = get_empty_token_matrix(nb_rows, len(token_lists)+1, self.array_matrix)
+            # special case for the column corresponding to the base witness
+            FDMPVulgaligner.fill_base_column(matrix, base_tokens, cells_per_base_tokens, base_column_i)
+            for i, diffs in enumerate(diff_lists):
+                FDMPVulgaligner.fill_other_column(matrix, other_column_indexes[i], base_tokens, token_lists[i], diffs, cells_per_base_tokens)
+        if profiler.enabled:
+            profiler.add("matrices")
+            profiler.add("matrix_rows", nb_rows)
+            profiler.add("matrix_cells", nb_rows * (len(token_lists)+1))
+        if self.verify:
+            FDMPVulgaligner.verify_alignment_matrix(matrix, token_lists[:base_column_i] + [base_tokens] + token_lists[base_column_i:], cells_per_base_tokens)
+        return matrix
 
     def get_alignment_matrix(self, token_strings: List[str], token_lists: List[TokenList]) -> TokenMatrix:
         """
@@ -379,26 +608,258 @@ class FDMPVulgaligner():
 
         It returns an alignment matrix in the form of a matrix of tokens, one row per witness.
         Gaps in the matrix have the value None.
+
+        The base witness is chosen by the base selector (see __init__()). The arguments are not modified,
+        with or without a transposition detector.
         """
-        base_tokens = token_lists.pop(0)
-        base_token_string = token_strings.pop(0)
-        FDMPVulgaligner.assert_tokens_correction(base_token_string, base_tokens)
-        cells_per_base_tokens = [1] * (len(base_tokens)+1)
-        cells_per_base_tokens[0] = 0
-        # compute the diffs with fdmp
-        diff_lists = []
-        for i, other_token_string in enumerate(token_strings):
-            diffs = diff(base_token_string, other_token_string, checklines=0, cleanup=None)
-            #FDMPVulgaligner.assert_diffs_correction(base_token_string, other_token_string, diffs)
-            diff_lists.append(diffs)
-            other_tokens = token_lists[i]
-            #FDMPVulgaligner.assert_tokens_correction(other_token_string, other_tokens)
-            # update cells_per_base_tokens
-            FDMPVulgaligner.fill_cells_per_base_tokens(base_tokens, other_tokens, diffs, cells_per_base_tokens)
-        # initialize the matrix:
-        matrix = [[None for _ in range(len(token_lists)+1) ] for _ in range(sum(cells_per_base_tokens))]
-        # special case for the first row corresponding to the base witness
-        FDMPVulgaligner.fill_base_column(matrix, base_tokens, cells_per_base_tokens)
+        base_i = self.get_base_index(token_strings, token_lists)
+        token_strings, token_lists = self.move_transposed_blocks(base_i, token_strings, token_lists)
+        base_tokens = token_lists[base_i]
+        base_token_string = token_strings[base_i]
+        other_token_strings = token_strings[:base_i] + token_strings[base_i+1:]
+        other_token_lists = token_lists[:base_i] + token_lists[base_i+1:]
+        diff_lists, cells_per_base_tokens = self.get_diffs_and_cells(base_token_string, base_tokens, other_token_strings, other_token_lists)
+        return self.fill_alignment_matrix(base_tokens, other_token_lists, diff_lists, cells_per_base_tokens, base_i)
+
+    def get_base_index(self, token_strings: List[str], token_lists: List[TokenList]) -> int:
+        with self.profiler.stage("base_selection"):
+            base_i = self.base_selector.get_base_index(token_strings, token_lists)
+        if base_i != 0:
+            self.profiler.add("non_first_bases")
+        return base_i
+
+    def move_transposed_blocks(self, base_i: int, token_strings: List[str], token_lists: List[TokenList]) -> Tuple[List[str], List[TokenList]]:
+        """
+        Returns the token strings and the token lists with the transposed blocks of each witness moved to
+        their place in the base (see TranspositionDetector), in new lists. Returns the arguments if there is
+        no transposition detector, callers must not modify them.
+        """
+        if self.transposition_detector is None:
+            return token_strings, token_lists
+        token_strings = list(token_strings)
+        token_lists = list(token_lists)
+        profiler = self.profiler
+        with profiler.stage("transpositions"):
+            for i in range(len(token_lists)):
+                if i == base_i:
+                    continue
+                token_strings[i], token_lists[i], moved_blocks = self.transposition_detector.move_blocks(token_strings[base_i], token_strings[i], token_lists[i])
+                if moved_blocks and profiler.enabled:
+                    profiler.add("transposed_blocks", len(moved_blocks))
+                    profiler.add("transposed_chars", sum(length for _, _, length in moved_blocks))
+        return token_strings, token_lists
+
+    @staticmethod
+    def get_equal_token_indexes(base_tokens: TokenList, other_tokens: TokenList, base_offsets: np.ndarray, other_offsets: np.ndarray, diffs: List[FDMPDiff]) -> np.ndarray:
+        """
+        Returns, for each base token, the index of the token of the other witness that it is equal to,
+        -1 if there is none. Tokens are equal when they have an increment of 1, are at the same position
+        of an equality of the diffs and have the same string (so the same normalized token is not enough
+        if the original strings differ, ex: with a line break).
+
+        base_offsets and other_offsets are the offsets of the tokens (see get_token_offsets()).
+        """
+        # position in the other token string of each position of the base token string, -1 outside of equalities
+        char_map = np.full(base_offsets[-1], -1, dtype=np.int64)
+        base_pos = 0
+        other_pos = 0
+        for op, length in diffs:
+            if op == '=':
+                char_map[base_pos:base_pos+length] = np.arange(other_pos, other_pos+length)
+            if op != '+':
+                base_pos += length
+            if op != '-':
+                other_pos += length
+        # index of the token starting at each position of the other token string, for tokens with an increment of 1
+        other_char_to_token = np.full(other_offsets[-1], -1, dtype=np.int64)
+        other_candidates = np.flatnonzero(np.diff(other_offsets) == 1)
+        other_char_to_token[other_offsets[other_candidates]] = other_candidates
+        res = np.full(len(base_tokens), -1, dtype=np.int64)
+        candidates = np.flatnonzero(np.diff(base_offsets) == 1)
+        other_positions = char_map[base_offsets[candidates]]
+        candidates = candidates[other_positions >= 0]
+        other_indexes = other_char_to_token[other_positions[other_positions >= 0]]
+        candidates = candidates[other_indexes >= 0]
+        other_indexes = other_indexes[other_indexes >= 0]
+        same_string = np.array([base_tokens[i][3] == other_tokens[j][3] for i, j in zip(candidates.tolist(), other_indexes.tolist())], dtype=bool)
+        res[candidates[same_string]] = other_indexes[same_string]
+        return res
+
+    @staticmethod
+    def get_consensus_runs(token_lists: List[TokenList], offsets_list: List[np.ndarray], diff_lists: List[List[FDMPDiff]], cells_per_base_tokens: List[int], min_run_size: int) -> List[Tuple[List[int], int]]:
+        """
+        Returns the runs of at least min_run_size base tokens that are equal to a token in every
+        other witness (see get_equal_token_indexes()) and need only one row in the matrix, with
+        consecutive tokens in all the witnesses. A run is a tuple with the indexes of its first token
+        in each witness (base first) and its number of rows.
+
+        The last token of a run is left out of it, except at the end of the texts, so that the diffs
+        of the variant region that follows start with an equality (see get_compressed_alignment()).
+        """
+        base_tokens = token_lists[0]
+        nb_base_tokens = len(base_tokens)
+        if nb_base_tokens == 0:
+            return []
+        is_consensus = np.array(cells_per_base_tokens[1:]) == 1
+        continues = np.ones(nb_base_tokens, dtype=bool)
+        other_index_arrays = []
         for i, diffs in enumerate(diff_lists):
-            FDMPVulgaligner.fill_other_column(matrix, i+1, base_tokens, token_lists[i], diffs, cells_per_base_tokens)
-        return matrix
\ No newline at end of file
+            other_indexes = FDMPVulgaligner.get_equal_token_indexes(base_tokens, token_lists[i+1], offsets_list[0], offsets_list[i+1], diffs)
+            is_consensus &= other_indexes >= 0
+            continues[1:] &= other_indexes[1:] == other_indexes[:-1] + 1
+            other_index_arrays.append(other_indexes)
+        # a base token continues the run of the previous one if both are consensus tokens
+        # and the tokens are consecutive in all the witnesses
+        continues[0] = False
+        continues[1:] &= is_consensus[:-1]
+        continues &= is_consensus
+        run_starts = np.flatnonzero(is_consensus & ~continues)
+        # a run ends on the next token that doesn't continue it
+        not_continued = np.append(np.flatnonzero(~continues), nb_base_tokens)
+        run_ends = not_continued[np.searchsorted(not_continued, run_starts, side='right')]
+        at_text_ends = all(other_indexes[-1] + 1 == len(token_lists[i+1]) for i, other_indexes in enumerate(other_index_arrays))
+        res = []
+        for run_start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+            nb_rows = run_end - run_start
+            if run_end < nb_base_tokens or not at_text_ends:
+                nb_rows -= 1
+            if nb_rows >= max(min_run_size, 1):
+                res.append(([run_start] + [int(other_indexes[run_start]) for other_indexes in other_index_arrays], nb_rows))
+        return res
+
+    @staticmethod
+    def remove_diff_ranges(diffs: List[FDMPDiff], base_ranges: List[Tuple[int, int]], other_starts: List[int]) -> List[FDMPDiff]:
+        """
+        Returns the diffs without the ranges of positions of the base token string in base_ranges (ascending),
+        other_starts are the corresponding positions in the other token string. Each range must be an equality
+        in the diffs, it can start or end in the middle of a '=' diff.
+        """
+        res = []
+        range_i = 0
+        nb_ranges = len(base_ranges)
+        base_pos = 0
+        other_pos = 0
+        for op, length in diffs:
+            while length > 0:
+                part_length = length
+                in_range = False
+                if range_i < nb_ranges:
+                    range_start, range_end = base_ranges[range_i]
+                    # an insertion at the start of a range is before the range
+                    if base_pos >= range_start and (op != '+' or base_pos > range_start):
+                        if op != '=' or other_pos - base_pos != other_starts[range_i] - range_start:
+                            raise AssertionError("range %d of the base is not an equality in the diffs" % range_i)
+                        in_range = True
+                        part_length = min(length, range_end - base_pos)
+                    elif op != '+':
+                        part_length = min(length, range_start - base_pos)
+                if not in_range:
+                    res.append((op, part_length))
+                length -= part_length
+                if op != '+':
+                    base_pos += part_length
+                if op != '-':
+                    other_pos += part_length
+                if in_range and base_pos == range_end:
+                    range_i += 1
+        return res
+
+    def get_compressed_alignment(self, token_strings: List[str], token_lists: List[TokenList]) -> Tuple[TokenMatrix, List[ConsensusRun]]:
+        """
+        Same as get_alignment_matrix() but the runs of at least min_consensus_run_size tokens that are
+        the same in all the witnesses are returned as ConsensusRun objects instead of rows of the matrix,
+        so that the size of the matrix depends on the number of variants, not on the length of the texts.
+
+        Returns the matrix of the variant regions and the consensus runs, the rows of a run are between the
+        rows row_i-1 and row_i of the matrix (see ConsensusRun.row_i and get_alignment_rows()). The rows are
+        the same as the rows of get_alignment_matrix().
+
+        The arguments are not modified.
+        """
+        # the base is put first in the token lists, the columns of the matrix and the consensus runs are in the
+        # order of the arguments
+        base_i = self.get_base_index(token_strings, token_lists)
+        token_strings, token_lists = self.move_transposed_blocks(base_i, token_strings, token_lists)
+        caller_token_lists = token_lists
+        order = [base_i] + [i for i in range(len(token_lists)) if i != base_i]
+        token_strings = [token_strings[i] for i in order]
+        token_lists = [token_lists[i] for i in order]
+        base_tokens = token_lists[0]
+        diff_lists, cells_per_base_tokens = self.get_diffs_and_cells(token_strings[0], base_tokens, token_strings[1:], token_lists[1:])
+        offsets_list = [np.array(get_token_offsets(tokens), dtype=np.int64) for tokens in token_lists]
+        runs = FDMPVulgaligner.get_consensus_runs(token_lists, offsets_list, diff_lists, cells_per_base_tokens, self.min_consensus_run_size)
+        if not runs:
+            return self.fill_alignment_matrix(base_tokens, token_lists[1:], diff_lists, cells_per_base_tokens, base_i), []
+        profiler = self.profiler
+        if profiler.enabled:
+            profiler.add("consensus_runs", len(runs))
+            profiler.add("consensus_rows", sum(nb_rows for _, nb_rows in runs))
+        # the tokens of the variant regions of each witness, concatenated
+        region_token_lists = []
+        for column_i, tokens in enumerate(token_lists):
+            region_tokens = []
+            region_start = 0
+            for first_token_indexes, nb_rows in runs:
+                region_tokens += tokens[region_start:first_token_indexes[column_i]]
+                region_start = first_token_indexes[column_i] + nb_rows
+            region_tokens += tokens[region_start:]
+            region_token_lists.append(region_tokens)
+        # the diffs of the concatenated variant regions, they are separated by the last token of the runs, which is
+        # an equality (see get_consensus_runs()) so that the diffs of two regions are not merged into one change
+        region_diff_lists = []
+        base_offsets = offsets_list[0]
+        base_ranges = [(int(base_offsets[first_token_indexes[0]]), int(base_offsets[first_token_indexes[0] + nb_rows])) for first_token_indexes, nb_rows in runs]
+        for i, diffs in enumerate(diff_lists):
+            other_starts = [int(offsets_list[i+1][first_token_indexes[i+1]]) for first_token_indexes, _ in runs]
+            region_diff_lists.append(FDMPVulgaligner.remove_diff_ranges(diffs, base_ranges, other_starts))
+        # cells_per_base_tokens without the base tokens of the runs, its cumulative sum gives the row of each run
+        in_region = np.ones(len(cells_per_base_tokens), dtype=bool)
+        for first_token_indexes, nb_rows in runs:
+            in_region[first_token_indexes[0]+1:first_token_indexes[0]+nb_rows+1] = False
+        cells = np.array(cells_per_base_tokens)
+        region_cells_per_base_tokens = cells[in_region].tolist()
+        rows_before = np.cumsum(np.where(in_region, cells, 0))
+        matrix = self.fill_alignment_matrix(region_token_lists[0], region_token_lists[1:], region_diff_lists, region_cells_per_base_tokens, base_i)
+        consensus_runs = []
+        for first_token_indexes, nb_rows in runs:
+            caller_first_token_indexes = [0] * len(order)
+            for i, first_token_i in zip(order, first_token_indexes):
+                caller_first_token_indexes[i] = first_token_i
+            consensus_runs.append(ConsensusRun(caller_token_lists, caller_first_token_indexes, nb_rows, int(rows_before[first_token_indexes[0]])))
+        return matrix, consensus_runs
+
+    def iter_windows(self, token_strings: List[str], token_lists: List[TokenList]) -> Iterator[Tuple[List[str], List[TokenList]]]:
+        """
+        Yields the token strings and the token lists of each window if window_size is set (see __init__()),
+        or the whole texts
+        """
+        if self.window_size is None:
+            yield token_strings, token_lists
+            return
+        offsets_list = [get_token_offsets(tokens) for tokens in token_lists]
+        anchors = find_anchors(token_strings, token_lists, offsets_list, self.anchor_ngram_size)
+        windows = get_windows(token_lists, anchors, self.window_size)
+        logger.debug("streaming alignment with %d anchors in %d windows", len(anchors), len(windows))
+        for window in windows:
+            window_token_strings = []
+            window_token_lists = []
+            for i, (start, end) in enumerate(window):
+                offsets = offsets_list[i]
+                window_token_strings.append(token_strings[i][offsets[start]:offsets[end]])
+                window_token_lists.append(token_lists[i][start:end])
+            yield window_token_strings, window_token_lists
+
+    def iter_alignment_matrices(self, token_strings: List[str], token_lists: List[TokenList]) -> Iterator[TokenMatrix]:
+        """
+        Yields the alignment matrix window by window if window_size is set, see get_alignment_matrix()
+        for the arguments and the result.
+        """
+        for window_token_strings, window_token_lists in self.iter_windows(token_strings, token_lists):
+            yield self.get_alignment_matrix(window_token_strings, window_token_lists)
+
+    def iter_compressed_alignments(self, token_strings: List[str], token_lists: List[TokenList]) -> Iterator[Tuple[TokenMatrix, List[ConsensusRun]]]:
+        """
+        Yields the compressed alignment (see get_compressed_alignment()) window by window if window_size is set
+        """
+        for window_token_strings, window_token_lists in self.iter_windows(token_strings, token_lists):
+            yield self.get_compressed_alignment(window_token_strings, window_token_lists)
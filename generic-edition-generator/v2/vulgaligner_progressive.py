@@ -0,0 +1,223 @@
+import logging
+import numpy as np
+from vulgaligner import Vulgaligner, TokenMatrix
+from tokenizer import TokenList
+from typing import Dict, List, Tuple
+from token_matrix import get_empty_token_matrix, set_token_matrix_column
+from differ import Differ, Diff
+from differ_fdmp import FDMPDiffer
+from realigner import BandedRealigner
+from base_selector import MedoidBaseSelector
+from anchors import get_token_offsets
+from profiling import Profiler, NULL_PROFILER
+
+logger = logging.getLogger('ProgressiveVulgaligner')
+
+# the codes of the rows are encoded as characters from this code point, skipping the surrogates
+FIRST_ROW_CHARACTER = 0x100
+
+def get_row_string(codes: np.ndarray) -> str:
+    """
+    Returns the codes of the rows of a profile as a string, one character per row
+    """
+    code_points = codes + FIRST_ROW_CHARACTER
+    code_points[code_points >= 0xD800] += 0x800
+    return code_points.astype(np.uint32).tobytes().decode("utf-32-le")
+
+class Profile():
+    """
+    The alignment of a group of witnesses: token_indexes[row_i, i] is the index of the token of
+    the witness witnesses[i] in the row row_i, -1 for a gap. token_codes has the same shape and
+    contains the codes of the tokens (see ProgressiveVulgaligner.get_token_codes()), -1 for a gap.
+    """
+
+    def __init__(self, witnesses: List[int], token_indexes: np.ndarray, token_codes: np.ndarray):
+        self.witnesses = witnesses
+        self.token_indexes = token_indexes
+        self.token_codes = token_codes
+
+    def __len__(self) -> int:
+        return self.token_indexes.shape[0]
+
+    def get_consensus_codes(self) -> np.ndarray:
+        """
+        Returns the most frequent code of each row, the first one in case of a tie
+        """
+        token_codes = self.token_codes
+        counts = np.empty(token_codes.shape, dtype=np.int64)
+        for i in range(token_codes.shape[1]):
+            counts[:, i] = (token_codes == token_codes[:, i:i+1]).sum(axis=1)
+        counts[token_codes < 0] = -1
+        return token_codes[np.arange(len(self)), counts.argmax(axis=1)]
+
+class ProgressiveVulgaligner(Vulgaligner):
+    """
+    Progressive multiple alignment (see Spencer 2004 in the README): instead of aligning all the
+    witnesses on one base like FDMPVulgaligner, the witnesses are merged two by two following a guide
+    tree, the closest ones first. Each merge aligns two profiles (alignments of groups of witnesses)
+    by diffing their consensus, the most frequent token of each row.
+
+    The guide tree is built by average linkage (UPGMA) on the distances estimated from the ngrams of
+    the token strings (see MedoidBaseSelector.get_distance_matrix()).
+
+    The diffs are on rows, not on characters, the tokens are encoded as one code per token for that.
+    In a change, the rows of the two profiles are paired by position (like get_next_fdmp_diff_info()
+    does for tokens), or by the similarity of their consensus tokens if a realigner is set.
+    """
+
+    def __init__(self, array_matrix: bool = False, differ: Differ = None, realigner: BandedRealigner = None, profiler: Profiler = None):
+        """
+        array_matrix: see FDMPVulgaligner
+        differ: computes the diffs between the consensus of two profiles, encoded as strings with one
+                character per row (FDMPDiffer by default)
+        realigner: if set, re-aligns the replace hunks of the diffs between two profiles (see realigner.py)
+        profiler: if set, the time of the diffs and of the merges is added to the current page (see profiling.py)
+        """
+        self.array_matrix = array_matrix
+        self.differ = differ if differ is not None else FDMPDiffer()
+        self.realigner = realigner
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        # estimates the distances between the witnesses
+        self.sketcher = MedoidBaseSelector()
+
+    @staticmethod
+    def get_token_codes(token_strings: List[str], token_lists: List[TokenList]) -> Tuple[List[np.ndarray], List[str]]:
+        """
+        Returns the code of each token of each witness and the string of each code. Tokens have the same
+        code if they have the same characters in the token strings, tokens with an increment of 0 if they
+        have the same string.
+        """
+        code_strings: List[str] = []
+        string_to_code: Dict[str, int] = {}
+        res = []
+        for token_string, tokens in zip(token_strings, token_lists):
+            offsets = get_token_offsets(tokens)
+            codes = []
+            for token_i, t in enumerate(tokens):
+                key = token_string[offsets[token_i]:offsets[token_i+1]] if t[2] > 0 else "\0" + t[3]
+                code = string_to_code.get(key)
+                if code is None:
+                    code = len(code_strings)
+                    string_to_code[key] = code
+                    code_strings.append(t[3])
+                codes.append(code)
+            res.append(np.array(codes, dtype=np.int64))
+        return res, code_strings
+
+    @staticmethod
+    def get_guide_tree(distances: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Returns the merges of an average linkage clustering of the witnesses: the witnesses are the clusters
+        0 to n-1 and merge i creates the cluster n+i from the two clusters of the tuple
+        """
+        nb_witnesses = len(distances)
+        # the sizes and the distances of the clusters that are not merged yet
+        sizes = {i: 1 for i in range(nb_witnesses)}
+        cluster_distances = {(i, j): float(distances[i, j]) for i in range(nb_witnesses) for j in range(i+1, nb_witnesses)}
+        res = []
+        while len(sizes) > 1:
+            (a, b), _ = min(cluster_distances.items(), key=lambda item: item[1])
+            new_cluster = nb_witnesses + len(res)
+            res.append((a, b))
+            for c in sizes:
+                if c == a or c == b:
+                    continue
+                distance_a = cluster_distances.pop((min(a, c), max(a, c)))
+                distance_b = cluster_distances.pop((min(b, c), max(b, c)))
+                cluster_distances[(c, new_cluster)] = (distance_a * sizes[a] + distance_b * sizes[b]) / (sizes[a] + sizes[b])
+            del cluster_distances[(a, b)]
+            sizes[new_cluster] = sizes.pop(a) + sizes.pop(b)
+        return res
+
+    def get_row_pairs(self, diffs: List[Diff], a_length: int, b_length: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the row of the profile a and the row of the profile b of each row of the merged profile
+        (-1 where the profile has no row), given the diffs between their consensus
+        """
+        a_rows = []
+        b_rows = []
+        a_row_i = 0
+        b_row_i = 0
+        diff_i = 0
+        nb_diffs = len(diffs)
+        while diff_i < nb_diffs:
+            op, length = diffs[diff_i]
+            if op == '=':
+                a_rows += range(a_row_i, a_row_i+length)
+                b_rows += range(b_row_i, b_row_i+length)
+                a_row_i += length
+                b_row_i += length
+                diff_i += 1
+                continue
+            minus_c = 0
+            plus_c = 0
+            while diff_i < nb_diffs and diffs[diff_i][0] != '=':
+                if diffs[diff_i][0] == '-':
+                    minus_c += diffs[diff_i][1]
+                else:
+                    plus_c += diffs[diff_i][1]
+                diff_i += 1
+            # the rows of a change are paired by position, the extra rows of one side are aligned with gaps
+            nb_rows = max(minus_c, plus_c)
+            a_rows += range(a_row_i, a_row_i+minus_c)
+            a_rows += [-1] * (nb_rows - minus_c)
+            b_rows += range(b_row_i, b_row_i+plus_c)
+            b_rows += [-1] * (nb_rows - plus_c)
+            a_row_i += minus_c
+            b_row_i += plus_c
+        if a_row_i != a_length or b_row_i != b_length:
+            raise AssertionError("the diffs cover %d and %d rows instead of %d and %d" % (a_row_i, b_row_i, a_length, b_length))
+        return np.array(a_rows, dtype=np.int64), np.array(b_rows, dtype=np.int64)
+
+    def merge_profiles(self, a: Profile, b: Profile, code_strings: List[str]) -> Profile:
+        """
+        Returns the alignment of two profiles
+        """
+        a_consensus = a.get_consensus_codes()
+        b_consensus = b.get_consensus_codes()
+        with self.profiler.stage("diff"):
+            diffs = self.differ.diff(get_row_string(a_consensus), get_row_string(b_consensus))
+        if self.realigner is not None:
+            with self.profiler.stage("realign"):
+                # the rows as tokens of one character, with the string of their consensus
+                a_row_tokens = [(0, 0, 1, code_strings[code]) for code in a_consensus.tolist()]
+                b_row_tokens = [(0, 0, 1, code_strings[code]) for code in b_consensus.tolist()]
+                diffs = self.realigner.realign(diffs, a_row_tokens, b_row_tokens)
+        with self.profiler.stage("merge"):
+            a_rows, b_rows = self.get_row_pairs(diffs, len(a), len(b))
+            token_indexes = np.hstack([get_profile_rows(a.token_indexes, a_rows), get_profile_rows(b.token_indexes, b_rows)])
+            token_codes = np.hstack([get_profile_rows(a.token_codes, a_rows), get_profile_rows(b.token_codes, b_rows)])
+        return Profile(a.witnesses + b.witnesses, token_indexes, token_codes)
+
+    def get_alignment_matrix(self, token_strings: List[str], token_lists: List[TokenList]) -> TokenMatrix:
+        """
+        See Vulgaligner.get_alignment_matrix(), the columns of the matrix are in the order of the
+        witnesses. The arguments are not modified.
+        """
+        nb_witnesses = len(token_lists)
+        token_codes, code_strings = ProgressiveVulgaligner.get_token_codes(token_strings, token_lists)
+        profiles = [Profile([i], np.arange(len(codes), dtype=np.int64)[:, None], codes[:, None]) for i, codes in enumerate(token_codes)]
+        if nb_witnesses > 2:
+            merges = ProgressiveVulgaligner.get_guide_tree(self.sketcher.get_distance_matrix(token_strings))
+        else:
+            merges = [(0, 1)] if nb_witnesses == 2 else []
+        for a, b in merges:
+            profiles.append(self.merge_profiles(profiles[a], profiles[b], code_strings))
+        profile = profiles[-1]
+        if self.profiler.enabled:
+            self.profiler.add("matrices")
+            self.profiler.add("matrix_rows", len(profile))
+            self.profiler.add("matrix_cells", len(profile) * nb_witnesses)
+        matrix = get_empty_token_matrix(len(profile), nb_witnesses, self.array_matrix)
+        for profile_column_i, witness_i in enumerate(profile.witnesses):
+            row_indexes = np.flatnonzero(profile.token_indexes[:, profile_column_i] >= 0).tolist()
+            set_token_matrix_column(matrix, witness_i, row_indexes, token_lists[witness_i])
+        return matrix
+
+def get_profile_rows(profile_matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Returns the rows of a matrix of a profile, -1 where rows is -1
+    """
+    if len(profile_matrix) == 0:
+        return np.full((len(rows), profile_matrix.shape[1]), -1, dtype=np.int64)
+    return np.where(rows[:, None] >= 0, profile_matrix[np.maximum(rows, 0)], -1)
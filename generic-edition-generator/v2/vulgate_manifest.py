@@ -0,0 +1,151 @@
+import json
+import hashlib
+import os
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# change when the format of the manifest or the election changes, to invalidate all manifests
+MANIFEST_VERSION = 2
+
+# an elected string and its confidence (or None)
+ElectedString = Tuple[str, int]
+
+# (start, end, confidence) of the characters of a vulgate with the same OCR confidence
+ConfidenceRun = Tuple[int, int, int]
+
+def get_object_config(obj) -> Dict:
+    """
+    Returns the class and the scalar attributes of an object, to describe its configuration
+    """
+    if obj is None:
+        return None
+    config = {"class": type(obj).__qualname__}
+    for key, value in sorted(vars(obj).items()):
+        if isinstance(value, (bool, int, float, str, type(None))):
+            config[key] = value
+    return config
+
+def get_config_fingerprint(config: Dict) -> str:
+    return hashlib.sha1(json.dumps([MANIFEST_VERSION, config], sort_keys=True).encode("utf-8")).hexdigest()
+
+def get_page_key(page_span: Tuple[int, int]) -> str:
+    return "%d-%d" % page_span
+
+def get_vulgate_hash(vulgate: str) -> str:
+    return hashlib.sha1(vulgate.encode("utf-8")).hexdigest()
+
+def get_vulgate_strings(vulgate: str, confidence_runs: List[ConfidenceRun], start: int, end: int) -> List[ElectedString]:
+    """
+    Returns the characters of vulgate[start:end] as elected strings: one string per confidence run
+    (sorted by start, not overlapping) and one string with a None confidence between them
+    """
+    res = []
+    pos = start
+    # the first run that can contain start
+    first_run = max(bisect_right(confidence_runs, (start, float("inf"))) - 1, 0)
+    for run_start, run_end, confidence in confidence_runs[first_run:]:
+        if run_start >= end:
+            break
+        run_start = max(run_start, start)
+        run_end = min(run_end, end)
+        if run_end <= pos:
+            continue
+        if run_start > pos:
+            res.append((vulgate[pos:run_start], None))
+            pos = run_start
+        res.append((vulgate[pos:run_end], confidence))
+        pos = run_end
+    if pos < end:
+        res.append((vulgate[pos:end], None))
+    return res
+
+class VulgateManifest():
+    """
+    The hash of each page of a vulgate (computed from the segments of the page in all
+    the witnesses) with the position of its elected text in the vulgate, so that a vulgate can be
+    regenerated by aligning only the pages that changed. The text of the other pages is read
+    from the vulgate written by the previous run (see get_vulgate_strings()).
+
+    The pages are identified by their span in the pagination of the base witness, since several
+    pages can have the same image reference. A base of the previous run is only used if the hash
+    of its vulgate didn't change (see check_previous_vulgate()).
+
+    The pages of the previous run are only read, the pages of the current run replace them
+    base by base when end_base() is called, so that the pages that disappeared are not kept and
+    an interrupted run keeps the previous pages of the bases it didn't finish.
+
+    The manifest is only valid for one configuration of the vulgatizer, see get_config_fingerprint().
+    """
+
+    def __init__(self, config_fingerprint: str):
+        self.config_fingerprint = config_fingerprint
+        # base_id -> {"vulgate_hash": hash of the vulgate of the base, "pages": {page key -> [page hash, start, end]}}
+        self.previous_bases: Dict[str, Dict] = {}
+        self.bases: Dict[str, Dict] = {}
+        self.finished_bases = set()
+
+    def check_previous_vulgate(self, base_id: str, vulgate: str) -> bool:
+        """
+        Returns True if the vulgate of a base is the one written with the previous run, forgets
+        the previous pages of the base otherwise
+        """
+        base = self.previous_bases.get(base_id)
+        if base is None:
+            return False
+        if vulgate is None or base["vulgate_hash"] != get_vulgate_hash(vulgate):
+            del self.previous_bases[base_id]
+            return False
+        return True
+
+    def get_page_span(self, base_id: str, page_span: Tuple[int, int], page_hash: str) -> Tuple[int, int]:
+        """
+        Returns the (start, end) of the text of a page in the vulgate of the previous run if its hash
+        did not change, None otherwise
+        """
+        page = self.previous_bases.get(base_id, {"pages": {}})["pages"].get(get_page_key(page_span))
+        if page is None or page[0] != page_hash:
+            return None
+        return page[1], page[2]
+
+    def set_page_span(self, base_id: str, page_span: Tuple[int, int], page_hash: str, start: int, end: int):
+        """
+        Sets the (start, end) of the text of a page in the vulgate of the current run
+        """
+        self.bases.setdefault(base_id, {"pages": {}})["pages"][get_page_key(page_span)] = [page_hash, start, end]
+
+    def end_base(self, base_id: str, vulgate: str):
+        """
+        Called when all the pages of a base are set, vulgate is the text of the vulgate of the base
+        """
+        self.bases.setdefault(base_id, {"pages": {}})["vulgate_hash"] = get_vulgate_hash(vulgate)
+        self.finished_bases.add(base_id)
+
+    def save(self, path):
+        """
+        Saves the manifest as JSON, the file is replaced atomically
+        """
+        bases = dict(self.previous_bases)
+        for base_id in self.finished_bases:
+            bases[base_id] = self.bases[base_id]
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"config": self.config_fingerprint, "bases": bases}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path, config_fingerprint: str) -> 'VulgateManifest':
+        """
+        Loads a manifest saved with save(), the pages are empty if the file doesn't exist
+        or if it was saved with another configuration
+        """
+        manifest = VulgateManifest(config_fingerprint)
+        path = Path(path)
+        if not path.is_file():
+            return manifest
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("config") == config_fingerprint:
+            manifest.previous_bases = data["bases"]
+        return manifest
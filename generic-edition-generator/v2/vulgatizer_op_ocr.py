@@ -2,128 +2,485 @@ from openpecha.core.pecha import OpenPecha
 from openpecha.core.pecha import OpenPechaFS
 from openpecha.core.layer import Layer, LayerEnum, PechaMetadata
 from vulgaligner_fdmp import FDMPVulgaligner
-from normalizer_bo import TibetanNormalizer
+from realigner import BandedRealigner
+from base_selector import BaseSelector
+from transpositions import TranspositionDetector
+from consensus_run import ConsensusRun
+from differ import Differ
+from normalizer_bo_compiled import CompiledTibetanNormalizer
 from tokenizer_bo import TibetanTokenizer
 from vocabulary import Vocabulary
-from opf_utils import OPFragmentLayerAccessor, OPSegment, OPCursor, find_annotation_of_reference, find_comparable_base_id
+from opf_utils import OPFragmentLayerAccessor, OPLayerIndexes, OPSegment, OPCursor, iter_page_segments
 import logging
 from matrix_weigher import TokenMatrixWeigher
 from token_weigher_count import TokenCountWeigher
 from token_weigher_valid_bo import ValidBoTokenWeigher
 from token_weigher_op_confidence import OPConfidenceTokenWeigher
+from confidence_index import SegmentConfidence, NO_CONFIDENCE
 from utils import *
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from vulgate_manifest import VulgateManifest, ElectedString, get_config_fingerprint, get_object_config, get_vulgate_strings
+from typing import List, Tuple
+import hashlib
+import numpy as np
+from profiling import Profiler, NULL_PROFILER
 
 logger = logging.getLogger('VulgatizerOPTibOCR')
 
+class ElectedStringList():
+    """
+    Collects the strings of the elected tokens of a page with their confidence, with the same
+    interface as OPCursor, so that they can be sent back from a worker process or cached
+    (see VulgateManifest) and appended to the cursor later
+    """
+
+    def __init__(self):
+        self.strings: List[ElectedString] = []
+
+    def append_token(self, token, token_confidence: int):
+        if token:
+            self.append_string(token[3], token_confidence)
+
+    def append_string(self, s: str, confidence: int):
+        if s:
+            self.strings.append((s, confidence))
+
+# the vulgatizer of a page worker process, see init_page_worker()
+page_worker_vulgatizer = None
+
+def init_page_worker(ops, window_size, vocabulary, differ, profile, consensus_runs, realigner, base_selector, transposition_detector):
+    global page_worker_vulgatizer
+    page_worker_vulgatizer = VulgatizerOPTibOCR(None, window_size=window_size, vocabulary=vocabulary, differ=differ,
+        profiler=Profiler() if profile else None, consensus_runs=consensus_runs, realigner=realigner, base_selector=base_selector,
+        transposition_detector=transposition_detector)
+    page_worker_vulgatizer.ops = ops
+    page_worker_vulgatizer.current_base_id = None
+
+def elect_page_strings(job):
+    """
+    Runs in a page worker, returns the elected strings of a page, whether the alignment of the page
+    succeeded (see elect_page()) and the values of the profiler for the page (None if profiling is disabled).
+    job is (base_id, reference, spans) with spans the (op index, base id, start, end) of each segment.
+    The bases of the witnesses are kept until a job of another base is received.
+    """
+    base_id, reference, spans = job
+    vulgatizer = page_worker_vulgatizer
+    if base_id != vulgatizer.current_base_id:
+        vulgatizer.reset_ops()
+        vulgatizer.current_base_id = base_id
+    segments = [OPSegment(vulgatizer.ops[op_i], segment_base_id, start, end) for op_i, segment_base_id, start, end in spans]
+    vulgatizer.profiler.start_page(base_id, reference)
+    strings, complete = vulgatizer.elect_page(segments, reference)
+    return strings, complete, vulgatizer.profiler.end_page(keep=False)
+
+def elect_pages_strings(jobs):
+    """
+    Runs in a page worker, returns the result of elect_page_strings() for each job of a chunk
+    """
+    return [elect_page_strings(job) for job in jobs]
+
+class PageChunk():
+    """
+    The jobs of consecutive pages sent to a page worker at once, and their future once submitted
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self.future = None
+
 class VulgatizerOPTibOCR():
 
     """
     Class creating an OPF vulgate using different OCRs of the same scans in OPF format.
     """
 
-    def __init__(self, op_output: OpenPecha):
+    def __init__(self, op_output: OpenPecha, window_size: int = None, nb_diff_workers: int = 1, vocabulary: Vocabulary = None, differ: Differ = None,
+            nb_page_workers: int = 1, page_chunk_size: int = 4, manifest_path: str = None,
+            profiler: Profiler = None, consensus_runs: bool = True, realigner: BandedRealigner = None,
+            page_match_threshold: float = None, base_selector: BaseSelector = None, transposition_detector: TranspositionDetector = None,
+            mp_context = None):
+        """
+        window_size: see FDMPVulgaligner, can be set to align long pages window by window
+        nb_diff_workers: number of processes used to compute the diffs of the witnesses in parallel
+        vocabulary: by default a new vocabulary is used and reset after each page, a PersistentVocabulary
+                    (see vocabulary_persistent.py) can be passed to keep the codes across pages
+        differ: see FDMPVulgaligner
+        nb_page_workers: number of processes aligning pages in parallel, each process loads the
+                    bases of the witnesses. The output is the same as with one process.
+        page_chunk_size: number of pages sent to a page worker at once
+        manifest_path: if set, the hash of each page and the position of its text in the vulgate are saved
+                    in this file (see VulgateManifest, typically next to the output OPF) and the next runs only
+                    align the pages that changed in one of the witnesses, the text of the other pages is read
+                    from the output OPF
+        profiler: if set, the time spent in each stage and some counters are collected for each page,
+                    see profiling.py. Profiling is disabled by default.
+        consensus_runs: if True, the runs of tokens that are the same in all the witnesses are not
+                    weighed (see FDMPVulgaligner.get_compressed_alignment()), the elected confidence is
+                    the highest one. Only the variant regions go through the weighers.
+        realigner: see FDMPVulgaligner, re-aligns the replace hunks of the diffs on the similarity of the tokens
+        page_match_threshold: if set, the pages of the witnesses are matched on the similarity of their text
+                    and not only on their image reference, pages with no counterpart reaching this similarity
+                    are not aligned (see iter_page_segments() and PageMatcher)
+        base_selector: see FDMPVulgaligner, chooses the witness used as the base of the alignment of each page,
+                    MedoidBaseSelector avoids aligning on a noisy first witness
+        transposition_detector: see FDMPVulgaligner, aligns the blocks of text moved in a witness
+        mp_context: the multiprocessing context of the page workers (ex: multiprocessing.get_context("spawn")),
+                    the default start method of the platform if None. The witnesses and the vocabulary are
+                    pickled to be sent to the workers, except with fork.
+        """
+        self.window_size = window_size
+        self.differ = differ
+        self.nb_page_workers = nb_page_workers
+        self.page_chunk_size = page_chunk_size
+        self.manifest_path = manifest_path
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.consensus_runs = consensus_runs
+        self.page_match_threshold = page_match_threshold
+        self.mp_context = mp_context
         # no need for the vocabulary to decode if we're not debugging
-        self.vocabulary = Vocabulary(allow_decode=logger.isEnabledFor(logging.DEBUG))
-        self.aligner = FDMPVulgaligner()
-        self.normalizer = TibetanNormalizer()
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary(allow_decode=logger.isEnabledFor(logging.DEBUG))
+        self.aligner = FDMPVulgaligner(window_size=window_size, array_matrix=True, nb_workers=nb_diff_workers, differ=differ, profiler=self.profiler, realigner=realigner,
+            base_selector=base_selector, transposition_detector=transposition_detector)
+        self.normalizer = CompiledTibetanNormalizer()
         # stop words only make sense when comparing different editions, not ocr of the
         # same scans
         self.tokenizer = TibetanTokenizer(self.vocabulary, self.normalizer, stop_words=[])
         self.ops = []
+        # the indexes of the layers of the witnesses, reset with their bases in reset_ops()
+        self.layer_indexes = OPLayerIndexes()
         self.op_output = op_output
 
-    def get_matrix_weigher(self, confidence_layer_accessors):
+    def get_matrix_weigher(self, confidence_weigher):
         matrix_weigher = TokenMatrixWeigher()
         matrix_weigher.add_weigher(TokenCountWeigher(), 1)
         matrix_weigher.add_weigher(ValidBoTokenWeigher(weight_gap=100, relative=True), 1)
-        matrix_weigher.add_weigher(OPConfidenceTokenWeigher(confidence_layer_accessors, relative=False), 1)
+        matrix_weigher.add_weigher(confidence_weigher, 1)
         return matrix_weigher
 
     def add_op_witness(self, op: OpenPecha):
         self.ops.append(op)
 
+    def reset_ops(self):
+        for op in self.ops:
+            op.reset_base_and_layers()
+        self.layer_indexes.reset()
+
     def append_segments(self, op_segments, op_cursor):
         token_strings = []
         token_lists = []
-        confidence_layer_accessors = []
+        segment_confidences = []
+        profiler = self.profiler
         for segment in op_segments:
-            token_list, token_string = segment.tokenize(self.tokenizer)
+            with profiler.stage("tokenize"):
+                token_list, token_string = segment.tokenize(self.tokenizer)
             token_strings.append(token_string)
             token_lists.append(token_list)
-            confidence_layer_accessors.append(OPFragmentLayerAccessor(segment, LayerEnum.ocr_confidence))
-        token_matrix = self.aligner.get_alignment_matrix(token_strings, token_lists)
+            with profiler.stage("confidence"):
+                layer_accessor = OPFragmentLayerAccessor(segment, LayerEnum.ocr_confidence, layer_indexes=self.layer_indexes)
+                segment_confidences.append(SegmentConfidence(segment.start, segment.end,
+                    layer_accessor.get_annotations_in_range(segment.start, segment.end)))
+        if profiler.enabled:
+            profiler.add("witnesses", len(op_segments))
+            profiler.add("tokens", sum(len(token_list) for token_list in token_lists))
         # uncomment to debug the main variables:
         debug_token_lists(logger, token_lists)
         debug_token_strings(logger, token_strings, self.vocabulary)
+        if not self.consensus_runs:
+            for token_matrix in self.aligner.iter_alignment_matrices(token_strings, token_lists):
+                self.append_token_matrix(token_matrix, segment_confidences, op_cursor)
+            return
+        for token_matrix, consensus_runs in self.aligner.iter_compressed_alignments(token_strings, token_lists):
+            self.append_token_matrix(token_matrix, segment_confidences, op_cursor, consensus_runs)
+
+    def append_consensus_run(self, consensus_run: ConsensusRun, segment_confidences, op_cursor):
+        """
+        Appends the tokens of a consensus run with the highest confidence of the witnesses (a token
+        with no confidence counting as 100, as in OPConfidenceTokenWeigher). The tokens with the same
+        confidence are appended as one string.
+        """
+        confidences = np.empty((consensus_run.nb_rows, consensus_run.nb_columns), dtype=np.int8)
+        for column_i in range(consensus_run.nb_columns):
+            starts, ends = consensus_run.get_column_ranges(column_i)
+            confidences[:, column_i] = segment_confidences[column_i].get_lowest_confidences(starts, ends)
+        weights = np.where(confidences == NO_CONFIDENCE, 100, confidences)
+        top_indexes = weights.argmax(axis=1)
+        elected_confidences = confidences[np.arange(consensus_run.nb_rows), top_indexes].tolist()
+        strings = consensus_run.get_strings()
+        run_start = 0
+        for row_i in range(1, consensus_run.nb_rows + 1):
+            if row_i < consensus_run.nb_rows and elected_confidences[row_i] == elected_confidences[run_start]:
+                continue
+            confidence = elected_confidences[run_start]
+            op_cursor.append_string("".join(strings[run_start:row_i]), None if confidence == NO_CONFIDENCE else confidence)
+            run_start = row_i
+
+    def append_token_matrix(self, token_matrix, segment_confidences, op_cursor, consensus_runs: List[ConsensusRun] = ()):
+        """
+        Weighs the token matrix and appends the elected tokens, with the consensus runs
+        between the rows of the matrix (see FDMPVulgaligner.get_compressed_alignment())
+        """
         debug_token_matrix(logger, token_matrix)
-        matrix_weigher = self.get_matrix_weigher(confidence_layer_accessors)
-        weight_matrix = matrix_weigher.get_weight_matrix(token_matrix)
-        for row_i, tokens in enumerate(token_matrix):
-            # for each set of aligned tokens, take the string of the token
-            # with the biggest weight
-            top_weight = 0
-            top_token_index = 0
-            weights = weight_matrix[row_i]
-            for j, weight in enumerate(weights):
-                if weight is not None and weight > top_weight:
-                    top_weight = weight
-                    top_token_index = j
-            token = tokens[top_token_index]
+        with self.profiler.stage("weigh"):
+            confidence_weigher = OPConfidenceTokenWeigher.from_segment_confidences(segment_confidences, relative=False)
+            matrix_weigher = self.get_matrix_weigher(confidence_weigher)
+            weight_matrix = matrix_weigher.get_weight_matrix(token_matrix)
+            # the confidences computed by the weigher are reused for the elected tokens
+            confidence_matrix = confidence_weigher.get_confidence_matrix(token_matrix).tolist()
+        with self.profiler.stage("elect"):
+            row_start = 0
+            for consensus_run in consensus_runs:
+                self.elect_tokens(token_matrix, weight_matrix, confidence_matrix, op_cursor, row_start, consensus_run.row_i)
+                self.append_consensus_run(consensus_run, segment_confidences, op_cursor)
+                row_start = consensus_run.row_i
+            self.elect_tokens(token_matrix, weight_matrix, confidence_matrix, op_cursor, row_start, len(token_matrix))
+
+    def elect_tokens(self, token_matrix, weight_matrix, confidence_matrix, op_cursor, row_start: int = 0, row_end: int = None):
+        # for each set of aligned tokens, take the string of the token
+        # with the biggest weight
+        if row_end is None:
+            row_end = len(token_matrix)
+        top_token_indexes = TokenMatrixWeigher.get_top_indexes(weight_matrix[row_start:row_end]).tolist()
+        for row_i, top_token_index in enumerate(top_token_indexes, row_start):
+            token = token_matrix.get_token(row_i, top_token_index)
             if top_token_index != 0 and logger.isEnabledFor(logging.DEBUG):
-                logger.debug("election: %s -> %s", str(tokens), token)
+                logger.debug("election: %s -> %s", str(token_matrix.get_row(row_i)), token)
             if token is None:
                 # gap is the most likely value, we just skip
                 continue
-            ocr_confidence = OPConfidenceTokenWeigher.get_lowest_confidence(confidence_layer_accessors[top_token_index], token[0], token[1])
+            ocr_confidence = confidence_matrix[row_i][top_token_index]
+            if ocr_confidence == NO_CONFIDENCE:
+                ocr_confidence = None
             op_cursor.append_token(token, ocr_confidence)
 
+    def elect_page(self, op_segments, reference) -> Tuple[List[ElectedString], bool]:
+        """
+        Returns the elected strings of a page with their confidence and True, or if the alignment
+        fails, the strings elected before the exception and False (the exception is logged). The
+        strings of a failed page must not be saved in the manifest.
+        """
+        complete = True
+        elected = ElectedStringList()
+        cache_stats = self.tokenizer.get_cache_stats() if self.profiler.enabled else None
+        try:
+            self.append_segments(op_segments, elected)
+        except KeyboardInterrupt as e:
+            raise e
+        except:
+            logging.exception("exception in page %s", reference)
+            complete = False
+        if cache_stats is not None:
+            new_cache_stats = self.tokenizer.get_cache_stats()
+            self.profiler.add("token_cache_hits", new_cache_stats["hits"] - cache_stats["hits"])
+            self.profiler.add("token_cache_misses", new_cache_stats["misses"] - cache_stats["misses"])
+        self.tokenizer.reset()
+        return elected.strings, complete
+
+    def get_config(self):
+        """
+        Returns the configuration of everything that has an influence on the elected strings
+        """
+        return {
+            "window_size": self.aligner.window_size,
+            "anchor_ngram_size": self.aligner.anchor_ngram_size,
+            "consensus_runs": self.consensus_runs,
+            "page_match_threshold": self.page_match_threshold,
+            "differ": get_object_config(self.aligner.differ),
+            "realigner": get_object_config(self.aligner.realigner),
+            "base_selector": get_object_config(self.aligner.base_selector),
+            "transposition_detector": get_object_config(self.aligner.transposition_detector),
+            "normalizer": get_object_config(self.normalizer),
+            "tokenizer": get_object_config(self.tokenizer),
+            "weighers": [(get_object_config(weigher), weight) for weigher, weight in self.get_matrix_weigher(OPConfidenceTokenWeigher([], relative=False)).weighted_weighters]
+        }
+
+    def load_manifest(self) -> VulgateManifest:
+        if self.manifest_path is None:
+            return None
+        return VulgateManifest.load(self.manifest_path, get_config_fingerprint(self.get_config()))
+
+    def get_page_hash(self, op_segments) -> str:
+        """
+        Returns a hash of the text and the confidence annotations of the segments of a page
+        """
+        h = hashlib.sha1()
+        for segment in op_segments:
+            h.update(("%s\0%s\0" % (segment.op.pecha_id, segment.get_str())).encode("utf-8"))
+            layer_accessor = OPFragmentLayerAccessor(segment, LayerEnum.ocr_confidence, layer_indexes=self.layer_indexes)
+            for annotation in layer_accessor.get_annotations_in_range(segment.start, segment.end):
+                h.update(("%d,%d,%s;" % (annotation.span.start - segment.start, annotation.span.end - segment.start, annotation.confidence)).encode("utf-8"))
+            h.update(b"\1")
+        return h.hexdigest()
+
+    def start_base(self, manifest: VulgateManifest, base_id):
+        """
+        Empties a base of the output OPF so that its pages are appended from the start. Returns the
+        vulgate of the base written by the previous run and its confidence runs (see get_vulgate_strings())
+        if the manifest can use them, None otherwise.
+        """
+        vulgate = self.op_output.get_base(base_id)
+        previous_vulgate = None
+        if manifest is not None and manifest.check_previous_vulgate(base_id, vulgate):
+            confidence_layer = self.op_output.get_layer(base_id, LayerEnum.ocr_confidence)
+            confidence_runs = sorted((annotation.span.start, annotation.span.end, round(annotation.confidence*100))
+                for annotation_id, annotation in confidence_layer.get_annotations())
+            previous_vulgate = (vulgate, confidence_runs)
+        if vulgate is not None:
+            self.op_output.set_base("", base_id, update_layer_coordinates=False)
+            self.op_output.get_layer(base_id, LayerEnum.ocr_confidence).reset()
+            self.op_output.get_layer(base_id, LayerEnum.pagination).reset()
+        return previous_vulgate
+
+    def get_cached_page_strings(self, manifest: VulgateManifest, base_id, ann, op_segments, previous_vulgate):
+        """
+        Returns the hash of a page and its elected strings in the vulgate of the previous run if the page
+        didn't change (None otherwise). The hash is None if there is no manifest.
+        """
+        if manifest is None:
+            return None, None
+        with self.profiler.stage("hash"):
+            page_hash = self.get_page_hash(op_segments)
+        strings = None
+        if previous_vulgate is not None:
+            span = manifest.get_page_span(base_id, (ann["span"]["start"], ann["span"]["end"]), page_hash)
+            if span is not None:
+                strings = get_vulgate_strings(previous_vulgate[0], previous_vulgate[1], span[0], span[1])
+        self.profiler.add("manifest_misses" if strings is None else "manifest_hits")
+        return page_hash, strings
+
+    def append_page(self, manifest: VulgateManifest, cursor, base_id, ann, page_hash, strings: List[ElectedString], complete: bool):
+        """
+        Appends the elected strings of a page to the cursor and sets its position in the manifest,
+        a page that failed is not in the manifest and is aligned again by the next run
+        """
+        with self.profiler.stage("append"):
+            start = cursor.coord
+            for s, confidence in strings:
+                cursor.append_string(s, confidence)
+            if manifest is not None and complete:
+                manifest.set_page_span(base_id, (ann["span"]["start"], ann["span"]["end"]), page_hash, start, cursor.coord)
+            cursor.end_page(ann)
+
     def create_vulgate(self):
         if len(self.ops) < 2:
             logging.error("cannot create vulgate with just 1 edition")
             return
+        if self.nb_page_workers > 1:
+            self.create_vulgate_parallel()
+            return
+        manifest = self.load_manifest()
         base_op = self.ops[0]
         other_ops = self.ops[1:]
         for base_id, base_info in base_op.meta.bases.items():
-            base_pagination = base_op.get_layer(base_id, LayerEnum.pagination)
-            other_paginations = {}
-            other_base_ids = {}
+            previous_vulgate = self.start_base(manifest, base_id)
             cursor = OPCursor(self.op_output, base_id, 0)
-            for other_op in other_ops:
-                other_base_id = find_comparable_base_id(base_op, base_id, other_op)
-                other_base_ids[other_op.pecha_id] = other_base_id
-                other_pagination = other_op.get_layer(other_base_id, LayerEnum.pagination)
-                other_paginations[other_op.pecha_id] = other_pagination
-            for ann in base_pagination.annotations.values():
-                img_id = ann["reference"]
-                #if img_id != "I1PD958460005.jpg":
+            for ann, segments in iter_page_segments(base_op, base_id, other_ops, self.page_match_threshold):
+                #if ann["reference"] != "I1PD958460005.jpg":
                 #    continue
-                segments = []
-                segments.append(OPSegment(base_op, base_id, ann["span"]["start"], ann["span"]["end"]))
-                for other_op in other_ops:
-                    other_pagination = other_paginations[other_op.pecha_id]
-                    if other_pagination is None:
-                        continue
-                    other_base_id = other_base_ids[other_op.pecha_id]
-                    if other_base_id is None:
-                        continue
-                    other_ann = find_annotation_of_reference(other_pagination, ann["reference"])
-                    if other_ann is None:
-                        continue
-                    segments.append(OPSegment(other_op, other_base_id, other_ann["span"]["start"], other_ann["span"]["end"]))
-                try:
-                    self.append_segments(segments, cursor)
-                except KeyboardInterrupt as e:
-                    raise e
-                except:
-                    logging.exception("exception in page %s", ann["reference"])
-                cursor.end_page(ann)
-                self.tokenizer.reset()
+                self.profiler.start_page(base_id, ann["reference"])
+                page_hash, strings = self.get_cached_page_strings(manifest, base_id, ann, segments, previous_vulgate)
+                complete = True
+                if strings is None:
+                    strings, complete = self.elect_page(segments, ann["reference"])
+                self.append_page(manifest, cursor, base_id, ann, page_hash, strings, complete)
+                self.profiler.end_page()
             # clear cache at the end of each base
-            base_op.reset_base_and_layers()
-            for other_op in other_ops:
-                other_op.reset_base_and_layers()
-            cursor.flush()
-            self.op_output.save_base()
-            self.op_output.save_layers()
-            self.op_output.reset_base_and_layers()
+            self.reset_ops()
+            self.save_cursor(cursor)
+            self.save_manifest(manifest, base_id, cursor)
+            self.profiler.end_base(base_id)
+        self.aligner.close()
+
+    def append_pending_pages(self, manifest: VulgateManifest, cursor, base_id, pending_pages, wait: bool) -> int:
+        """
+        Appends the first pages of pending_pages (see create_vulgate_parallel()) that are cached or
+        whose chunk is done. If wait is True, waits for the chunk of the first page if necessary and
+        appends all its pages. Returns the number of chunks entirely appended.
+        """
+        nb_chunks = 0
+        while pending_pages:
+            ann, page_hash, strings, page_profile, chunk, chunk_index = pending_pages[0]
+            complete = True
+            if strings is None:
+                if chunk.future is None or not (wait or chunk.future.done()):
+                    break
+                strings, complete, worker_profile = chunk.future.result()[chunk_index]
+            pending_pages.popleft()
+            self.profiler.start_page(base_id, ann["reference"])
+            self.profiler.merge(page_profile)
+            if chunk is not None:
+                self.profiler.merge(worker_profile)
+                if chunk_index == len(chunk.jobs) - 1:
+                    nb_chunks += 1
+                    # the results of the chunk are not needed anymore
+                    chunk.future = None
+                    wait = False
+            self.append_page(manifest, cursor, base_id, ann, page_hash, strings, complete)
+            self.profiler.end_page()
+        return nb_chunks
+
+    def save_cursor(self, cursor):
+        cursor.flush()
+        self.op_output.save_base()
+        self.op_output.save_layers()
+        self.op_output.reset_base_and_layers()
 
+    def save_manifest(self, manifest: VulgateManifest, base_id, cursor):
+        if manifest is None:
+            return
+        manifest.end_base(base_id, cursor.get_base())
+        manifest.save(self.manifest_path)
+
+    def create_vulgate_parallel(self):
+        """
+        Same as create_vulgate(), but the pages are aligned in a pool of nb_page_workers processes.
+        The parent process reads the pages of one base at a time (and hashes them with a manifest),
+        sends the pages that are not cached to the workers in chunks of page_chunk_size pages, and
+        appends the elected strings of each page to the cursor, in page order.
+
+        At most max_chunks_in_flight chunks are submitted and not appended yet, the parent waits
+        for the oldest one before reading more pages, so that the memory stays bounded on large
+        collections. A base is saved before the pages of the next one are read.
+        """
+        manifest = self.load_manifest()
+        base_op = self.ops[0]
+        other_ops = self.ops[1:]
+        op_indexes = {id(op): i for i, op in enumerate(self.ops)}
+        max_chunks_in_flight = 2 * self.nb_page_workers
+        # the workers load the bases themselves
+        self.reset_ops()
+        with ProcessPoolExecutor(max_workers=self.nb_page_workers, mp_context=self.mp_context, initializer=init_page_worker,
+                initargs=(self.ops, self.window_size, self.vocabulary, self.differ, self.profiler.enabled, self.consensus_runs, self.aligner.realigner, self.aligner.base_selector,
+                    self.aligner.transposition_detector)) as executor:
+            for base_id, base_info in base_op.meta.bases.items():
+                previous_vulgate = self.start_base(manifest, base_id)
+                cursor = OPCursor(self.op_output, base_id, 0)
+                # the pages read and not appended yet, in order: [pagination annotation, page hash, cached strings,
+                # profiler values, chunk, index in the chunk]
+                pending_pages = deque()
+                chunk = PageChunk()
+                nb_chunks_in_flight = 0
+                for ann, segments in iter_page_segments(base_op, base_id, other_ops, self.page_match_threshold):
+                    self.profiler.start_page(base_id, ann["reference"])
+                    page_hash, strings = self.get_cached_page_strings(manifest, base_id, ann, segments, previous_vulgate)
+                    page_profile = self.profiler.end_page(keep=False)
+                    if strings is not None:
+                        pending_pages.append((ann, page_hash, strings, page_profile, None, None))
+                    else:
+                        spans = [(op_indexes[id(segment.op)], segment.base_id, segment.start, segment.end) for segment in segments]
+                        pending_pages.append((ann, page_hash, None, page_profile, chunk, len(chunk.jobs)))
+                        chunk.jobs.append((base_id, ann["reference"], spans))
+                        if len(chunk.jobs) == self.page_chunk_size:
+                            chunk.future = executor.submit(elect_pages_strings, chunk.jobs)
+                            chunk = PageChunk()
+                            nb_chunks_in_flight += 1
+                    nb_chunks_in_flight -= self.append_pending_pages(manifest, cursor, base_id, pending_pages, nb_chunks_in_flight >= max_chunks_in_flight)
+                if chunk.jobs:
+                    chunk.future = executor.submit(elect_pages_strings, chunk.jobs)
+                while pending_pages:
+                    self.append_pending_pages(manifest, cursor, base_id, pending_pages, True)
+                self.reset_ops()
+                self.save_cursor(cursor)
+                self.save_manifest(manifest, base_id, cursor)
+                self.profiler.end_base(base_id)
+        self.aligner.close()